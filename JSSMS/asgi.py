@@ -2,6 +2,9 @@
 ASGI config for JSSMS project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Dùng cho các view async như luồng sự kiện SSE của quầy (store.views.counter_events_feed);
+chạy bằng worker Uvicorn, xem JSSMS/gunicorn.conf.py. JSSMS.handlers.ASGIHandler đóng luồng
+SSE ngay khi client ngắt kết nối.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -9,8 +12,15 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'JSSMS.settings')
+# Dưới ASGI view đồng bộ chạy trong luồng riêng của từng request: kết nối giữ lại (CONN_MAX_AGE > 0)
+# không bao giờ được dùng lại hay đóng, nên mặc định đóng kết nối sau mỗi request
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from JSSMS.handlers import ASGIHandler  # noqa: E402 (cần django.setup() trước)
+
+application = ASGIHandler()
@@ -0,0 +1,44 @@
+"""
+Đọc cấu hình CSDL từ biến môi trường DATABASE_URL, vd.
+    mssql://sa:mat-khau@db:1433/jssms_db?driver=ODBC+Driver+17+for+SQL+Server
+    sqlite:////duong/dan/db.sqlite3
+Tham số query string được đưa vào OPTIONS của backend.
+"""
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+ENGINES = {
+    'mssql': 'mssql',
+    'sqlserver': 'mssql',
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgres': 'django.db.backends.postgresql',
+    'postgresql': 'django.db.backends.postgresql',
+    'mysql': 'django.db.backends.mysql',
+}
+
+# OPTIONS mặc định theo ENGINE, bị ghi đè bởi tham số trong URL
+DEFAULT_OPTIONS = {
+    'mssql': {'driver': 'ODBC Driver 17 for SQL Server'},
+}
+
+
+def parse_database_url(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ENGINES:
+        raise ValueError(f"DATABASE_URL không hỗ trợ kiểu CSDL '{parts.scheme}'")
+
+    engine = ENGINES[parts.scheme]
+    if engine == 'django.db.backends.sqlite3':
+        # sqlite:///tuong-doi.db hoặc sqlite:////duong/dan/tuyet-doi.db
+        return {'ENGINE': engine, 'NAME': unquote(parts.path[1:]) or ':memory:'}
+
+    options = dict(DEFAULT_OPTIONS.get(engine, {}))
+    options.update(parse_qsl(parts.query))
+    return {
+        'ENGINE': engine,
+        'NAME': unquote(parts.path.lstrip('/')),
+        'USER': unquote(parts.username or ''),
+        'PASSWORD': unquote(parts.password or ''),
+        'HOST': parts.hostname or '',
+        'PORT': str(parts.port or ''),
+        'OPTIONS': options,
+    }
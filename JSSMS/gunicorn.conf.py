@@ -0,0 +1,32 @@
+"""
+Cấu hình Gunicorn cho chế độ production.
+
+WSGI (mặc định):
+    gunicorn -c JSSMS/gunicorn.conf.py JSSMS.wsgi:application
+ASGI (worker Uvicorn, dùng cho các view async/SSE):
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c JSSMS/gunicorn.conf.py JSSMS.asgi:application
+
+Các giá trị có thể ghi đè bằng biến môi trường (xem bên dưới).
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Mặc định 2 * số CPU + 1 worker; đặt WEB_CONCURRENCY để cố định số worker
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Khởi động lại worker sau một số request để tránh rò rỉ bộ nhớ tích lũy
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+
+# Đặt GUNICORN_ACCESS_LOG rỗng để tắt access log (vd. khi đo tải)
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
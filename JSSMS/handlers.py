@@ -0,0 +1,56 @@
+"""
+ASGIHandler ngắt luồng phản hồi (StreamingHttpResponse) khi client đóng kết nối.
+
+Django 4.2 không đọc http.disconnect trong lúc gửi phản hồi dạng luồng, nên một kết nối SSE đã đóng
+(đóng tab, tải lại trang) vẫn chạy tiếp đến khi generator tự kết thúc. Handler này đọc receive() trong
+một task riêng và hủy việc gửi luồng khi nhận http.disconnect (giống Django 5.0+).
+"""
+import asyncio
+from contextlib import suppress
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler as DjangoASGIHandler
+
+_disconnected = ContextVar('asgi_disconnected', default=None)
+
+
+class ASGIHandler(DjangoASGIHandler):
+
+    async def handle(self, scope, receive, send):
+        disconnected = asyncio.Event()
+        messages = asyncio.Queue()
+
+        async def listen():
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message['type'] == 'http.disconnect':
+                    disconnected.set()
+                    return
+
+        listener = asyncio.create_task(listen())
+        token = _disconnected.set(disconnected)
+        try:
+            await super().handle(scope, messages.get, send)
+        finally:
+            _disconnected.reset(token)
+            listener.cancel()
+
+    async def send_response(self, response, send):
+        disconnected = _disconnected.get()
+        if not response.streaming or disconnected is None:
+            return await super().send_response(response, send)
+
+        sending = asyncio.create_task(super().send_response(response, send))
+        waiting = asyncio.create_task(disconnected.wait())
+        await asyncio.wait({sending, waiting}, return_when=asyncio.FIRST_COMPLETED)
+        waiting.cancel()
+        if sending.done():
+            return sending.result()
+        # Client đã đóng kết nối: hủy việc gửi (aclosing() đóng generator) rồi vẫn gọi response.close()
+        # để phát request_finished như một request bình thường
+        sending.cancel()
+        with suppress(asyncio.CancelledError):
+            await sending
+        await sync_to_async(response.close, thread_sensitive=True)()
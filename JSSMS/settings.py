@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
+from .db import parse_database_url
+
 AUTH_USER_MODEL = 'store.CustomUser'
 
 
@@ -26,12 +30,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-_7za=nf0yjjb(ehvh8!abg9do)3m0p60jwgbwsx+d2)=#=mz@i'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Chế độ production (gunicorn/uvicorn) đặt DJANGO_DEBUG=0
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
-    '192.168.100.101',]
+    '192.168.100.101',
+    *filter(None, os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')),
+]
 
 
 # Application definition
@@ -53,6 +60,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'store.middleware.PerfMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,8 +72,6 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'JSSMS.urls'
 
-import os
-
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -89,7 +96,7 @@ WSGI_APPLICATION = 'JSSMS.wsgi.application'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
 DATABASES = {
-    'default': {
+    'default': parse_database_url(os.environ['DATABASE_URL']) if os.environ.get('DATABASE_URL') else {
         'ENGINE': 'mssql',
         'NAME': 'jssms_db',
         'USER': 'sa',
@@ -102,6 +109,67 @@ DATABASES = {
     }
 }
 
+# Kết nối CSDL:
+#   DB_CONN_MAX_AGE: số giây giữ kết nối giữa các request (0 = đóng sau mỗi request);
+#                    mặc định 60 với WSGI, 0 khi chạy qua ASGI (JSSMS/asgi.py)
+#   DB_CONN_HEALTH_CHECKS: kiểm tra kết nối cũ còn dùng được trước request đầu tiên dùng lại nó
+#   DB_POOL=1: đóng kết nối sau mỗi request để trả về pool của ODBC driver manager
+#              (chỉ với mssql; cần Pooling=Yes trong odbcinst.ini, xem Dockerfile)
+DB_POOL = os.environ.get('DB_POOL', '0') == '1' and DATABASES['default']['ENGINE'] == 'mssql'
+DATABASES['default']['CONN_MAX_AGE'] = 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1'
+if DB_POOL:
+    import pyodbc
+    pyodbc.pooling = True
+
+# Cache dùng chung giữa các worker, chọn bằng biến môi trường CACHE_BACKEND:
+#   file (mặc định): lưu file trong CACHE_LOCATION, không cần dịch vụ ngoài
+#   sqlite: bảng cache trong một file SQLite riêng (chạy `createcachetable --database cache`)
+#   db: bảng cache trong CSDL chính (chạy `createcachetable`)
+#   memcached / redis: máy chủ tại CACHE_LOCATION
+#   locmem: bộ nhớ riêng từng tiến trình (chỉ dùng khi phát triển)
+# `manage.py test` luôn dùng locmem để test không đọc/xóa cache thật của hệ thống
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+CACHE_BACKEND = 'locmem' if TESTING else os.environ.get('CACHE_BACKEND', 'file')
+CACHE_BACKENDS = {
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.path.join(BASE_DIR, 'django_cache')),
+    'sqlite': ('django.core.cache.backends.db.DatabaseCache', 'store_cache'),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'store_cache'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379'),
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'jssms'),
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'TIMEOUT': 300,
+    }
+}
+if CACHE_BACKEND == 'sqlite':
+    DATABASES['cache'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('CACHE_SQLITE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')),
+    }
+    DATABASE_ROUTERS = ['store.routers.CacheRouter']
+
+# Lưu session, chọn bằng biến môi trường SESSION_BACKEND:
+#   cached_db (mặc định): đọc session từ cache dùng chung, chỉ ghi CSDL khi session thay đổi
+#   cache: chỉ lưu trong cache (không ghi bảng django_session; mất session khi xóa cache)
+#   signed_cookies: lưu trong cookie đã ký (session chỉ còn thông tin đăng nhập vì giỏ hàng nằm trong bảng Cart)
+#   db: chỉ dùng bảng django_session
+# Session hết hạn trong bảng được xóa theo lô bằng `manage.py purge_sessions`.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cached_db')
+SESSION_ENGINE = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}[SESSION_BACKEND]
+SESSION_COOKIE_AGE = int(os.environ.get('SESSION_COOKIE_AGE', 60 * 60 * 24 * 14))
+# Thông báo (messages) lưu trong cookie để không phải ghi lại session sau mỗi thao tác
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 
 
 
@@ -145,6 +213,20 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# WhiteNoise phục vụ file tĩnh từ STATIC_ROOT. Ở production (DEBUG tắt) dùng bản đã nén
+# và gắn hash vào tên file (cần chạy `collectstatic`), nên trình duyệt cache được lâu dài.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -152,4 +234,45 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = 'store:login'
 LOGIN_REDIRECT_URL = 'store:dashboard'
-LOGOUT_REDIRECT_URL = 'store:login'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'store:login'
+
+# Thời gian (giây) lưu cache các chỉ số KPI của dashboard
+DASHBOARD_STATS_CACHE_TIMEOUT = 60
+
+# Thư mục lưu cache file PDF hóa đơn (theo id đơn hàng và thời điểm cập nhật)
+INVOICE_CACHE_DIR = BASE_DIR / 'invoice_cache'
+
+# Thời gian (giây) lưu fragment cache của các trang danh mục sản phẩm
+CATALOG_CACHE_TIMEOUT = 300
+
+# Xuất hóa đơn hàng loạt: số tiến trình vẽ PDF song song và số đơn mỗi lô
+INVOICE_EXPORT_WORKERS = os.cpu_count() or 1
+INVOICE_EXPORT_CHUNK_SIZE = 50
+# Xuất quá số hóa đơn này thì chạy thành job nền thay vì trong request
+INVOICE_EXPORT_INLINE_LIMIT = 50
+# Nhập sản phẩm hàng loạt: file lớn hơn ngưỡng này (byte) được nhập bằng job nền
+PRODUCT_IMPORT_INLINE_BYTES = 1024 * 1024
+
+# Đo hiệu năng từng request (store.middleware.PerfMiddleware): thời gian, số truy vấn SQL,
+# truy vấn lặp lại theo URL name, xem tại /system/perf/ và header Server-Timing.
+# PERF_MONITORING=0 để tắt hẳn (middleware không được nạp).
+PERF_MONITORING = os.environ.get('PERF_MONITORING', '1') == '1'
+PERF_SAMPLE_SIZE = 1000     # số request gần nhất giữ lại cho mỗi URL name, mỗi worker
+PERF_FLUSH_INTERVAL = 10    # số giây giữa các lần ghi số liệu của worker vào cache dùng chung
+PERF_STATS_TIMEOUT = 3600
+
+# Tích điểm khách hàng khi chưa cấu hình LoyaltyRule nào: số tiền (VNĐ) cho mỗi điểm
+LOYALTY_AMOUNT_PER_POINT = 10000
+
+# Luồng sự kiện bán hàng theo quầy (SSE, chạy qua ASGI)
+COUNTER_EVENTS_HEARTBEAT = 15        # giây giữa các nhịp giữ kết nối / đọc lại tổng số
+COUNTER_EVENTS_MAX_SECONDS = 300     # đóng kết nối sau khoảng này, trình duyệt tự kết nối lại
+COUNTER_EVENTS_RETRY_MS = 3000       # thời gian trình duyệt chờ trước khi kết nối lại
+
+# Job nền (bảng Job, chạy bằng `manage.py run_workers`)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_POLL_INTERVAL = 1           # giây chờ khi hàng đợi trống
+JOB_VISIBILITY_TIMEOUT = 600    # quá thời gian này job đang chạy được worker khác nhận lại
+JOB_RETRY_DELAY = 10            # giây chờ trước lần chạy lại đầu tiên, nhân đôi sau mỗi lần lỗi
+JOB_RETENTION_DAYS = 7
+JOB_OUTPUT_DIR = BASE_DIR / 'job_output'
@@ -1,7 +1,7 @@
 # store/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Product, Order, OrderItem, StoreCounter, Debts  # Đổi Counter thành StoreCounter
+from .models import CustomUser, Product, Order, OrderItem, StoreCounter, Debts, DebtTransaction, LoyaltyRule  # Đổi Counter thành StoreCounter
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
@@ -27,4 +27,31 @@ admin.site.register(Product)
 admin.site.register(Order)
 admin.site.register(OrderItem)
 admin.site.register(StoreCounter)  # Đổi Counter thành StoreCounter
-admin.site.register(Debts)
\ No newline at end of file
+
+
+@admin.register(LoyaltyRule)
+class LoyaltyRuleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'min_amount', 'payment_method', 'amount_per_point', 'bonus_points', 'is_active')
+    list_filter = ('is_active', 'payment_method')
+
+
+class DebtTransactionInline(admin.TabularInline):
+    model = DebtTransaction
+    fields = ('created_at', 'reason', 'amount', 'period', 'user')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Debts)
+class DebtsAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'accountant', 'amount', 'interest', 'balance', 'interest_accrued_on', 'updated_at')
+    readonly_fields = ('balance', 'interest_accrued_on')
+    inlines = [DebtTransactionInline]
+
+    def get_readonly_fields(self, request, obj=None):
+        # Số dư chỉ đổi qua sổ nợ: không sửa tiền gốc sau khi đã tạo khoản nợ
+        return self.readonly_fields + (('amount',) if obj else ())
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from itertools import count
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class CounterEventBus:
+    """
+    Bus sự kiện trong tiến trình theo quầy: mỗi kết nối SSE đăng ký một hàng đợi asyncio, signal của Order
+    (chạy ở bất kỳ luồng nào) đẩy sự kiện vào hàng đợi qua event loop của kết nối.
+    Bus chỉ thấy đơn được lưu trong cùng tiến trình; kết nối SSE tự đọc lại tổng số mỗi nhịp heartbeat
+    nên vẫn đúng khi chạy nhiều worker.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._ids = count(1)
+
+    def subscribe(self, counter_id):
+        """Đăng ký nhận sự kiện của quầy; gọi trong event loop của kết nối."""
+        queue = asyncio.Queue(self.max_queue)
+        with self._lock:
+            self._subscribers[counter_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, counter_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(counter_id, set())
+            subscribers.difference_update({item for item in subscribers if item[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(counter_id, None)
+
+    def has_subscribers(self, counter_id):
+        return bool(self._subscribers.get(counter_id))
+
+    def publish(self, counter_id, event_type, data):
+        """Gửi sự kiện tới mọi kết nối của quầy; trả về số kết nối nhận được."""
+        event = (next(self._ids), event_type, data)
+        with self._lock:
+            subscribers = list(self._subscribers.get(counter_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # Event loop đã đóng (kết nối bị ngắt giữa chừng)
+                self.unsubscribe(counter_id, queue)
+        return len(subscribers)
+
+    @staticmethod
+    def _put(queue, event):
+        if queue.full():
+            # Client đọc chậm: bỏ sự kiện cũ nhất, sự kiện totals sau đó vẫn đưa số liệu về đúng
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+
+def format_event(event_type, data, event_id=None):
+    """Một sự kiện theo định dạng text/event-stream."""
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event_type}', f'data: {json.dumps(data, cls=DjangoJSONEncoder)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+counter_events = CounterEventBus()
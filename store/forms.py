@@ -230,3 +230,63 @@ class PaymentForm(forms.Form):
             )
 
         return cleaned_data
+
+
+class InvoiceExportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('zip', 'ZIP (mỗi đơn một file PDF)'),
+        ('pdf', 'Một file PDF gộp'),
+    ]
+
+    start = forms.DateField(
+        label="Từ ngày",
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    end = forms.DateField(
+        label="Đến ngày",
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    counter = forms.ModelChoiceField(
+        queryset=StoreCounter.objects.all(),
+        required=False,
+        label="Quầy",
+        empty_label="Tất cả quầy",
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        initial='zip',
+        label="Định dạng",
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start')
+        end = cleaned_data.get('end')
+        if start and end and start > end:
+            raise forms.ValidationError("Ngày bắt đầu phải trước hoặc bằng ngày kết thúc.")
+        return cleaned_data
+
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(
+        label="File sản phẩm (CSV/XLSX)",
+        help_text="Các cột: slug, name, category, price, stock, description. Dòng có slug trùng sản phẩm có sẵn sẽ được cập nhật.",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    update_existing = forms.BooleanField(
+        label="Cập nhật sản phẩm đã có",
+        required=False,
+        initial=True,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_file(self):
+        from .product_io import format_from_name
+        upload = self.cleaned_data['file']
+        try:
+            self.cleaned_data['format'] = format_from_name(upload.name)
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+        return upload
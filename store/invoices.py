@@ -0,0 +1,319 @@
+import glob
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time as dt_time, timedelta
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from .models import Order, OrderItem
+
+
+class InvoiceRenderer:
+    """
+    Vẽ hóa đơn PDF của một đơn hàng (dùng chung cho mọi view xuất hóa đơn)
+    và lưu cache file PDF trên đĩa theo (id đơn hàng, updated_at).
+    """
+    TABLE_TOP = 600
+    PAGE_TOP = 750
+    PAGE_BOTTOM = 100
+    ROW_HEIGHT = 20
+
+    def __init__(self, order, items):
+        self.order = order
+        self.items = items
+        self.page_count = 0
+
+    @classmethod
+    def load(cls, order_id):
+        """Lấy đơn hàng, khách hàng và các dòng sản phẩm bằng một truy vấn."""
+        renderers = cls.load_many([order_id])
+        if not renderers:
+            raise Order.DoesNotExist(f"Không tìm thấy đơn hàng #{order_id}")
+        return renderers[0]
+
+    @classmethod
+    def load_many(cls, order_ids):
+        """Tạo renderer cho nhiều đơn hàng (theo thứ tự id), chỉ thêm một truy vấn cho đơn không có dòng nào."""
+        grouped = {}
+        items = (
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .select_related('order__customer__user', 'product')
+            .order_by('order_id', 'pk')
+        )
+        for item in items:
+            grouped.setdefault(item.order_id, (item.order, []))[1].append(item)
+        missing = set(order_ids) - set(grouped)
+        if missing:
+            for order in Order.objects.select_related('customer__user').filter(pk__in=missing):
+                grouped[order.pk] = (order, [])
+        return [cls(*grouped[pk]) for pk in sorted(grouped)]
+
+    # Cache trên đĩa
+    @staticmethod
+    def cache_dir():
+        return getattr(settings, 'INVOICE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'invoice_cache'))
+
+    @classmethod
+    def cache_path(cls, order):
+        version = order.updated_at.strftime('%Y%m%d%H%M%S%f') if order.updated_at else '0'
+        return os.path.join(cls.cache_dir(), f"invoice_{order.pk}_{version}.pdf")
+
+    @classmethod
+    def get_or_render(cls, order):
+        """Trả về đường dẫn file PDF của order, chỉ vẽ lại khi đơn hàng đã thay đổi."""
+        path = cls.cache_path(order)
+        if not os.path.exists(path):
+            cls.load(order.pk).write(path)
+        return path
+
+    def write(self, path):
+        """Ghi PDF ra file (ghi file tạm rồi đổi tên) và xóa các phiên bản cũ của đơn hàng."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        data = self.render()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+        for old_path in glob.glob(os.path.join(directory, f"invoice_{self.order.pk}_*.pdf")):
+            if old_path != path:
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+        return path
+
+    # Vẽ PDF
+    def render(self):
+        buffer = BytesIO()
+        p = canvas.Canvas(buffer, pagesize=letter)
+        self.draw(p)
+        p.save()
+        return buffer.getvalue()
+
+    def draw(self, p):
+        """Vẽ hóa đơn lên canvas p (có thể là canvas dùng chung của nhiều hóa đơn)."""
+        self.page_count = 1
+        self._draw_header(p)
+        self._draw_customer_info(p)
+        y = self._draw_table_header(p, self.TABLE_TOP)
+
+        p.setFont("Helvetica", 10)
+        for idx, item in enumerate(self.items, start=1):
+            y -= self.ROW_HEIGHT
+            if y < self.PAGE_BOTTOM:
+                y = self._new_page(p) - self.ROW_HEIGHT
+            p.drawString(100, y, str(idx))
+            p.drawString(150, y, item.product.name)
+            p.drawString(300, y, f"{item.unit_price:,.0f} VNĐ")
+            p.drawString(400, y, str(item.quantity))
+            p.drawString(500, y, f"{item.line_total:,.0f} VNĐ")
+
+        y -= 40
+        if y < self.PAGE_BOTTOM:
+            y = self._new_page(p, with_table_header=False) - 40
+        self._draw_footer(p, y)
+        p.showPage()
+
+    def _new_page(self, p, with_table_header=True):
+        self._draw_page_number(p)
+        p.showPage()
+        self.page_count += 1
+        p.setFont("Helvetica-Bold", 10)
+        p.drawString(100, self.PAGE_TOP + 20, f"HÓA ĐƠN #{self.order.pk:06d} (tiếp)")
+        if not with_table_header:
+            return self.PAGE_TOP
+        y = self._draw_table_header(p, self.PAGE_TOP)
+        p.setFont("Helvetica", 10)
+        return y
+
+    def _draw_header(self, p):
+        """Vẽ phần header hóa đơn"""
+        p.setFont("Helvetica-Bold", 16)
+        p.drawString(100, 750, f"HÓA ĐƠN #{self.order.pk:06d}")
+        p.setFont("Helvetica", 10)
+        p.drawString(100, 730, f"Ngày: {timezone.localtime(self.order.date).strftime('%d/%m/%Y %H:%M')}")
+
+    def _draw_customer_info(self, p):
+        """Vẽ thông tin khách hàng"""
+        order = self.order
+        user = order.customer.user if order.customer else None
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(100, 700, "Thông tin khách hàng:")
+        p.setFont("Helvetica", 10)
+        p.drawString(100, 680, f"Tên: {order.customer_name or (user.get_full_name() or user.username if user else '')}")
+        p.drawString(100, 660, f"Điện thoại: {order.customer_phone or (user.phone if user else '') or ''}")
+        p.drawString(100, 640, f"Địa chỉ: {order.customer_address or (order.customer.address if order.customer else '')}")
+
+    def _draw_table_header(self, p, y):
+        """Vẽ tiêu đề bảng sản phẩm"""
+        p.setFont("Helvetica-Bold", 10)
+        p.drawString(100, y, "STT")
+        p.drawString(150, y, "Sản phẩm")
+        p.drawString(300, y, "Đơn giá")
+        p.drawString(400, y, "Số lượng")
+        p.drawString(500, y, "Thành tiền")
+        p.line(100, y - 10, 550, y - 10)
+        return y - 10
+
+    def _draw_footer(self, p, y):
+        """Vẽ tổng tiền và lời cảm ơn"""
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(400, y, "TỔNG CỘNG:")
+        p.drawString(500, y, f"{self.order.total_amount:,.0f} VNĐ")
+        p.line(400, y - 10, 550, y - 10)
+
+        p.setFont("Helvetica", 8)
+        p.drawString(100, 50, "Cảm ơn quý khách đã mua hàng!")
+        p.drawString(100, 40, "Hẹn gặp lại quý khách trong các dịch vụ tiếp theo")
+        self._draw_page_number(p)
+
+    def _draw_page_number(self, p):
+        p.setFont("Helvetica", 8)
+        p.drawRightString(550, 40, f"Trang {self.page_count}")
+
+
+def _init_export_worker():
+    """Khởi tạo Django trong tiến trình con (cần khi tiến trình được tạo bằng spawn)."""
+    django.setup()
+
+
+def _render_export_chunk(order_ids):
+    """Vẽ hóa đơn của một nhóm đơn hàng vào cache, trả về [(id, đường dẫn, số trang)]."""
+    results = []
+    for renderer in InvoiceRenderer.load_many(order_ids):
+        path = renderer.write(InvoiceRenderer.cache_path(renderer.order))
+        results.append((renderer.order.pk, path, renderer.page_count))
+    return results
+
+
+class InvoiceBatchExporter:
+    """
+    Xuất hóa đơn của nhiều đơn hàng ra một file ZIP (mỗi đơn một PDF) hoặc một PDF gộp.
+    Với ZIP, các hóa đơn chưa có trong cache được vẽ song song bằng ProcessPoolExecutor.
+    """
+    FORMAT_ZIP = 'zip'
+    FORMAT_PDF = 'pdf'
+    FORMATS = (FORMAT_ZIP, FORMAT_PDF)
+
+    def __init__(self, orders, workers=None, chunk_size=None):
+        self.orders = orders
+        self.workers = workers if workers is not None else getattr(
+            settings, 'INVOICE_EXPORT_WORKERS', os.cpu_count() or 1)
+        self.chunk_size = chunk_size or getattr(settings, 'INVOICE_EXPORT_CHUNK_SIZE', 50)
+        # pages/render_seconds chỉ tính hóa đơn được vẽ mới (không tính hóa đơn lấy từ cache)
+        self.stats = {
+            'invoices': 0, 'cached': 0, 'pages': 0, 'seconds': 0.0, 'render_seconds': 0.0, 'pages_per_second': 0.0,
+        }
+
+    @staticmethod
+    def filter_orders(start=None, end=None, counter=None):
+        """Đơn hàng trong khoảng ngày [start, end] (theo giờ địa phương), lọc theo quầy nếu có."""
+        orders = Order.objects.all()
+        if start:
+            orders = orders.filter(date__gte=timezone.make_aware(datetime.combine(start, dt_time.min)))
+        if end:
+            orders = orders.filter(date__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), dt_time.min)))
+        if counter:
+            orders = orders.filter(counter=counter)
+        return orders.order_by('pk')
+
+    @classmethod
+    def content_type(cls, fmt):
+        return 'application/zip' if fmt == cls.FORMAT_ZIP else 'application/pdf'
+
+    def export(self, fileobj, fmt=FORMAT_ZIP):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Định dạng không hỗ trợ: {fmt}")
+        started = time.perf_counter()
+        if fmt == self.FORMAT_ZIP:
+            self.write_zip(fileobj)
+        else:
+            self.write_pdf(fileobj)
+        seconds = time.perf_counter() - started
+        self.stats['seconds'] = seconds
+        render_seconds = self.stats['render_seconds']
+        self.stats['pages_per_second'] = self.stats['pages'] / render_seconds if render_seconds else 0.0
+        return self.stats
+
+    def write_zip(self, fileobj):
+        paths = {}
+        missing = []
+        for order in self.orders.only('pk', 'updated_at').iterator():
+            path = InvoiceRenderer.cache_path(order)
+            if os.path.exists(path):
+                paths[order.pk] = path
+            else:
+                missing.append(order.pk)
+        self.stats['cached'] = len(paths)
+
+        started = time.perf_counter()
+        for pk, path, pages in self._render_missing(missing):
+            paths[pk] = path
+            self.stats['pages'] += pages
+        self.stats['render_seconds'] = time.perf_counter() - started
+
+        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for pk in sorted(paths):
+                archive.write(paths[pk], arcname=f"invoice_{pk:06d}.pdf")
+        self.stats['invoices'] = len(paths)
+
+    def write_pdf(self, fileobj):
+        """Gộp mọi hóa đơn vào một PDF: vẽ tuần tự trên cùng một canvas."""
+        started = time.perf_counter()
+        p = canvas.Canvas(fileobj, pagesize=letter)
+        order_ids = list(self.orders.values_list('pk', flat=True))
+        for chunk in self._chunks(order_ids):
+            for renderer in InvoiceRenderer.load_many(chunk):
+                renderer.draw(p)
+                self.stats['invoices'] += 1
+                self.stats['pages'] += renderer.page_count
+        p.save()
+        self.stats['render_seconds'] = time.perf_counter() - started
+
+    def _render_missing(self, order_ids):
+        chunks = list(self._chunks(order_ids))
+        if self.workers <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                yield from _render_export_chunk(chunk)
+            return
+        # Không để tiến trình con dùng chung kết nối CSDL của tiến trình cha
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_export_worker) as pool:
+            for results in pool.map(_render_export_chunk, chunks):
+                yield from results
+
+    def _chunks(self, order_ids):
+        for start in range(0, len(order_ids), self.chunk_size):
+            yield order_ids[start:start + self.chunk_size]
+
+
+def export_invoices_job(start, end, counter_id=None, fmt=InvoiceBatchExporter.FORMAT_ZIP):
+    """
+    Job nền (JobService.enqueue) xuất hóa đơn ra file trong JOB_OUTPUT_DIR.
+    start/end là chuỗi ngày ISO; trả về đường dẫn file và thống kê để tải về qua trang job.
+    """
+    from .services import JobService
+
+    start, end = date.fromisoformat(start), date.fromisoformat(end)
+    # Job chạy trong tiến trình worker đã có nhiều luồng (pool job, heartbeat): fork thêm tiến trình con
+    # có thể kẹt ở khóa do luồng khác đang giữ, nên vẽ tuần tự
+    exporter = InvoiceBatchExporter(InvoiceBatchExporter.filter_orders(start, end, counter_id), workers=1)
+    fd, path = tempfile.mkstemp(prefix='invoices_', suffix=f'.{fmt}', dir=JobService.output_dir())
+    with os.fdopen(fd, 'wb') as output:
+        stats = exporter.export(output, fmt)
+    return {
+        'file': path,
+        'filename': f"invoices_{start:%Y%m%d}_{end:%Y%m%d}.{fmt}",
+        'content_type': InvoiceBatchExporter.content_type(fmt),
+        **stats,
+    }
@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from store.services import DebtService
+
+
+class Command(BaseCommand):
+    help = (
+        "Cộng lãi một kỳ (Debts.interest % trên số dư) cho mọi khoản nợ còn dư bằng một câu UPDATE và ghi sổ nợ. "
+        "Khoản nợ đã tính lãi kỳ này sẽ bỏ qua nên có thể chạy lại an toàn; chạy một lần mỗi kỳ tính lãi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Kỳ tính lãi (YYYY-MM-DD), mặc định hôm nay")
+
+    def handle(self, *args, **options):
+        try:
+            period = date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        except ValueError:
+            raise CommandError("Ngày phải có dạng YYYY-MM-DD")
+
+        debts, interest = DebtService.accrue_interest(period)
+        self.stdout.write(f"{period}: {debts} khoản nợ, tiền lãi {interest}")
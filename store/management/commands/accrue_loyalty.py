@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from store.services import LoyaltyEngine
+
+
+class Command(BaseCommand):
+    help = (
+        "Tích điểm cho khách hàng từ các đơn đã thanh toán theo bảng LoyaltyRule (mặc định các đơn hôm qua). "
+        "Đơn đã được tích điểm sẽ bỏ qua nên có thể chạy lại an toàn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Ngày cần tích điểm (YYYY-MM-DD), mặc định hôm qua")
+        parser.add_argument('--since', help="Tích điểm mọi ngày từ ngày này (YYYY-MM-DD) đến hôm nay")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            if options['since']:
+                start, end = date.fromisoformat(options['since']), today
+            else:
+                start = end = date.fromisoformat(options['date']) if options['date'] else today - timedelta(days=1)
+        except ValueError:
+            raise CommandError("Ngày phải có dạng YYYY-MM-DD")
+
+        day = start
+        while day <= end:
+            orders, points = LoyaltyEngine.accrue_day(day)
+            self.stdout.write(f"{day}: {orders} đơn, {points} điểm")
+            day += timedelta(days=1)
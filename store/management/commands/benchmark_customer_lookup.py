@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from store.models import CustomUser, Order, Role
+from store.services import CustomerLookupService, PerfStatsService
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo thời gian tra cứu khách theo số điện thoại (CustomerLookupService.by_phone) trên dữ liệu hiện có: "
+        "số của khách có tài khoản, khách vãng lai và số không tồn tại. Mục tiêu p95 dưới 10ms."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=1000, help="Số lần tra cứu")
+        parser.add_argument('--seed', type=int, help="Seed ngẫu nhiên để chọn lại cùng bộ số")
+
+    def handle(self, *args, **options):
+        if options['samples'] < 1:
+            raise CommandError("--samples phải lớn hơn 0")
+        rng = random.Random(options['seed'])
+        phones = self.sample_phones(rng, options['samples'])
+        if not phones:
+            raise CommandError("Không có số điện thoại nào để đo (chạy manage.py seed_store trước)")
+
+        timings, query_counts, found = [], [], 0
+        for phone in phones:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                card = CustomerLookupService.by_phone(phone)
+                timings.append((time.perf_counter() - started) * 1000)
+            query_counts.append(len(captured))
+            found += card is not None
+        timings.sort()
+        query_counts.sort()
+        self.stdout.write(
+            f"{len(phones)} lần tra cứu, {found} tìm thấy: "
+            f"p50 {PerfStatsService.percentile(timings, 50):.2f}ms, "
+            f"p95 {PerfStatsService.percentile(timings, 95):.2f}ms, "
+            f"p99 {PerfStatsService.percentile(timings, 99):.2f}ms, "
+            f"max {timings[-1]:.2f}ms, truy vấn/lần {query_counts[0]}-{query_counts[-1]}"
+        )
+
+    def sample_phones(self, rng, samples):
+        """Chọn ngẫu nhiên theo khoảng pk (không ORDER BY RANDOM() trên bảng lớn)."""
+        phones = []
+        members = CustomUser.objects.filter(role=Role.CUSTOMER).exclude(phone_normalized='')
+        walk_ins = Order.objects.filter(customer__isnull=True).exclude(customer_phone_normalized='')
+        for queryset, field, share in ((members, 'phone', 0.6), (walk_ins, 'customer_phone', 0.3)):
+            bounds = queryset.order_by('pk').values_list('pk', flat=True)
+            first, last = bounds.first(), bounds.last()
+            if first is None:
+                continue
+            for _ in range(int(samples * share)):
+                phone = queryset.filter(pk__gte=rng.randint(first, last)).order_by('pk').values_list(field, flat=True).first()
+                if phone:
+                    phones.append(phone)
+        # Số không tồn tại (khách mới)
+        phones += [f"08{rng.randint(0, 99999999):08d}" for _ in range(samples - len(phones))]
+        rng.shuffle(phones)
+        return phones
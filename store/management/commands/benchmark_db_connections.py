@@ -0,0 +1,76 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo chi phí kết nối CSDL trên mỗi request: mô phỏng vòng đời request (request_started, "
+        "một truy vấn, request_finished) với kết nối mới mỗi request và với kết nối giữ lại"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Số request mô phỏng cho mỗi chế độ")
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        connection = connections[alias]
+        settings_dict = connection.settings_dict
+        original = (settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'])
+        self.stdout.write(
+            f"ENGINE={settings_dict['ENGINE']} CONN_MAX_AGE={original[0]} CONN_HEALTH_CHECKS={original[1]}"
+        )
+
+        pooled = getattr(settings, 'DB_POOL', False) and alias == 'default'
+        modes = [
+            ("Kết nối mới mỗi request (CONN_MAX_AGE=0%s)" % (", ODBC pool" if pooled else ""), 0, False),
+            ("Giữ kết nối (CONN_MAX_AGE=None)", None, False),
+            ("Giữ kết nối + health check", None, True),
+        ]
+        try:
+            for label, max_age, health_checks in modes:
+                settings_dict['CONN_MAX_AGE'] = max_age
+                settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+                result = self.measure(alias, options['requests'])
+                self.stdout.write(
+                    f"{label:<45} {result['mean']:7.2f}ms/request  p95={result['p95']:7.2f}ms  "
+                    f"kết nối mở={result['connects']}"
+                )
+        finally:
+            connection.close()
+            settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'] = original
+
+    def measure(self, alias, count):
+        connection = connections[alias]
+        connection.close()
+        connects = []
+
+        def on_connect(sender, connection, **kwargs):
+            if connection.alias == alias:
+                connects.append(1)
+
+        connection_created.connect(on_connect)
+        timings = []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                request_finished.send(sender=self.__class__)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection_created.disconnect(on_connect)
+        timings.sort()
+        return {
+            'mean': statistics.mean(timings),
+            'p95': timings[int(len(timings) * 0.95) - 1],
+            'connects': len(connects),
+        }
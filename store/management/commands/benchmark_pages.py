@@ -0,0 +1,187 @@
+import json
+import logging
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from store.invoices import InvoiceRenderer
+from store.models import Customer, CustomUser, Order, OrderItem, Product, Role
+from store.services import CartService, CatalogCacheService, DashboardStatsService
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo thời gian phản hồi các trang chính (dashboard, danh sách đơn hàng, báo cáo doanh số, "
+        "thanh toán, hóa đơn PDF) bằng Django test client và xuất báo cáo JSON để so sánh giữa các phiên bản. "
+        "Mọi thay đổi dữ liệu trong lúc đo (vd. đơn hàng tạo khi thanh toán) được rollback."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help="Số lần gọi mỗi trang")
+        parser.add_argument('--page', action='append', dest='pages', help="Chỉ đo trang có tên này")
+        parser.add_argument('--output', help="Ghi báo cáo JSON vào file (mặc định in ra màn hình)")
+        parser.add_argument('--compare', help="File JSON của lần đo trước để so sánh")
+        parser.add_argument('--threshold', type=float, default=20, help="Ngưỡng chậm hơn (%%) bị coi là hồi quy")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat phải lớn hơn 0")
+        pages = self.get_pages()
+        if options['pages']:
+            unknown = set(options['pages']) - set(pages)
+            if unknown:
+                raise CommandError(f"Không có trang: {', '.join(sorted(unknown))}")
+            pages = {name: pages[name] for name in options['pages']}
+
+        # Lỗi 500 đã được ghi vào cột status, không in traceback cho từng lần gọi
+        request_logger = logging.getLogger('django.request')
+        request_logger.disabled = True
+        try:
+            results = self.run_pages(pages, options['repeat'])
+        finally:
+            request_logger.disabled = False
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'git_commit': self.git_commit(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'rows': {
+                'products': Product.objects.count(),
+                'orders': Order.objects.count(),
+                'order_items': OrderItem.objects.count(),
+                'customers': Customer.objects.count(),
+            },
+            'pages': results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            Path(options['output']).write_text(output, encoding='utf-8')
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            self.compare(report, json.loads(Path(options['compare']).read_text(encoding='utf-8')), options['threshold'])
+
+        failed = [name for name, result in results.items() if 'error' in result]
+        if failed:
+            raise CommandError(f"Trang lỗi (không đo thời gian): {', '.join(failed)}")
+
+    def run_pages(self, pages, repeat):
+        results = {}
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(INVOICE_CACHE_DIR=cache_dir):
+            with transaction.atomic():
+                for name, page in pages.items():
+                    results[name] = result = self.measure(page, repeat)
+                    if 'skipped' in result:
+                        self.stderr.write(f"{name:<20} bỏ qua: {result['skipped']}")
+                        continue
+                    if 'error' in result:
+                        self.stderr.write(self.style.ERROR(f"{name:<20} LỖI: {result['error']}"))
+                        continue
+                    self.stderr.write(
+                        f"{name:<20} median={result['median_ms']:8.1f}ms  "
+                        f"queries={result['queries']}  status={result['status']}"
+                    )
+                transaction.set_rollback(True)
+        return results
+
+    def get_pages(self):
+        """Tên trang -> (vai trò đăng nhập, hàm trả về URL, hàm chuẩn bị trước mỗi lần gọi, method)."""
+        order_id = OrderItem.objects.order_by('-pk').values_list('order_id', flat=True).first()
+        order = Order.objects.filter(pk=order_id).first()
+        products = list(Product.objects.filter(stock__gt=0).order_by('-stock').values_list('pk', flat=True)[:2])
+
+        def fill_cart(user):
+            for pk in products:
+                CartService.update_item(user, pk, 1)
+
+        def drop_invoice_cache(user):
+            if order:
+                Path(InvoiceRenderer.cache_path(Order.objects.get(pk=order.pk))).unlink(missing_ok=True)
+
+        invoice_url = lambda: reverse('store:main-order-invoice', args=[order.pk]) if order else None
+        return {
+            'dashboard': (Role.STORE_MANAGER, lambda: reverse('store:dashboard'), None, 'get'),
+            'order_list': (Role.STORE_MANAGER, lambda: reverse('store:main-order-list'), None, 'get'),
+            'sales_report': (Role.ACCOUNTANT, lambda: reverse('store:sales-report'), None, 'get'),
+            'checkout': (Role.SALES_STAFF, lambda: reverse('store:sales-checkout') if products else None, fill_cart, 'post'),
+            'invoice_pdf': (Role.STORE_MANAGER, invoice_url, drop_invoice_cache, 'get'),
+            'invoice_pdf_cached': (Role.STORE_MANAGER, invoice_url, None, 'get'),
+        }
+
+    def measure(self, page, repeat):
+        role, get_url, prepare, method = page
+        url = get_url()
+        user = CustomUser.objects.filter(role=role, is_active=True).order_by('pk').first()
+        if url is None or user is None:
+            return {'skipped': "Thiếu dữ liệu (chạy manage.py seed_store trước)"}
+
+        client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        client.force_login(user)
+        # Lần gọi đầu đo khi cache trống (first_ms), các lần sau đo trạng thái ổn định
+        DashboardStatsService.invalidate()
+        CatalogCacheService.invalidate_products()
+        timings = []
+        status = size = queries = None
+        for _ in range(repeat):
+            if prepare:
+                prepare(user)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, method)(url)
+                content = b''.join(response.streaming_content) if response.streaming else response.content
+                timings.append((time.perf_counter() - started) * 1000)
+            status, size, queries = response.status_code, len(content), len(captured)
+            if status != 200:
+                # Trang lỗi/chuyển hướng trả về nhanh hơn trang thật: không đo, không so sánh
+                return {'url': url, 'status': status, 'queries': queries, 'error': f"HTTP {status}"}
+
+        steady = sorted(timings[1:]) or timings
+        return {
+            'url': url,
+            'status': status,
+            'bytes': size,
+            'queries': queries,
+            'first_ms': round(timings[0], 2),
+            'median_ms': round(statistics.median(steady), 2),
+            'p95_ms': round(steady[max(0, int(len(steady) * 0.95) - 1)], 2),
+            'min_ms': round(steady[0], 2),
+            'max_ms': round(steady[-1], 2),
+        }
+
+    def compare(self, report, baseline, threshold):
+        self.stdout.write(f"\nSo với {baseline.get('git_commit') or baseline.get('generated_at')}:")
+        for name, current in report['pages'].items():
+            previous = baseline.get('pages', {}).get(name)
+            if 'error' in current:
+                self.stdout.write(self.style.ERROR(f"  {name:<20} LỖI {current['error']}, không so sánh"))
+                continue
+            if not previous or 'median_ms' not in previous or 'median_ms' not in current:
+                continue
+            change = (current['median_ms'] - previous['median_ms']) / previous['median_ms'] * 100 if previous['median_ms'] else 0
+            line = (
+                f"  {name:<20} {previous['median_ms']:8.1f}ms -> {current['median_ms']:8.1f}ms ({change:+.0f}%)  "
+                f"queries {previous['queries']} -> {current['queries']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if change > threshold else line)
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
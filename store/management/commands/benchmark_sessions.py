@@ -0,0 +1,81 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from store.models import CustomUser, Product, Role
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_READ = re.compile(r'^\s*SELECT\b.*\bdjango_session\b', re.IGNORECASE | re.DOTALL)
+SESSION_WRITE = re.compile(r'^\s*(INSERT|UPDATE|DELETE|MERGE)\b.*\bdjango_session\b', re.IGNORECASE | re.DOTALL)
+
+
+class Command(BaseCommand):
+    help = (
+        "Đếm số lần đọc/ghi bảng django_session trên mỗi request với từng SESSION_ENGINE, "
+        "bằng một kịch bản bán hàng (dashboard, danh mục, thêm/sửa/xóa giỏ hàng). Dữ liệu được rollback."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engine', action='append', dest='engines', choices=sorted(ENGINES),
+                            help="Engine cần đo (mặc định tất cả)")
+        parser.add_argument('--cart-clicks', type=int, default=10, help="Số lần thêm sản phẩm vào giỏ")
+        parser.add_argument('--username', help="Tài khoản dùng để đo (mặc định nhân viên bán hàng đầu tiên)")
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.filter(is_active=True)
+        user = (
+            users.filter(username=options['username']).first() if options['username']
+            else users.filter(role=Role.SALES_STAFF).order_by('pk').first()
+        )
+        if user is None:
+            raise CommandError("Không tìm thấy tài khoản để đo (chạy manage.py seed_store trước)")
+        products = list(Product.objects.filter(stock__gt=0).order_by('pk').values_list('pk', flat=True)[:options['cart_clicks']])
+        if not products:
+            raise CommandError("Cần ít nhất một sản phẩm còn hàng")
+
+        self.stdout.write(f"{'engine':<16}{'requests':>9}{'đọc':>8}{'ghi':>8}{'ghi/request':>13}{'ms/request':>12}")
+        for name in options['engines'] or ENGINES:
+            with override_settings(SESSION_ENGINE=ENGINES[name]), transaction.atomic():
+                result = self.run_flow(user, products)
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f"{name:<16}{result['requests']:>9}{result['reads']:>8}{result['writes']:>8}"
+                f"{result['writes'] / result['requests']:>13.2f}{result['ms'] / result['requests']:>12.1f}"
+            )
+
+    def run_flow(self, user, products):
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        steps = [('get', reverse('store:dashboard'), None), ('get', reverse('store:product_list'), None)]
+        steps += [('get', reverse('store:add-to-cart', args=[pk]), None) for pk in products]
+        steps += [
+            ('get', reverse('store:cart'), None),
+            ('post', reverse('store:update-cart', args=[products[0]]), {'quantity': 2}),
+            ('get', reverse('store:remove-from-cart', args=[products[-1]]), None),
+            ('get', reverse('store:cart'), None),
+        ]
+
+        reads = writes = 0
+        started = time.perf_counter()
+        for method, url, data in steps:
+            with CaptureQueriesContext(connection) as captured:
+                getattr(client, method)(url, data)
+            for query in captured:
+                reads += bool(SESSION_READ.match(query['sql']))
+                writes += bool(SESSION_WRITE.match(query['sql']))
+        return {
+            'requests': len(steps),
+            'reads': reads,
+            'writes': writes,
+            'ms': (time.perf_counter() - started) * 1000,
+        }
@@ -0,0 +1,92 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from store.models import Category, CustomUser, Order, OrderItem, Product, StoreCounter
+
+# Dấu hiệu quét toàn bảng / sắp xếp thêm trong kế hoạch thực thi của từng CSDL.
+# Với SQLite, "SCAN ... USING INDEX" là đọc theo thứ tự index kèm LIMIT nên không bị đánh dấu.
+SCAN_PATTERNS = {
+    'sqlite': re.compile(r'SCAN (?!.*USING (COVERING )?INDEX)|USE TEMP B-TREE'),
+    'microsoft': re.compile(r'Table Scan|Clustered Index Scan|\|--Sort\('),
+    'postgresql': re.compile(r'Seq Scan|Sort  \('),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Chạy EXPLAIN (SHOWPLAN với SQL Server) cho các truy vấn nóng của views và đánh dấu "
+        "những truy vấn phải quét bảng hoặc sắp xếp thêm"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', action='append', dest='queries', help="Chỉ chạy truy vấn có tên này")
+        parser.add_argument('--fail-on-scan', action='store_true', help="Báo lỗi nếu có truy vấn bị đánh dấu")
+
+    def handle(self, *args, **options):
+        queries = self.hot_queries()
+        if options['queries']:
+            unknown = set(options['queries']) - set(queries)
+            if unknown:
+                raise CommandError(f"Không có truy vấn: {', '.join(sorted(unknown))}")
+            queries = {name: queries[name] for name in options['queries']}
+
+        flagged = []
+        for name, queryset in queries.items():
+            plan = self.explain(queryset)
+            pattern = SCAN_PATTERNS.get(connection.vendor)
+            hits = [line for line in plan if pattern and pattern.search(line)]
+            status = self.style.WARNING("QUÉT/SẮP XẾP") if hits else self.style.SUCCESS("OK")
+            self.stdout.write(f"\n== {name}: {status}")
+            for line in plan:
+                self.stdout.write(f"   {'!' if line in hits else ' '} {line}")
+            if hits:
+                flagged.append(name)
+
+        self.stdout.write(f"\n{len(queries) - len(flagged)}/{len(queries)} truy vấn dùng index")
+        if flagged and options['fail_on_scan']:
+            raise CommandError(f"Truy vấn quét bảng: {', '.join(flagged)}")
+
+    def hot_queries(self):
+        """Các truy vấn giống views/services, dùng giá trị mẫu lấy từ dữ liệu hiện có."""
+        user_id = CustomUser.objects.values_list('pk', flat=True).first() or 0
+        counter_id = StoreCounter.objects.values_list('pk', flat=True).first() or 0
+        category_id = Category.objects.values_list('pk', flat=True).first() or 0
+        item = OrderItem.objects.values('order_id', 'product_id').first() or {'order_id': 0, 'product_id': 0}
+        today = timezone.now()
+        page = 11  # paginate_by + 1 của phân trang keyset
+
+        return {
+            'order_list': Order.objects.select_related('customer__user', 'counter').order_by('-date', '-id')[:page],
+            'sales_order_list': Order.objects.filter(created_by_id=user_id).order_by('-date', '-id')[:page],
+            'counter_pending_orders': Order.objects.filter(counter_id=counter_id, order_status='pending').order_by().values('pk'),
+            'orders_by_date_range': Order.objects.filter(
+                date__gte=today - timedelta(days=30), date__lt=today
+            ).values('pk', 'updated_at'),
+            'catalog_by_name': Product.objects.order_by('name', 'id')[:page],
+            'catalog_by_category': Product.objects.filter(category_id=category_id).order_by('name', 'id')[:page],
+            'inventory_by_stock': Product.objects.order_by('-stock', '-id')[:page],
+            'low_stock_products': Product.objects.filter(stock__lt=5).order_by().values('pk'),
+            'order_item_lookup': OrderItem.objects.filter(order_id=item['order_id'], product_id=item['product_id']),
+        }
+
+    def explain(self, queryset):
+        if connection.vendor != 'microsoft':
+            return queryset.explain().splitlines()
+        # mssql-django không hỗ trợ QuerySet.explain(), dùng SHOWPLAN_TEXT
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("SET SHOWPLAN_TEXT ON")
+            try:
+                cursor.execute(sql, params)
+                lines = []
+                while True:
+                    lines.extend(row[0] for row in cursor.fetchall())
+                    if not cursor.nextset():
+                        break
+            finally:
+                cursor.execute("SET SHOWPLAN_TEXT OFF")
+        return [line for chunk in lines for line in chunk.splitlines() if line.strip()]
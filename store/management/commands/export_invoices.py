@@ -0,0 +1,55 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.invoices import InvoiceBatchExporter
+from store.models import StoreCounter
+
+
+class Command(BaseCommand):
+    help = "Xuất hóa đơn PDF của nhiều đơn hàng ra một file ZIP hoặc một file PDF gộp"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Đường dẫn file kết quả (.zip hoặc .pdf)")
+        parser.add_argument('--start', help="Từ ngày (YYYY-MM-DD)")
+        parser.add_argument('--end', help="Đến ngày (YYYY-MM-DD)")
+        parser.add_argument('--counter', type=int, help="Chỉ xuất đơn hàng của quầy có id này")
+        parser.add_argument('--format', choices=InvoiceBatchExporter.FORMATS, default=InvoiceBatchExporter.FORMAT_ZIP)
+        parser.add_argument('--workers', type=int, help="Số tiến trình vẽ PDF song song (mặc định INVOICE_EXPORT_WORKERS)")
+        parser.add_argument('--chunk-size', type=int, help="Số đơn hàng mỗi lô gửi cho một tiến trình")
+
+    def handle(self, *args, **options):
+        start = self._parse_date(options, 'start')
+        end = self._parse_date(options, 'end')
+        if start and end and start > end:
+            raise CommandError("--start phải trước hoặc bằng --end")
+
+        counter = None
+        if options['counter']:
+            try:
+                counter = StoreCounter.objects.get(pk=options['counter'])
+            except StoreCounter.DoesNotExist:
+                raise CommandError(f"Không tìm thấy quầy #{options['counter']}")
+
+        exporter = InvoiceBatchExporter(
+            InvoiceBatchExporter.filter_orders(start, end, counter),
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+        )
+        with open(options['output'], 'wb') as output:
+            stats = exporter.export(output, options['format'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xuất {stats['invoices']} hóa đơn ({stats['cached']} lấy từ cache) vào {options['output']} "
+            f"trong {stats['seconds']:.2f}s; vẽ mới {stats['pages']} trang trong {stats['render_seconds']:.2f}s "
+            f"({stats['pages_per_second']:.1f} trang/giây)"
+        ))
+
+    @staticmethod
+    def _parse_date(options, name):
+        if not options[name]:
+            return None
+        try:
+            return date.fromisoformat(options[name])
+        except ValueError:
+            raise CommandError(f"--{name} phải có dạng YYYY-MM-DD")
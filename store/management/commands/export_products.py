@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.product_io import FORMAT_CSV, FORMAT_XLSX, FORMATS, ProductExporter
+
+
+class Command(BaseCommand):
+    help = "Xuất toàn bộ sản phẩm ra CSV/XLSX theo định dạng cột của import_products."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default=FORMAT_CSV, help="Định dạng file")
+        parser.add_argument('--output', '-o', help="File kết quả (mặc định ghi CSV ra stdout)")
+
+    def handle(self, *args, **options):
+        exporter = ProductExporter()
+        if options['format'] == FORMAT_XLSX:
+            if not options['output']:
+                raise CommandError("Xuất XLSX cần --output")
+            try:
+                with open(options['output'], 'wb') as output:
+                    exporter.write_xlsx(output)
+            except ValueError as e:
+                raise CommandError(str(e))
+        elif options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(exporter.stream_csv())
+        else:
+            for line in exporter.stream_csv():
+                self.stdout.write(line, ending='')
+            return
+        self.stdout.write(self.style.SUCCESS(f"Đã xuất sản phẩm ra {options['output']}"))
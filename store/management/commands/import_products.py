@@ -0,0 +1,40 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.product_io import FORMATS, ProductImporter, format_from_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Nhập sản phẩm hàng loạt từ file CSV/XLSX (cột: slug, name, category, price, stock, description). "
+        "Dòng có slug trùng sản phẩm có sẵn được cập nhật, danh mục chưa có được tạo mới."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Đường dẫn file CSV/XLSX")
+        parser.add_argument('--format', choices=FORMATS, help="Định dạng file (mặc định theo phần mở rộng)")
+        # SQL Server giới hạn 2100 tham số mỗi câu lệnh nên lô mặc định nhỏ hơn mức đó
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Số dòng ghi mỗi lô")
+        parser.add_argument('--no-update', action='store_true', help="Bỏ qua dòng trùng slug sản phẩm có sẵn")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size phải lớn hơn 0")
+        if not os.path.isfile(options['path']):
+            raise CommandError(f"Không tìm thấy file {options['path']}")
+        try:
+            fmt = options['format'] or format_from_name(options['path'])
+            importer = ProductImporter(chunk_size=options['chunk_size'], update_existing=not options['no_update'])
+            with open(options['path'], 'rb') as fileobj:
+                stats = importer.import_file(fileobj, fmt)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for error in stats['errors']:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã nhập {stats['rows']} dòng: {stats['created']} mới, {stats['updated']} cập nhật, "
+            f"{stats['unchanged']} không đổi, {stats['skipped']} bỏ qua "
+            f"({stats['seconds']:.1f}s, {stats['rows'] / max(stats['seconds'], 1e-9):.0f} dòng/giây)"
+        ))
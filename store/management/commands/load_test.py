@@ -0,0 +1,161 @@
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo số request/giây của dashboard và danh sách sản phẩm. Mặc định tự chạy Gunicorn "
+        "với từng số worker trong --workers để so sánh; dùng --url để đo một server đang chạy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="Tài khoản đăng nhập để gọi các trang cần login")
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--url', help="Địa chỉ server đang chạy, vd. http://localhost:8000 (bỏ qua --workers)")
+        parser.add_argument('--workers', default='1,2,4', help="Danh sách số worker Gunicorn, vd. 1,2,4")
+        parser.add_argument('--worker-class', default='sync', help="sync hoặc uvicorn.workers.UvicornWorker")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--concurrency', type=int, default=16, help="Số kết nối gửi request đồng thời")
+        parser.add_argument('--duration', type=float, default=10, help="Thời gian đo mỗi trang (giây)")
+        parser.add_argument('--path', action='append', dest='paths', help="Trang cần đo (mặc định dashboard và danh sách sản phẩm)")
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or [reverse('store:dashboard'), reverse('store:product_list')]
+        if options['url']:
+            self.run_suite(options['url'], paths, options, label='-')
+            return
+
+        try:
+            worker_counts = [int(n) for n in options['workers'].split(',')]
+        except ValueError:
+            raise CommandError("--workers phải là danh sách số nguyên, vd. 1,2,4")
+        for count in worker_counts:
+            server = self.start_gunicorn(count, options)
+            try:
+                self.run_suite(f"http://127.0.0.1:{options['port']}", paths, options, label=count)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    def start_gunicorn(self, workers, options):
+        env = dict(
+            os.environ,
+            WEB_CONCURRENCY=str(workers),
+            GUNICORN_WORKER_CLASS=options['worker_class'],
+            GUNICORN_ACCESS_LOG='',
+            GUNICORN_LOG_LEVEL='warning',
+            DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'JSSMS.settings'),
+        )
+        app = 'JSSMS.asgi:application' if 'uvicorn' in options['worker_class'] else 'JSSMS.wsgi:application'
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', os.path.join(settings.BASE_DIR, 'JSSMS', 'gunicorn.conf.py'),
+             '--bind', f"127.0.0.1:{options['port']}", app],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError("Gunicorn dừng ngay khi khởi động")
+            try:
+                socket.create_connection(('127.0.0.1', options['port']), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError("Gunicorn không khởi động được trong 30 giây")
+
+    def run_suite(self, base_url, paths, options, label):
+        target = urlsplit(base_url)
+        cookie = self.login(target, options['username'], options['password'])
+        for path in paths:
+            result = self.run_load(target, path, cookie, options['concurrency'], options['duration'])
+            self.stdout.write(
+                f"workers={label:<3} {path:<20} {result['rps']:8.1f} req/s  "
+                f"p50={result['p50']:6.1f}ms  p95={result['p95']:6.1f}ms  "
+                f"requests={result['requests']}  errors={result['errors']}"
+            )
+
+    def login(self, target, username, password):
+        """Đăng nhập qua form login, trả về chuỗi Cookie (csrftoken + sessionid)."""
+        cookies = SimpleCookie()
+        conn = HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        login_url = reverse('store:login')
+        conn.request('GET', login_url)
+        response = conn.getresponse()
+        response.read()
+        cookies.load(response.getheader('Set-Cookie', ''))
+        token = cookies['csrftoken'].value if 'csrftoken' in cookies else ''
+
+        body = urlencode({'username': username, 'password': password, 'csrfmiddlewaretoken': token})
+        conn.request('POST', login_url, body=body, headers={
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Cookie': f'csrftoken={token}',
+            'Referer': f"{target.scheme}://{target.netloc}{login_url}",
+        })
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookies.load(header)
+        if response.status != 302 or 'sessionid' not in cookies:
+            raise CommandError("Đăng nhập thất bại, kiểm tra --username/--password")
+        return '; '.join(f'{key}={morsel.value}' for key, morsel in cookies.items())
+
+    def run_load(self, target, path, cookie, concurrency, duration):
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def client():
+            conn = HTTPConnection(target.hostname, target.port or 80, timeout=30)
+            local, failed = [], 0
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', path, headers={'Cookie': cookie})
+                    response = conn.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        # Lỗi/chuyển hướng trả về nhanh: không tính vào độ trễ và req/s
+                        failed += 1
+                        continue
+                except OSError:
+                    failed += 1
+                    conn.close()
+                    conn = HTTPConnection(target.hostname, target.port or 80, timeout=30)
+                    continue
+                local.append((time.perf_counter() - started) * 1000)
+            conn.close()
+            with lock:
+                latencies.extend(local)
+                errors[0] += failed
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'errors': errors[0],
+            'rps': len(latencies) / elapsed if elapsed else 0.0,
+            'p50': statistics.median(latencies) if latencies else 0.0,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+        }
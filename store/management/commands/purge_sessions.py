@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+# Các engine lưu session trong bảng django_session
+DB_ENGINES = {
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Xóa session đã hết hạn khỏi bảng django_session theo từng lô nhỏ (thay cho clearsessions "
+        "xóa một lần cả bảng), để không khóa bảng lâu khi hệ thống đang chạy. Nên chạy định kỳ."
+    )
+
+    def add_arguments(self, parser):
+        # SQL Server giới hạn 2100 tham số mỗi câu lệnh nên lô mặc định nhỏ hơn mức đó
+        parser.add_argument('--batch-size', type=int, default=2000, help="Số session xóa mỗi lô")
+        parser.add_argument('--sleep', type=float, default=0.1, help="Số giây nghỉ giữa các lô")
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ đếm số session hết hạn")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size phải lớn hơn 0")
+        if settings.SESSION_ENGINE not in DB_ENGINES:
+            self.stdout.write(
+                f"SESSION_ENGINE={settings.SESSION_ENGINE} không lưu session trong CSDL, "
+                "vẫn kiểm tra bảng django_session còn sót dữ liệu cũ"
+            )
+
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        if options['dry_run']:
+            self.stdout.write(f"{expired.count()} session hết hạn / {Session.objects.count()} session")
+            return
+
+        started = time.perf_counter()
+        deleted = batches = 0
+        while True:
+            # Lấy khóa theo index expire_date rồi xóa theo khóa chính, mỗi lô là một transaction ngắn
+            keys = list(expired.order_by('expire_date').values_list('pk', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(pk__in=keys).delete()[0]
+            batches += 1
+            if len(keys) < options['batch_size']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xóa {deleted} session hết hạn trong {batches} lô ({time.perf_counter() - started:.1f}s)"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from store.services import CustomerStatsService
+
+
+class Command(BaseCommand):
+    help = "Tính lại bảng thống kê mua hàng CustomerStats của khách hàng từ các đơn đã thanh toán"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customer', type=int, action='append', dest='customers',
+                            help="Chỉ tính lại cho khách hàng này (id, có thể lặp lại)")
+
+    def handle(self, *args, **options):
+        count = CustomerStatsService.refresh(options['customers'])
+        self.stdout.write(self.style.SUCCESS(f"Đã tạo {count} dòng thống kê khách hàng"))
@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.services import SalesRollupService
+
+
+class Command(BaseCommand):
+    help = "Tính lại bảng tổng hợp doanh số DailySalesRollup từ dữ liệu đơn hàng"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help="Chỉ tính lại từ ngày này (YYYY-MM-DD); mặc định tính lại toàn bộ",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since phải có dạng YYYY-MM-DD")
+
+        count = SalesRollupService.rebuild(since=since, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Đã tạo {count} dòng tổng hợp doanh số"))
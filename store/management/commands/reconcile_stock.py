@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from store.models import Product
+from store.services import CatalogCacheService
+
+
+class Command(BaseCommand):
+    help = (
+        "Đối chiếu tồn kho (Product.stock) với tổng sổ kho StockMovement bằng một truy vấn gộp, "
+        "báo cáo các sản phẩm lệch và (với --fix) đặt lại tồn kho theo sổ kho"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Cập nhật Product.stock bằng số dư trong sổ kho")
+        parser.add_argument('--fail-on-drift', action='store_true', help="Báo lỗi nếu có sản phẩm lệch (dùng cho CI/cron)")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        drifted = list(
+            Product.objects.annotate(ledger=Coalesce(Sum('stock_movements__delta'), 0))
+            .exclude(stock=F('ledger'))
+            .order_by('pk')
+            .values_list('pk', 'name', 'stock', 'ledger')
+        )
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Tồn kho khớp sổ kho"))
+            return
+
+        for pk, name, stock, ledger in drifted:
+            self.stdout.write(f"#{pk:<8} {name[:40]:<40} tồn kho={stock:<8} sổ kho={ledger:<8} lệch={stock - ledger:+d}")
+        self.stdout.write(self.style.WARNING(f"{len(drifted)} sản phẩm lệch"))
+
+        if options['fix']:
+            negative = [pk for pk, _, _, ledger in drifted if ledger < 0]
+            if negative:
+                raise CommandError(f"Sổ kho âm, cần kiểm tra thủ công: {', '.join(map(str, negative))}")
+            with transaction.atomic():
+                Product.objects.bulk_update(
+                    [Product(pk=pk, stock=ledger) for pk, _, _, ledger in drifted],
+                    ['stock'], batch_size=options['batch_size'],
+                )
+            transaction.on_commit(CatalogCacheService.invalidate_stock)
+            self.stdout.write(self.style.SUCCESS(f"Đã đặt lại tồn kho của {len(drifted)} sản phẩm theo sổ kho"))
+        elif options['fail_on_drift']:
+            raise CommandError(f"{len(drifted)} sản phẩm lệch giữa tồn kho và sổ kho")
@@ -0,0 +1,105 @@
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from store.services import JobService
+
+
+def _init_process_worker():
+    """Khởi tạo Django trong tiến trình con (cần khi tiến trình được tạo bằng spawn)."""
+    django.setup()
+
+
+def _run_job(pk, worker):
+    """Chạy một job trong luồng/tiến trình của pool, quản lý kết nối CSDL như một request."""
+    close_old_connections()
+    try:
+        return JobService.run(pk, worker)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        "Chạy các job nền trong bảng Job (xuất hóa đơn, báo cáo...) bằng pool luồng hoặc tiến trình. "
+        "Có thể chạy nhiều lệnh này song song trên nhiều máy, mỗi job chỉ được một worker nhận."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'JOB_WORKERS', 2),
+                            help="Số job chạy đồng thời (0 = chạy tuần tự trong tiến trình chính)")
+        parser.add_argument('--processes', action='store_true', help="Dùng pool tiến trình thay cho pool luồng")
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'JOB_POLL_INTERVAL', 1),
+                            help="Số giây chờ khi hàng đợi trống")
+        parser.add_argument('--once', action='store_true', help="Thoát khi hàng đợi trống")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 0:
+            raise CommandError("--workers không được âm")
+        self.worker = f"{socket.gethostname()}-{os.getpid()}"
+        self.stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self.stopping.set())
+
+        self.stdout.write(f"Worker {self.worker}: {options['workers']} job đồng thời"
+                          f"{' (tiến trình)' if options['processes'] else ''}")
+        if options['workers'] == 0:
+            self.run_inline(options)
+            return
+
+        if options['processes']:
+            # Tiến trình con không được dùng chung kết nối CSDL với tiến trình cha
+            connections.close_all()
+            pool = ProcessPoolExecutor(options['workers'], initializer=_init_process_worker)
+        else:
+            pool = ThreadPoolExecutor(options['workers'], thread_name_prefix='job')
+        running = set()
+        try:
+            while not self.stopping.is_set():
+                running = {future for future in running if not future.done()}
+                free = options['workers'] - len(running)
+                claimed = JobService.claim(self.worker, free) if free else []
+                for pk in claimed:
+                    running.add(pool.submit(_run_job, pk, self.worker))
+                if claimed:
+                    self.stdout.write(f"Nhận job {', '.join(map(str, claimed))}")
+                    continue
+                if options['once'] and not running:
+                    break
+                self.purge_if_due()
+                self.stopping.wait(options['poll_interval'])
+        finally:
+            # Chờ các job đang chạy xong; job chưa nhận vẫn nằm trong hàng đợi
+            pool.shutdown(wait=True)
+
+    def run_inline(self, options):
+        while not self.stopping.is_set():
+            claimed = JobService.claim(self.worker, 1)
+            if claimed:
+                status = JobService.run(claimed[0], self.worker)
+                self.stdout.write(f"Job {claimed[0]}: {status}")
+                continue
+            if options['once']:
+                break
+            self.purge_if_due()
+            self.stopping.wait(options['poll_interval'])
+
+    def purge_if_due(self):
+        """Mỗi giờ xóa các job đã kết thúc quá JOB_RETENTION_DAYS ngày."""
+        if time.monotonic() - getattr(self, 'last_purge', float('-inf')) < 3600:
+            return
+        self.last_purge = time.monotonic()
+        days = getattr(settings, 'JOB_RETENTION_DAYS', 7)
+        deleted = JobService.purge(timezone.now() - timedelta(days=days))
+        if deleted:
+            self.stdout.write(f"Đã xóa {deleted} job cũ hơn {days} ngày")
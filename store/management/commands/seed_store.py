@@ -0,0 +1,216 @@
+import random
+import secrets
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from store.models import (Category, Customer, CustomUser, LoyaltyTransaction, Order, OrderItem,
+                          Product, Role, StockMovement, StoreCounter)
+from store.services import (CatalogCacheService, CustomerStatsService, DashboardStatsService,
+                            ProductSearchService, SalesRollupService)
+from store.utils import normalize_phone, normalize_search_text
+
+CATEGORIES = ['Nhẫn', 'Dây chuyền', 'Bông tai', 'Lắc tay', 'Vòng cổ', 'Mặt dây', 'Đồng hồ', 'Trâm cài']
+MATERIALS = ['vàng 18K', 'vàng 24K', 'vàng trắng', 'bạc 925', 'bạch kim']
+STYLES = ['đính kim cương', 'ngọc trai', 'trơn', 'khắc hoa', 'đá ruby', 'đá sapphire', 'cẩm thạch']
+LAST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Phan', 'Vũ', 'Đặng', 'Bùi', 'Đỗ']
+FIRST_NAMES = ['An', 'Bình', 'Chi', 'Dũng', 'Giang', 'Hà', 'Hùng', 'Lan', 'Linh', 'Minh', 'Nam', 'Thảo', 'Trang', 'Tuấn']
+CITIES = ['Hà Nội', 'TP. Hồ Chí Minh', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ', 'Huế', 'Nha Trang']
+STATUSES = [('paid', 70), ('pending', 20), ('canceled', 5), ('refunded', 5)]
+PAYMENT_METHODS = ['cash', 'credit_card', 'bank_transfer']
+
+
+class Command(BaseCommand):
+    help = (
+        "Sinh dữ liệu giả lập quy mô lớn (danh mục, sản phẩm, quầy, nhân viên, khách hàng, "
+        "đơn hàng) bằng bulk_create theo lô, để đo hiệu năng như dữ liệu thật"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--counters', type=int, default=10)
+        parser.add_argument('--customers', type=int, help="Mặc định bằng 1/10 số đơn hàng")
+        parser.add_argument('--days', type=int, default=90, help="Rải ngày tạo đơn trong N ngày gần nhất")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--password', default='seed12345', help="Mật khẩu của mọi tài khoản được sinh")
+        parser.add_argument('--seed', type=int, help="Seed ngẫu nhiên để sinh lại cùng bộ dữ liệu")
+
+    def handle(self, *args, **options):
+        for name in ('products', 'orders', 'counters'):
+            if options[name] < 0:
+                raise CommandError(f"--{name} không được âm")
+        if options['orders'] and not (options['products'] and options['counters']):
+            raise CommandError("Cần ít nhất một sản phẩm và một quầy để sinh đơn hàng")
+
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        # Hậu tố riêng cho mỗi lần chạy để username/slug không trùng dữ liệu đã có
+        self.tag = secrets.token_hex(3) if options['seed'] is None else f"s{options['seed']}"
+        self.password = make_password(options['password'])
+        customers_count = options['customers'] if options['customers'] is not None else options['orders'] // 10
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            categories = self.create_categories()
+            products = self.create_products(categories, options['products'])
+            manager, accountant = self.create_users([
+                (f"seed_{self.tag}_manager", Role.STORE_MANAGER),
+                (f"seed_{self.tag}_accountant", Role.ACCOUNTANT),
+            ])
+            counters = self.create_counters(manager, products, options['counters'])
+            customers = self.create_customers(customers_count)
+            order_count, item_count = self.create_orders(counters, customers, options['orders'], options['days'])
+
+        ProductSearchService.rebuild_index(Product.objects.filter(pk__in=[p.pk for p in products]))
+        SalesRollupService.rebuild()
+        CustomerStatsService.refresh()
+        DashboardStatsService.invalidate()
+        CatalogCacheService.invalidate_products()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã sinh {len(products)} sản phẩm, {len(counters)} quầy, {len(customers)} khách hàng, "
+            f"{order_count} đơn hàng ({item_count} dòng) trong {time.perf_counter() - started:.1f}s. "
+            f"Tài khoản: {manager.username}, {accountant.username}, seed_{self.tag}_staff_<n>"
+        ))
+
+    def bulk_create(self, model, objs):
+        """bulk_create theo lô; nạp lại pk nếu backend không trả về pk sau khi insert."""
+        if not objs:
+            return []
+        last_pk = model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        created = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        if created[0].pk is not None:
+            return created
+        return list(model.objects.filter(pk__gt=last_pk).order_by('pk'))
+
+    def create_categories(self):
+        categories = []
+        for name in CATEGORIES:
+            slug = slugify(normalize_search_text(name))
+            category = Category.objects.filter(Q(name=name) | Q(slug=slug)).first()
+            categories.append(category or Category.objects.create(name=name, slug=slug))
+        return categories
+
+    def create_products(self, categories, count):
+        products = []
+        for i in range(count):
+            category = self.random.choice(categories)
+            name = f"{category.name} {self.random.choice(MATERIALS)} {self.random.choice(STYLES)} {i + 1}"
+            products.append(Product(
+                name=name[:100],
+                slug=f"{slugify(normalize_search_text(name))}-{self.tag}",
+                price=Decimal(self.random.randrange(50, 5000) * 10000),
+                stock=self.random.randint(0, 50),
+                category=category,
+            ))
+        products = self.bulk_create(Product, products)
+        # bulk_create không phát signal, tự ghi tồn đầu kỳ vào sổ kho
+        StockMovement.objects.bulk_create([
+            StockMovement(product_id=product.pk, delta=product.stock, reason=StockMovement.Reason.INITIAL)
+            for product in products if product.stock
+        ], batch_size=self.batch_size)
+        return products
+
+    def create_users(self, accounts):
+        users = [
+            CustomUser(
+                username=username,
+                password=self.password,
+                role=role,
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                phone=f"09{self.random.randint(0, 99999999):08d}",
+            )
+            for username, role in accounts
+        ]
+        # bulk_create không gọi save(), tự chuẩn hóa số điện thoại
+        for user in users:
+            user.phone_normalized = normalize_phone(user.phone)
+        CustomUser.objects.bulk_create(users, batch_size=self.batch_size)
+        by_username = CustomUser.objects.in_bulk([username for username, _ in accounts], field_name='username')
+        return [by_username[username] for username, _ in accounts]
+
+    def create_counters(self, manager, products, count):
+        staff = self.create_users([(f"seed_{self.tag}_staff_{i + 1}", Role.SALES_STAFF) for i in range(count)])
+        counters = self.bulk_create(StoreCounter, [
+            StoreCounter(location=f"Quầy {i + 1} - {self.random.choice(CITIES)}", manager=manager, assigned_employee=employee)
+            for i, employee in enumerate(staff)
+        ])
+        # Mỗi quầy bày bán khoảng 1/3 số sản phẩm
+        through = StoreCounter.products.through
+        size = max(1, len(products) // 3) if products else 0
+        through.objects.bulk_create([
+            through(storecounter_id=counter.pk, product_id=product.pk)
+            for counter in counters
+            for product in self.random.sample(products, size)
+        ], batch_size=self.batch_size)
+        for counter in counters:
+            counter.product_ids = list(counter.products.values_list('pk', flat=True))
+        return counters
+
+    def create_customers(self, count):
+        users = self.create_users([(f"seed_{self.tag}_customer_{i + 1}", Role.CUSTOMER) for i in range(count)])
+        customers = []
+        for user in users:
+            points = self.random.randint(0, 2000)
+            customers.append(Customer(
+                user=user,
+                address=f"{self.random.randint(1, 300)} đường số {self.random.randint(1, 50)}, {self.random.choice(CITIES)}",
+                loyalty_points=points,
+                tier=Customer.tier_for(points),
+            ))
+        Customer.objects.bulk_create(customers, batch_size=self.batch_size)
+        # Điểm ban đầu ghi vào sổ điểm để tổng sổ khớp loyalty_points
+        LoyaltyTransaction.objects.bulk_create([
+            LoyaltyTransaction(customer=customer, points=customer.loyalty_points,
+                               reason=LoyaltyTransaction.Reason.ADJUSTMENT)
+            for customer in customers if customer.loyalty_points
+        ], batch_size=self.batch_size)
+        return users
+
+    def create_orders(self, counters, customers, count, days):
+        prices = dict(Product.objects.filter(
+            pk__in={pk for counter in counters for pk in counter.product_ids}
+        ).values_list('pk', 'price'))
+        statuses, weights = zip(*STATUSES)
+        now = timezone.now()
+        item_count = 0
+        for start in range(0, count, self.batch_size):
+            orders, lines = [], []
+            for _ in range(min(self.batch_size, count - start)):
+                counter = self.random.choice(counters)
+                chosen = self.random.sample(counter.product_ids, min(len(counter.product_ids), self.random.randint(1, 5)))
+                order_lines = [(pk, self.random.randint(1, 3)) for pk in chosen]
+                walk_in = not customers or self.random.random() < 0.3
+                orders.append(Order(
+                    date=now - timedelta(seconds=self.random.randint(0, days * 86400)),
+                    order_status=self.random.choices(statuses, weights)[0],
+                    payment_method=self.random.choice(PAYMENT_METHODS),
+                    total_amount=sum(prices[pk] * quantity for pk, quantity in order_lines),
+                    counter=counter,
+                    created_by=counter.assigned_employee,
+                    customer_id=None if walk_in else self.random.choice(customers).pk,
+                    customer_name=f"{self.random.choice(LAST_NAMES)} {self.random.choice(FIRST_NAMES)}" if walk_in else None,
+                    customer_phone=f"09{self.random.randint(0, 99999999):08d}" if walk_in else None,
+                ))
+                orders[-1].customer_phone_normalized = normalize_phone(orders[-1].customer_phone)
+                lines.append(order_lines)
+
+            orders = self.bulk_create(Order, orders)
+            items = [
+                OrderItem(order_id=order.pk, product_id=pk, quantity=quantity,
+                          unit_price=prices[pk], line_total=prices[pk] * quantity)
+                for order, order_lines in zip(orders, lines)
+                for pk, quantity in order_lines
+            ]
+            OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+            item_count += len(items)
+        return count, item_count
@@ -0,0 +1,65 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .services import PerfStatsService
+
+# Gộp danh sách tham số (vd. IN (%s, %s, %s)) để cùng một truy vấn có chung fingerprint
+_PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+class QueryRecorder:
+    """execute_wrapper đếm số truy vấn, tổng thời gian và số lần chạy của từng câu SQL."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[_PLACEHOLDER_LIST.sub('%s, ...', sql)] += 1
+
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+class PerfMiddleware:
+    """
+    Ghi thời gian xử lý, số truy vấn SQL, thời gian SQL và các truy vấn lặp lại của mỗi request
+    theo URL name (xem PerfStatsService), đồng thời trả về header Server-Timing.
+    Tắt bằng PERF_MONITORING = False: middleware tự gỡ khỏi chuỗi xử lý khi khởi động.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_MONITORING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - started) * 1000
+        sql_ms = recorder.duration * 1000
+
+        response['Server-Timing'] = (
+            f'app;dur={wall_ms:.1f}, sql;dur={sql_ms:.1f};desc="{recorder.count} queries"'
+        )
+        match = request.resolver_match
+        if match is not None:
+            PerfStatsService.record(match.view_name, wall_ms, recorder.count, sql_ms, recorder.duplicates())
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_category_alter_product_options_remove_product_orders_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Ngày')),
+                ('payment_method', models.CharField(blank=True, default='', max_length=20, verbose_name='Phương thức thanh toán')),
+                ('order_status', models.CharField(max_length=50, verbose_name='Trạng thái đơn hàng')),
+                ('order_count', models.IntegerField(default=0, verbose_name='Số đơn')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Tổng tiền')),
+                ('counter', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='store.storecounter', verbose_name='Quầy')),
+            ],
+            options={
+                'verbose_name': 'Tổng hợp doanh số ngày',
+                'verbose_name_plural': 'Tổng hợp doanh số ngày',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day', 'order_status'], name='store_rollup_day_status_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'counter', 'payment_method', 'order_status'), name='unique_daily_sales_rollup'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from store.utils import normalize_search_text, search_tokens
+
+
+def build_search_index(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    ProductSearchToken = apps.get_model('store', 'ProductSearchToken')
+    batch_size = 1000
+    last_pk = 0
+    while True:
+        products = list(Product.objects.filter(pk__gt=last_pk).only('pk', 'name').order_by('pk')[:batch_size])
+        if not products:
+            break
+        for product in products:
+            product.search_name = normalize_search_text(product.name)
+        Product.objects.bulk_update(products, ['search_name'])
+        ProductSearchToken.objects.bulk_create([
+            ProductSearchToken(product=product, token=token, position=position)
+            for product in products
+            for position, token in enumerate(search_tokens(product.name))
+        ])
+        last_pk = products[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_name',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='Tên không dấu (tìm kiếm)'),
+        ),
+        migrations.CreateModel(
+            name='ProductSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=50)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='store.product')),
+            ],
+            options={
+                'verbose_name': 'Token tìm kiếm sản phẩm',
+                'verbose_name_plural': 'Token tìm kiếm sản phẩm',
+                'indexes': [models.Index(fields=['token', 'product'], name='store_search_token_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productsearchtoken',
+            constraint=models.UniqueConstraint(fields=('product', 'token'), name='unique_product_search_token'),
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
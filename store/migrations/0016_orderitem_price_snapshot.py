@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:38
+
+from django.db import migrations, models
+
+
+def backfill_prices(apps, schema_editor):
+    OrderItem = apps.get_model('store', 'OrderItem')
+    batch_size = 1000
+    last_pk = 0
+    while True:
+        items = list(
+            OrderItem.objects.filter(pk__gt=last_pk)
+            .select_related('product')
+            .only('pk', 'quantity', 'product__price')
+            .order_by('pk')[:batch_size]
+        )
+        if not items:
+            break
+        for item in items:
+            item.unit_price = item.product.price
+            item.line_total = item.product.price * item.quantity
+        OrderItem.objects.bulk_update(items, ['unit_price', 'line_total'])
+        last_pk = items[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Thành tiền'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Đơn giá'),
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:49
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_order_items(apps, schema_editor):
+    """Gộp các dòng trùng (order, product) thành một dòng trước khi thêm ràng buộc unique."""
+    OrderItem = apps.get_model('store', 'OrderItem')
+    duplicates = (
+        OrderItem.objects.values('order_id', 'product_id')
+        .annotate(rows=Count('pk'), keep_pk=Min('pk'), total_quantity=Sum('quantity'), total=Sum('line_total'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        OrderItem.objects.filter(pk=group['keep_pk']).update(
+            quantity=group['total_quantity'], line_total=group['total']
+        )
+        OrderItem.objects.filter(
+            order_id=group['order_id'], product_id=group['product_id']
+        ).exclude(pk=group['keep_pk']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='order',
+            options={'ordering': ['-date', '-id'], 'verbose_name': 'Đơn hàng', 'verbose_name_plural': 'Đơn hàng'},
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-date', '-id'], name='store_order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_by', '-date', '-id'], name='store_order_creator_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['counter', 'order_status'], name='store_order_counter_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'name', 'id'], name='store_product_cat_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='store_product_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock', 'id'], name='store_product_stock_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_order_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'product'), name='unique_order_item_product'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_cart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('func', models.CharField(max_length=200, verbose_name='Hàm thực thi')),
+                ('args', models.JSONField(blank=True, default=list)),
+                ('kwargs', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Đang chờ'), ('running', 'Đang chạy'), ('succeeded', 'Hoàn thành'), ('failed', 'Thất bại')], default='queued', max_length=20, verbose_name='Trạng thái')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Kết quả')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Lỗi')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Số lần chạy')),
+                ('max_attempts', models.PositiveIntegerField(default=3, verbose_name='Số lần chạy tối đa')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Chạy từ lúc')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Công việc nền',
+                'verbose_name_plural': 'Công việc nền',
+                'indexes': [models.Index(fields=['status', 'run_at'], name='store_job_status_run_at_idx'), models.Index(fields=['status', 'locked_until'], name='store_job_status_locked_idx')],
+            },
+        ),
+    ]
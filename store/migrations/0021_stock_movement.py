@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_opening_balances(apps, schema_editor):
+    """Ghi tồn đầu kỳ bằng tồn kho hiện tại để tổng sổ kho khớp Product.stock."""
+    Product = apps.get_model('store', 'Product')
+    StockMovement = apps.get_model('store', 'StockMovement')
+    batch = []
+    for pk, stock in Product.objects.filter(stock__gt=0).values_list('pk', 'stock').iterator(chunk_size=1000):
+        batch.append(StockMovement(product_id=pk, delta=stock, reason='initial'))
+        if len(batch) >= 1000:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    StockMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField(verbose_name='Thay đổi')),
+                ('reason', models.CharField(choices=[('initial', 'Tồn đầu kỳ'), ('sale', 'Bán hàng'), ('order_edit', 'Sửa đơn hàng'), ('cancel', 'Hủy đơn'), ('refund', 'Hoàn trả'), ('adjustment', 'Điều chỉnh'), ('import', 'Nhập kho')], max_length=20, verbose_name='Lý do')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='store.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='store.product')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Biến động kho',
+                'verbose_name_plural': 'Biến động kho',
+                'indexes': [models.Index(fields=['product', 'created_at'], name='store_stockmove_product_idx')],
+            },
+        ),
+        migrations.RunPython(create_opening_balances, migrations.RunPython.noop),
+    ]
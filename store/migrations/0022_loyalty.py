@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:18
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_tiers_and_balances(apps, schema_editor):
+    """Tính hạng theo điểm hiện có và ghi số dư đầu kỳ vào sổ điểm để tổng sổ khớp loyalty_points."""
+    Customer = apps.get_model('store', 'Customer')
+    LoyaltyTransaction = apps.get_model('store', 'LoyaltyTransaction')
+    Customer.objects.update(tier=models.Case(
+        models.When(loyalty_points__gt=1000, then=models.Value('vip')),
+        models.When(loyalty_points__gt=500, then=models.Value('loyal')),
+        default=models.Value('new'),
+    ))
+    batch = []
+    for pk, points in Customer.objects.exclude(loyalty_points=0).values_list('pk', 'loyalty_points').iterator(chunk_size=1000):
+        batch.append(LoyaltyTransaction(customer_id=pk, points=points, reason='adjustment'))
+        if len(batch) >= 1000:
+            LoyaltyTransaction.objects.bulk_create(batch)
+            batch = []
+    LoyaltyTransaction.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_stock_movement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoyaltyRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Tên quy tắc')),
+                ('min_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Tổng tiền tối thiểu')),
+                ('payment_method', models.CharField(blank=True, choices=[('cash', 'Tiền mặt'), ('credit_card', 'Thẻ tín dụng'), ('bank_transfer', 'Chuyển khoản')], default='', help_text='Để trống để áp dụng cho mọi phương thức', max_length=20, verbose_name='Phương thức thanh toán')),
+                ('amount_per_point', models.DecimalField(decimal_places=2, default=10000, max_digits=12, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Số tiền cho mỗi điểm')),
+                ('bonus_points', models.IntegerField(default=0, verbose_name='Điểm thưởng thêm mỗi đơn')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Đang áp dụng')),
+            ],
+            options={
+                'verbose_name': 'Quy tắc tích điểm',
+                'verbose_name_plural': 'Quy tắc tích điểm',
+                'ordering': ['-min_amount', 'pk'],
+            },
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='tier',
+            field=models.CharField(choices=[('new', 'Mới'), ('loyal', 'Thân thiết'), ('vip', 'VIP')], db_index=True, default='new', editable=False, max_length=10, verbose_name='Hạng khách hàng'),
+        ),
+        migrations.CreateModel(
+            name='LoyaltyTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(verbose_name='Điểm')),
+                ('reason', models.CharField(choices=[('earn', 'Tích điểm đơn hàng'), ('revert', 'Hoàn điểm đơn trả'), ('adjustment', 'Điều chỉnh')], max_length=20, verbose_name='Lý do')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Thời điểm')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='loyalty_transactions', to='store.customer', verbose_name='Khách hàng')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loyalty_transactions', to='store.order', verbose_name='Đơn hàng')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Người thực hiện')),
+            ],
+            options={
+                'verbose_name': 'Giao dịch điểm tích lũy',
+                'verbose_name_plural': 'Sổ điểm tích lũy',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['customer', '-created_at'], name='store_loyalty_customer_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='loyaltytransaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('order__isnull', False)), fields=('order', 'reason'), name='unique_loyalty_order_reason'),
+        ),
+        migrations.RunPython(backfill_tiers_and_balances, migrations.RunPython.noop),
+    ]
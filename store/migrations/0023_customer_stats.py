@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+
+def build_customer_stats(apps, schema_editor):
+    """Tính thống kê ban đầu từ các đơn đã thanh toán (giống CustomerStatsService.refresh)."""
+    Order = apps.get_model('store', 'Order')
+    CustomerStats = apps.get_model('store', 'CustomerStats')
+    orders = Order.objects.filter(order_status='paid', customer__isnull=False)
+    favourites = {}
+    for row in (orders.filter(counter__isnull=False).values('customer_id', 'counter_id')
+                .annotate(order_count=models.Count('id'), last=models.Max('date')).order_by()):
+        key = (row['order_count'], row['last'])
+        if row['customer_id'] not in favourites or key > favourites[row['customer_id']][0]:
+            favourites[row['customer_id']] = (key, row['counter_id'])
+    rows = orders.values('customer_id').annotate(
+        total=models.Sum('total_amount'), order_count=models.Count('id'), last=models.Max('date')
+    ).order_by()
+    CustomerStats.objects.bulk_create([
+        CustomerStats(
+            customer_id=row['customer_id'],
+            total_spent=row['total'] or 0,
+            order_count=row['order_count'],
+            last_order_date=row['last'],
+            favourite_counter_id=favourites.get(row['customer_id'], (None, None))[1],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0022_loyalty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='store.customer', verbose_name='Khách hàng')),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Tổng chi tiêu')),
+                ('order_count', models.IntegerField(default=0, verbose_name='Số đơn đã thanh toán')),
+                ('last_order_date', models.DateTimeField(blank=True, null=True, verbose_name='Đơn gần nhất')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('favourite_counter', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.storecounter', verbose_name='Quầy mua nhiều nhất')),
+            ],
+            options={
+                'verbose_name': 'Thống kê mua hàng của khách',
+                'verbose_name_plural': 'Thống kê mua hàng của khách',
+                'indexes': [models.Index(fields=['-total_spent'], name='store_custstats_spent_idx')],
+            },
+        ),
+        migrations.RunPython(build_customer_stats, migrations.RunPython.noop),
+    ]
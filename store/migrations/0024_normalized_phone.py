@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+from store.utils import normalize_phone
+
+
+def normalize_phones(apps, schema_editor):
+    batch_size = 1000
+    for model_name, field, target in (('CustomUser', 'phone', 'phone_normalized'),
+                                      ('Order', 'customer_phone', 'customer_phone_normalized')):
+        Model = apps.get_model('store', model_name)
+        rows = Model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+        last_pk = 0
+        while True:
+            objs = list(rows.filter(pk__gt=last_pk).only('pk', field).order_by('pk')[:batch_size])
+            if not objs:
+                break
+            for obj in objs:
+                setattr(obj, target, normalize_phone(getattr(obj, field)))
+            Model.objects.bulk_update(objs, [target])
+            last_pk = objs[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_customer_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=16, verbose_name='Số điện thoại (chuẩn hóa)'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='customer_phone_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16, verbose_name='Số điện thoại (chuẩn hóa)'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer_phone_normalized', '-date'], name='store_order_phone_date_idx'),
+        ),
+        migrations.RunPython(normalize_phones, migrations.RunPython.noop),
+    ]
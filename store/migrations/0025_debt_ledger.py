@@ -0,0 +1,74 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:27
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_balances(apps, schema_editor):
+    """Số dư ban đầu bằng số tiền hiện có (pay_debt cũ trừ thẳng vào amount), ghi thành dòng nợ gốc trong sổ."""
+    Debts = apps.get_model('store', 'Debts')
+    DebtTransaction = apps.get_model('store', 'DebtTransaction')
+    Debts.objects.update(balance=models.F('amount'))
+    batch = []
+    for pk, balance in Debts.objects.exclude(balance=0).values_list('pk', 'balance').iterator(chunk_size=1000):
+        batch.append(DebtTransaction(debt_id=pk, amount=balance, reason='opening'))
+        if len(batch) >= 1000:
+            DebtTransaction.objects.bulk_create(batch)
+            batch = []
+    DebtTransaction.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0024_normalized_phone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='debts',
+            name='balance',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Số dư'),
+        ),
+        migrations.AddField(
+            model_name='debts',
+            name='interest_accrued_on',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Ngày tính lãi gần nhất'),
+        ),
+        migrations.AlterField(
+            model_name='debts',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Số tiền gốc'),
+        ),
+        migrations.AlterField(
+            model_name='debts',
+            name='interest',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Lãi suất mỗi kỳ (%)'),
+        ),
+        migrations.CreateModel(
+            name='DebtTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Số tiền')),
+                ('reason', models.CharField(choices=[('opening', 'Nợ gốc'), ('interest', 'Tiền lãi'), ('payment', 'Trả nợ'), ('adjustment', 'Điều chỉnh')], max_length=20, verbose_name='Lý do')),
+                ('period', models.DateField(blank=True, null=True, verbose_name='Kỳ tính lãi')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Thời điểm')),
+                ('debt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='store.debts', verbose_name='Khoản nợ')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Người thực hiện')),
+            ],
+            options={
+                'verbose_name': 'Giao dịch nợ',
+                'verbose_name_plural': 'Sổ nợ',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['debt', '-created_at'], name='store_debttx_debt_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='debttransaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('reason', 'interest')), fields=('debt', 'period'), name='unique_debt_interest_period'),
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
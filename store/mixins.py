@@ -2,8 +2,10 @@
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.shortcuts import redirect
+from django.utils.functional import SimpleLazyObject
 
 from store.models import Role
+from store.pagination import KeysetPaginator
 
 class RoleRequiredMixin(UserPassesTestMixin):
     role = None
@@ -36,4 +38,28 @@ class SalesStaffRequiredMixin(UserPassesTestMixin):
 
 class AdminOrManagerRequiredMixin(UserPassesTestMixin):
     def test_func(self):
-        return self.request.user.role in [Role.ADMIN, Role.STORE_MANAGER]
\ No newline at end of file
+        return self.request.user.role in [Role.ADMIN, Role.STORE_MANAGER]
+
+class KeysetPaginationMixin:
+    """
+    Thay phân trang OFFSET của ListView bằng phân trang theo khóa (xem KeysetPaginator).
+    keyset_ordering phải kết thúc bằng một trường duy nhất, vd. ('-date', '-id').
+    Đặt keyset_count_limit để hiển thị tổng số dòng gần đúng (đếm tối đa N dòng).
+    """
+    keyset_ordering = ('-id',)
+    keyset_count_limit = None
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(
+            queryset,
+            self.get_keyset_ordering(),
+            page_size,
+            params=self.request.GET,
+            count_limit=self.keyset_count_limit,
+        )
+        # Trang chỉ truy vấn khi template dùng tới (fragment cache có thể bỏ qua truy vấn)
+        page = paginator.get_page(self.request.GET.get(paginator.cursor_param), lazy=True)
+        return paginator, page, page, SimpleLazyObject(page.has_other_pages)
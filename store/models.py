@@ -1,8 +1,14 @@
+from collections import Counter
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+
+from .utils import normalize_phone, normalize_search_text, search_tokens
 
 class Role(models.TextChoices):
     ADMIN = 'admin', 'Admin'
@@ -14,6 +20,11 @@ class Role(models.TextChoices):
 
 class CustomUser(AbstractUser):
     phone = models.CharField(max_length=20, blank=True, null=True)
+    # Số điện thoại dạng E.164 (chỉ số, có mã quốc gia) để tra cứu khách theo số điện thoại bằng index
+    phone_normalized = models.CharField(
+        max_length=16, blank=True, default='', editable=False, db_index=True,
+        verbose_name="Số điện thoại (chuẩn hóa)"
+    )
     role = models.CharField(
         max_length=20,
         choices=Role.choices,
@@ -34,6 +45,13 @@ class CustomUser(AbstractUser):
         if self.role == Role.customer and not (self.phone and self.email):
             raise ValidationError("Khách hàng cần có số điện thoại và email hợp lệ")
 
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'phone_normalized'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
 
@@ -45,6 +63,14 @@ class CustomUser(AbstractUser):
         self.save()
 
 class Customer(models.Model):
+    class Tier(models.TextChoices):
+        NEW = 'new', 'Mới'
+        LOYAL = 'loyal', 'Thân thiết'
+        VIP = 'vip', 'VIP'
+
+    # (số điểm phải vượt quá, hạng), xét từ cao xuống thấp
+    TIER_THRESHOLDS = [(1000, Tier.VIP), (500, Tier.LOYAL)]
+
     user = models.OneToOneField(
         CustomUser,
         on_delete=models.CASCADE,
@@ -53,21 +79,57 @@ class Customer(models.Model):
     )
     address = models.TextField()
     loyalty_points = models.IntegerField(default=0)
+    # Hạng khách hàng lưu sẵn (theo loyalty_points) để tra cứu/lọc VIP tại quầy không phải tính lại
+    tier = models.CharField(
+        max_length=10, choices=Tier.choices, default=Tier.NEW, db_index=True, editable=False,
+        verbose_name="Hạng khách hàng"
+    )
     registration_date = models.DateField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        self.tier = self.tier_for(self.loyalty_points)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'loyalty_points' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'tier'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def tier_for(cls, points):
+        for threshold, tier in cls.TIER_THRESHOLDS:
+            if points > threshold:
+                return tier
+        return cls.Tier.NEW
+
+    @classmethod
+    def tier_expression(cls):
+        """Biểu thức SQL tính hạng từ loyalty_points, dùng cho UPDATE hàng loạt."""
+        return models.Case(
+            *(models.When(loyalty_points__gt=threshold, then=models.Value(tier)) for threshold, tier in cls.TIER_THRESHOLDS),
+            default=models.Value(cls.Tier.NEW),
+        )
+
     def get_purchase_history(self):
         return Order.objects.filter(customer=self).order_by('-date')
 
-    def update_loyalty_points(self, points: int):
-        self.loyalty_points += points
-        self.save()
+    def update_loyalty_points(self, points: int, user=None):
+        """Cộng/trừ điểm thủ công bằng UPDATE F() và ghi vào sổ điểm (không lưu lại cả dòng)."""
+        from .services import LoyaltyEngine  # Tránh import vòng
+
+        LoyaltyEngine.adjust(self, points, user=user)
 
     def get_customer_status(self):
-        if self.loyalty_points > 1000:
-            return "VIP"
-        elif self.loyalty_points > 500:
-            return "Thân thiết"
-        return "Mới"
+        return self.get_tier_display()
+
+    @property
+    def total_purchases(self):
+        """Tổng chi tiêu đọc từ CustomerStats (nên select_related('stats')), không cộng lại lịch sử đơn."""
+        stats = getattr(self, 'stats', None)
+        return stats.total_spent if stats else 0
+
+    @property
+    def last_purchase(self):
+        stats = getattr(self, 'stats', None)
+        return stats.last_order_date if stats else None
 
     def __str__(self):
         return f"{self.user.username} - {self.get_customer_status()}"
@@ -107,29 +169,87 @@ class Product(models.Model):
     category = models.ForeignKey(
         Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="products", verbose_name="Danh mục"
     )
+    search_name = models.CharField(
+        max_length=255, blank=True, default='', editable=False, db_index=True,
+        verbose_name="Tên không dấu (tìm kiếm)"
+    )
 
     class Meta:
         verbose_name = "Sản phẩm"
         verbose_name_plural = "Danh sách sản phẩm"
         ordering = ['name']
+        indexes = [
+            # Danh mục sản phẩm bán hàng: lọc theo danh mục, sắp xếp theo tên (sales_products)
+            models.Index(fields=['category', 'name', 'id'], name='store_product_cat_name_idx'),
+            # Danh sách mặc định theo tên (Meta.ordering, sales_products không lọc)
+            models.Index(fields=['name', 'id'], name='store_product_name_idx'),
+            # Tồn kho: sắp xếp theo tồn kho (InventoryView) và lọc hàng sắp hết (stock__lt)
+            models.Index(fields=['stock', 'id'], name='store_product_stock_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            base_slug = slugify(self.name)
-            unique_slug = base_slug
-            counter = 1
-            while Product.objects.filter(slug=unique_slug).exists():
-                unique_slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = unique_slug
+            self.slug = Product.unique_slugs([self.name])[0]
+
+        search_name = normalize_search_text(self.name)
+        reindex = self._state.adding or search_name != self.search_name
+        self.search_name = search_name
+        update_fields = kwargs.get('update_fields')
+        if reindex and update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'search_name'}
         super().save(*args, **kwargs)
-
-    def update_stock(self, quantity: int) -> bool:
-        """Cập nhật số lượng tồn kho."""
-        if quantity < 0 and self.stock < abs(quantity):
-            return False  # Không đủ hàng
-        self.stock += quantity
-        self.save()
+        if reindex:
+            ProductSearchToken.index_products([self])
+
+    @classmethod
+    def unique_slugs(cls, names, reserved=None):
+        """
+        Sinh slug duy nhất cho danh sách tên bằng vài truy vấn gộp (thay vì kiểm tra exists() từng slug).
+        reserved: tập slug đã dùng thêm (vd. các slug vừa sinh trong cùng lần nhập), được cập nhật tại chỗ.
+        """
+        bases = [slugify(normalize_search_text(name))[:200] or 'san-pham' for name in names]
+        taken = reserved if reserved is not None else set()
+        distinct = sorted(set(bases))
+        # Chia lô để không vượt giới hạn 2100 tham số của SQL Server
+        for start in range(0, len(distinct), 1000):
+            taken.update(cls.objects.filter(slug__in=distinct[start:start + 1000]).values_list('slug', flat=True))
+        # Chỉ slug gốc đã có (hoặc lặp lại trong danh sách) mới cần tìm các hậu tố -1, -2... đã dùng;
+        # lô nhỏ để biểu thức OR không quá sâu (SQLite)
+        counts = Counter(bases)
+        clashing = [base for base in distinct if base in taken or counts[base] > 1]
+        for start in range(0, len(clashing), 200):
+            lookup = models.Q()
+            for base in clashing[start:start + 200]:
+                lookup |= models.Q(slug__startswith=f'{base}-')
+            taken.update(cls.objects.filter(lookup).values_list('slug', flat=True))
+
+        slugs = []
+        next_suffix = {}
+        for base in bases:
+            slug = base
+            suffix = next_suffix.get(base, 1)
+            while slug in taken:
+                slug = f'{base}-{suffix}'
+                suffix += 1
+            next_suffix[base] = suffix
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def update_stock(self, quantity: int, reason=None, user=None) -> bool:
+        """Cập nhật số lượng tồn kho và ghi sổ kho (mặc định lý do điều chỉnh)."""
+        from .exceptions import InsufficientStockError
+        from .services import StockReservationService  # Tránh import vòng
+
+        reason = reason or StockMovement.Reason.ADJUSTMENT
+        if quantity > 0:
+            StockReservationService.release_stock([(self, quantity)], reason, user=user)
+        elif quantity < 0:
+            try:
+                StockReservationService.reserve_stock([(self, -quantity)], reason, user=user)
+            except InsufficientStockError:
+                return False  # Không đủ hàng
+        self.refresh_from_db(fields=['stock'])
         return True
 
     def set_price(self, new_price: float):
@@ -160,6 +280,42 @@ class Product(models.Model):
     def __str__(self):
         return f"{self.name} ({self.category.name if self.category else 'Chưa có danh mục'})"
 
+class ProductSearchToken(models.Model):
+    """Chỉ mục token (không dấu) của tên sản phẩm, dùng cho tìm kiếm theo tiền tố."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=50)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Token tìm kiếm sản phẩm"
+        verbose_name_plural = "Token tìm kiếm sản phẩm"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'token'], name='unique_product_search_token'),
+        ]
+        indexes = [
+            models.Index(fields=['token', 'product'], name='store_search_token_idx'),
+        ]
+
+    @classmethod
+    def index_products(cls, products, batch_size=1000):
+        """Xây lại token cho các sản phẩm đã lưu (xóa token cũ rồi bulk_create)."""
+        products = list(products)
+        if not products:
+            return
+        cls.objects.filter(product__in=products).delete()
+        cls.objects.bulk_create(
+            [
+                cls(product=product, token=token, position=position)
+                for product in products
+                for position, token in enumerate(search_tokens(product.name))
+            ],
+            batch_size=batch_size,
+        )
+
+    def __str__(self):
+        return f"{self.token} -> {self.product_id}"
+
+
 class StoreCounter(models.Model):
     location = models.CharField(max_length=100)
     manager = models.ForeignKey(
@@ -211,6 +367,7 @@ class Order(models.Model):
 
     # Thông tin cơ bản
     date = models.DateTimeField(default=timezone.now, verbose_name="Ngày tạo đơn")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Cập nhật lúc")
     order_status = models.CharField(
         max_length=50, 
         choices=STATUS_CHOICES, 
@@ -281,42 +438,74 @@ class Order(models.Model):
         null=True,
         verbose_name="Địa chỉ"
     )
+    customer_phone_normalized = models.CharField(
+        max_length=16, blank=True, default='', editable=False,
+        verbose_name="Số điện thoại (chuẩn hóa)"
+    )
 
     class Meta:
         verbose_name = "Đơn hàng"
         verbose_name_plural = "Đơn hàng"
-        ordering = ['-date']
+        ordering = ['-date', '-id']
+        indexes = [
+            # Danh sách đơn hàng mới nhất (OrderListView, phân trang keyset) và lọc theo khoảng ngày
+            models.Index(fields=['-date', '-id'], name='store_order_date_idx'),
+            # Đơn hàng của nhân viên (SalesOrderListView, order_history)
+            models.Index(fields=['created_by', '-date', '-id'], name='store_order_creator_date_idx'),
+            # Đơn đang chờ của quầy (SalesDashboard, SalesCounterView)
+            models.Index(fields=['counter', 'order_status'], name='store_order_counter_status_idx'),
+            # Tra cứu khách vãng lai theo số điện thoại (đơn gần nhất)
+            models.Index(fields=['customer_phone_normalized', '-date'], name='store_order_phone_date_idx'),
+        ]
 
     def __str__(self):
         return f"Đơn hàng #{self.pk} - {self.get_order_status_display()}"
 
+    def save(self, *args, **kwargs):
+        self.customer_phone_normalized = normalize_phone(self.customer_phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'customer_phone' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'customer_phone_normalized'}
+        super().save(*args, **kwargs)
+
     def clean(self):
         if not self.customer and not (self.customer_name and self.customer_phone):
             raise ValidationError("Vui lòng cung cấp thông tin khách hàng hoặc chọn khách hàng từ hệ thống.")
 
+    @transaction.atomic
     def add_item(self, product, quantity):
+        from .exceptions import InsufficientStockError
+        from .services import StockReservationService  # Tránh import vòng
+
         if quantity <= 0:
             raise ValidationError("Số lượng phải lớn hơn 0.")
-        
-        if product.update_stock(-quantity):
-            item, created = OrderItem.objects.get_or_create(
-                order=self, 
-                product=product, 
-                defaults={'quantity': quantity}
+
+        try:
+            StockReservationService.reserve_stock([(product, quantity)], order=self, user=self.created_by_id)
+        except InsufficientStockError:
+            return False
+        product.stock -= quantity
+
+        item, created = OrderItem.objects.get_or_create(
+            order=self, 
+            product=product, 
+            defaults={'quantity': quantity}
+        )
+        if not created:
+            OrderItem.objects.filter(pk=item.pk).update(
+                quantity=models.F('quantity') + quantity,
+                line_total=(models.F('quantity') + quantity) * models.F('unit_price'),
             )
-            if not created:
-                item.quantity += quantity
-                item.save()
-            self.calculate_total()
-            return True
-        return False
+        self.calculate_total()
+        return True
 
     def calculate_total(self):
-        total = sum(item.product.price * item.quantity for item in self.order_items.all())
+        total = self.order_items.aggregate(total=models.Sum('line_total'))['total'] or 0
         self.total_amount = total
         self.save()
         return total
 
+    @transaction.atomic
     def process_payment(self, payment_method, amount_received):
         if self.order_status != 'pending':
             raise ValidationError("Chỉ có thể thanh toán đơn hàng đang ở trạng thái chờ.")
@@ -327,32 +516,47 @@ class Order(models.Model):
         self.order_status = 'paid'
         self.payment_method = payment_method
         self.save()
+        if self.customer_id:
+            from .services import LoyaltyEngine  # Tránh import vòng
+
+            LoyaltyEngine.accrue(Order.objects.filter(pk=self.pk))
         return True
 
-    def cancel_order(self):
+    @transaction.atomic
+    def cancel_order(self, user=None):
         if self.order_status != 'pending':
             raise ValidationError("Chỉ có thể hủy đơn hàng đang ở trạng thái chờ.")
         
         self.order_status = 'canceled'
-        for item in self.order_items.all():
-            item.product.update_stock(item.quantity)
+        self._release_items(StockMovement.Reason.CANCEL, user)
         self.save()
         return True
 
-    def refund(self):
+    @transaction.atomic
+    def refund(self, user=None):
         if self.order_status != 'paid':
             raise ValidationError("Chỉ có thể hoàn trả đơn hàng đã thanh toán.")
         
         self.order_status = 'refunded'
-        for item in self.order_items.all():
-            item.product.update_stock(item.quantity)
+        self._release_items(StockMovement.Reason.REFUND, user)
         self.save()
+        if self.customer_id:
+            from .services import LoyaltyEngine  # Tránh import vòng
+
+            LoyaltyEngine.revert(Order.objects.filter(pk=self.pk), user=user)
         return True
 
+    def _release_items(self, reason, user):
+        from .services import StockReservationService  # Tránh import vòng
+
+        StockReservationService.release_stock(
+            self.order_items.values_list('product_id', 'quantity'), reason, order=self, user=user
+        )
+
     def generate_invoice(self):
         items = "\n".join(
-            [f"{item.product.name} x {item.quantity} - {item.product.price * item.quantity:,.0f} VNĐ"
-             for item in self.order_items.all()]
+            [f"{item.product.name} x {item.quantity} - {item.line_total:,.0f} VNĐ"
+             for item in self.order_items.select_related('product')]
         )
         return (
             f"HÓA ĐƠN #{self.pk}\n"
@@ -378,6 +582,27 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='order_items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='order_items')
     quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Đơn giá")
+    line_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Thành tiền")
+
+    class Meta:
+        constraints = [
+            # Mỗi sản phẩm chỉ có một dòng trong đơn hàng (Order.add_item cộng dồn số lượng)
+            models.UniqueConstraint(fields=['order', 'product'], name='unique_order_item_product'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Chụp lại giá tại thời điểm bán để tổng tiền không đổi khi giá sản phẩm thay đổi
+        if self._state.adding and not self.unit_price:
+            self.unit_price = self.product.price
+        self.line_total = self.unit_price * self.quantity
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'quantity' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'line_total'}
+        super().save(*args, **kwargs)
+
+    def total_price(self):
+        return self.line_total
 
     def update_quantity(self, new_quantity: int):
         if new_quantity > 0:
@@ -388,14 +613,288 @@ class OrderItem(models.Model):
         self.delete()
 
     def get_item_info(self) -> str:
-        return f"Product: {self.product.name}, Quantity: {self.quantity}, Total Price: ${self.product.price * self.quantity:.2f}"
+        return f"Product: {self.product.name}, Quantity: {self.quantity}, Total Price: ${self.line_total:.2f}"
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
 
+
+class StockMovement(models.Model):
+    """
+    Sổ kho chỉ ghi thêm: mỗi thay đổi tồn kho là một dòng với delta (+ nhập, - xuất).
+    Product.stock là số dư tại thời điểm hiện tại, phải bằng tổng delta của sản phẩm
+    (kiểm tra bằng `manage.py reconcile_stock`).
+    """
+
+    class Reason(models.TextChoices):
+        INITIAL = 'initial', 'Tồn đầu kỳ'
+        SALE = 'sale', 'Bán hàng'
+        ORDER_EDIT = 'order_edit', 'Sửa đơn hàng'
+        CANCEL = 'cancel', 'Hủy đơn'
+        REFUND = 'refund', 'Hoàn trả'
+        ADJUSTMENT = 'adjustment', 'Điều chỉnh'
+        IMPORT = 'import', 'Nhập kho'
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    delta = models.IntegerField(verbose_name="Thay đổi")
+    reason = models.CharField(max_length=20, choices=Reason.choices, verbose_name="Lý do")
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements'
+    )
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Biến động kho"
+        verbose_name_plural = "Biến động kho"
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='store_stockmove_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.delta:+d} ({self.get_reason_display()})"
+
+
+class Cart(models.Model):
+    """Giỏ hàng lưu phía server của từng người dùng; tổng tiền và số lượng được tính lại khi giỏ thay đổi."""
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='cart')
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Tổng tiền")
+    item_count = models.PositiveIntegerField(default=0, verbose_name="Số sản phẩm")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Giỏ hàng"
+        verbose_name_plural = "Giỏ hàng"
+
+    def __str__(self):
+        return f"Giỏ hàng của {self.user}: {self.item_count} sản phẩm"
+
+
+class CartLine(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cart_lines')
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Đơn giá")
+    line_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Thành tiền")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_line_product'),
+        ]
+
+    @property
+    def subtotal(self):
+        return self.line_total
+
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity}"
+
+
+class CustomerStats(models.Model):
+    """Tổng hợp lịch sử mua hàng (đơn đã thanh toán) của một khách hàng.
+
+    Được cập nhật tăng dần qua signal của Order khi đơn chuyển sang/khỏi trạng thái đã thanh toán;
+    dùng lệnh ``manage.py rebuild_customer_stats`` để tính lại từ đầu.
+    """
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name='stats', verbose_name="Khách hàng"
+    )
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Tổng chi tiêu")
+    order_count = models.IntegerField(default=0, verbose_name="Số đơn đã thanh toán")
+    last_order_date = models.DateTimeField(null=True, blank=True, verbose_name="Đơn gần nhất")
+    favourite_counter = models.ForeignKey(
+        StoreCounter, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        verbose_name="Quầy mua nhiều nhất"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Thống kê mua hàng của khách"
+        verbose_name_plural = "Thống kê mua hàng của khách"
+        indexes = [
+            # Danh sách khách chi tiêu nhiều nhất
+            models.Index(fields=['-total_spent'], name='store_custstats_spent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id}: {self.order_count} đơn, {self.total_spent:,.0f} VNĐ"
+
+class DailySalesRollup(models.Model):
+    """Tổng hợp doanh số theo ngày / quầy / phương thức thanh toán / trạng thái.
+
+    Được cập nhật tăng dần qua signal của Order; dùng lệnh
+    ``manage.py rebuild_sales_rollups`` để tính lại từ đầu.
+    """
+    day = models.DateField(verbose_name="Ngày")
+    counter = models.ForeignKey(
+        StoreCounter,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sales_rollups',
+        verbose_name="Quầy"
+    )
+    payment_method = models.CharField(max_length=20, blank=True, default='', verbose_name="Phương thức thanh toán")
+    order_status = models.CharField(max_length=50, verbose_name="Trạng thái đơn hàng")
+    order_count = models.IntegerField(default=0, verbose_name="Số đơn")
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Tổng tiền")
+
+    class Meta:
+        verbose_name = "Tổng hợp doanh số ngày"
+        verbose_name_plural = "Tổng hợp doanh số ngày"
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'counter', 'payment_method', 'order_status'],
+                name='unique_daily_sales_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'order_status'], name='store_rollup_day_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.counter_id or '-'} - {self.order_status}: {self.total_amount:,.0f} VNĐ"
+
+class LoyaltyRule(models.Model):
+    """
+    Quy tắc tích điểm: đơn đã thanh toán có tổng tiền >= min_amount (và đúng phương thức thanh toán
+    nếu có) được floor(tổng tiền / amount_per_point) + bonus_points điểm. Mỗi đơn dùng quy tắc
+    đang bật có min_amount cao nhất phù hợp.
+    """
+    name = models.CharField(max_length=100, verbose_name="Tên quy tắc")
+    min_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Tổng tiền tối thiểu")
+    payment_method = models.CharField(
+        max_length=20, choices=Order.PAYMENT_METHODS, blank=True, default='',
+        verbose_name="Phương thức thanh toán", help_text="Để trống để áp dụng cho mọi phương thức"
+    )
+    amount_per_point = models.DecimalField(
+        max_digits=12, decimal_places=2, default=10000, validators=[MinValueValidator(1)],
+        verbose_name="Số tiền cho mỗi điểm"
+    )
+    bonus_points = models.IntegerField(default=0, verbose_name="Điểm thưởng thêm mỗi đơn")
+    is_active = models.BooleanField(default=True, verbose_name="Đang áp dụng")
+
+    class Meta:
+        verbose_name = "Quy tắc tích điểm"
+        verbose_name_plural = "Quy tắc tích điểm"
+        ordering = ['-min_amount', 'pk']
+
+    def __str__(self):
+        return f"{self.name}: {self.amount_per_point:,.0f} VNĐ/điểm từ {self.min_amount:,.0f} VNĐ"
+
+
+class LoyaltyTransaction(models.Model):
+    """Sổ điểm tích lũy chỉ ghi thêm: tổng points của một khách bằng Customer.loyalty_points."""
+
+    class Reason(models.TextChoices):
+        EARN = 'earn', 'Tích điểm đơn hàng'
+        REVERT = 'revert', 'Hoàn điểm đơn trả'
+        ADJUSTMENT = 'adjustment', 'Điều chỉnh'
+
+    customer = models.ForeignKey(
+        Customer, on_delete=models.CASCADE, related_name='loyalty_transactions', verbose_name="Khách hàng"
+    )
+    order = models.ForeignKey(
+        Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='loyalty_transactions',
+        verbose_name="Đơn hàng"
+    )
+    points = models.IntegerField(verbose_name="Điểm")
+    reason = models.CharField(max_length=20, choices=Reason.choices, verbose_name="Lý do")
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Người thực hiện"
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Thời điểm")
+
+    class Meta:
+        verbose_name = "Giao dịch điểm tích lũy"
+        verbose_name_plural = "Sổ điểm tích lũy"
+        ordering = ['-created_at', '-id']
+        constraints = [
+            # Mỗi đơn chỉ được tích điểm / hoàn điểm một lần, kể cả khi chạy tích điểm nhiều lần
+            models.UniqueConstraint(
+                fields=['order', 'reason'], condition=models.Q(order__isnull=False),
+                name='unique_loyalty_order_reason'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['customer', '-created_at'], name='store_loyalty_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id}: {self.points:+d} ({self.get_reason_display()})"
+
+class Job(models.Model):
+    """Công việc nền chạy bởi `manage.py run_workers` (xem JobService), không cần message broker."""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Đang chờ'
+        RUNNING = 'running', 'Đang chạy'
+        SUCCEEDED = 'succeeded', 'Hoàn thành'
+        FAILED = 'failed', 'Thất bại'
+
+    func = models.CharField(max_length=200, verbose_name="Hàm thực thi")
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED, verbose_name="Trạng thái")
+    result = models.JSONField(null=True, blank=True, verbose_name="Kết quả")
+    error = models.TextField(blank=True, default='', verbose_name="Lỗi")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Số lần chạy")
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name="Số lần chạy tối đa")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Chạy từ lúc")
+    # Worker đang giữ job; quá locked_until mà chưa xong thì worker khác được nhận lại
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Công việc nền"
+        verbose_name_plural = "Công việc nền"
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='store_job_status_run_at_idx'),
+            models.Index(fields=['status', 'locked_until'], name='store_job_status_locked_idx'),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.SUCCEEDED, self.Status.FAILED)
+
+    def __str__(self):
+        return f"Job #{self.pk} {self.func} ({self.get_status_display()})"
+
 class Debts(models.Model):
-    amount = models.FloatField(default=0.0)
-    interest = models.FloatField(default=0.0)
+    """
+    Khoản nợ: amount là số tiền gốc, balance là số dư hiện tại (ảnh chụp của sổ DebtTransaction, tổng
+    amount các dòng sổ của khoản nợ). balance chỉ thay đổi qua DebtService (trả nợ, tính lãi hàng loạt).
+    """
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Số tiền gốc")
+    interest = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0, validators=[MinValueValidator(0)],
+        verbose_name="Lãi suất mỗi kỳ (%)"
+    )
+    balance = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, db_index=True, editable=False, verbose_name="Số dư"
+    )
+    interest_accrued_on = models.DateField(null=True, blank=True, editable=False, verbose_name="Ngày tính lãi gần nhất")
     updated_at = models.DateTimeField(auto_now=True)
     accountant = models.ForeignKey(
         CustomUser,
@@ -404,24 +903,65 @@ class Debts(models.Model):
         limit_choices_to={'role': Role.ACCOUNTANT}
     )
 
-    def calculate_debt(self) -> float:
-        return self.amount * (self.interest / 100)
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # Số dư ban đầu bằng tiền gốc; dòng sổ mở đầu do signal ghi
+            self.balance = self.amount
+        super().save(*args, **kwargs)
+
+    def calculate_debt(self) -> Decimal:
+        """Tiền lãi của một kỳ trên số dư hiện tại."""
+        return (self.balance * self.interest / 100).quantize(Decimal('0.01'), ROUND_HALF_UP)
 
     def is_debt_paid(self) -> bool:
-        return self.amount <= 0
+        return self.balance <= 0
 
     def get_debt_info(self) -> str:
-        return f"Debt Amount: ${self.amount:.2f}, Interest Rate: {self.interest:.2f}%"
+        return f"Debt Amount: ${self.balance:.2f}, Interest Rate: {self.interest:.2f}%"
 
-    def pay_debt(self, amount: float) -> bool:
-        if amount > 0 and amount <= self.amount:
-            self.amount -= amount
-            self.save()
-            return True
-        return False
+    def pay_debt(self, amount, user=None) -> bool:
+        """Trả nợ bằng UPDATE F() có điều kiện và ghi vào sổ nợ (không lưu lại cả dòng)."""
+        from .services import DebtService  # Tránh import vòng
+
+        return DebtService.pay(self, amount, user=user)
+
+    def __str__(self):
+        return f"Debt: ${self.balance:.2f} at {self.interest:.2f}%"
+
+class DebtTransaction(models.Model):
+    """Sổ nợ chỉ ghi thêm: tổng amount (+ phát sinh, - trả nợ) của một khoản nợ bằng Debts.balance."""
+
+    class Reason(models.TextChoices):
+        OPENING = 'opening', 'Nợ gốc'
+        INTEREST = 'interest', 'Tiền lãi'
+        PAYMENT = 'payment', 'Trả nợ'
+        ADJUSTMENT = 'adjustment', 'Điều chỉnh'
+
+    debt = models.ForeignKey(Debts, on_delete=models.CASCADE, related_name='transactions', verbose_name="Khoản nợ")
+    amount = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Số tiền")
+    reason = models.CharField(max_length=20, choices=Reason.choices, verbose_name="Lý do")
+    period = models.DateField(null=True, blank=True, verbose_name="Kỳ tính lãi")
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Người thực hiện"
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Thời điểm")
+
+    class Meta:
+        verbose_name = "Giao dịch nợ"
+        verbose_name_plural = "Sổ nợ"
+        ordering = ['-created_at', '-id']
+        constraints = [
+            # Mỗi kỳ chỉ tính lãi một lần cho mỗi khoản nợ, kể cả khi chạy accrue_debt_interest nhiều lần
+            models.UniqueConstraint(
+                fields=['debt', 'period'], condition=models.Q(reason='interest'), name='unique_debt_interest_period'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['debt', '-created_at'], name='store_debttx_debt_idx'),
+        ]
 
     def __str__(self):
-        return f"Debt: ${self.amount:.2f} at {self.interest:.2f}%"
+        return f"{self.debt_id}: {self.amount:+.2f} ({self.get_reason_display()})"
 
 class SystemSetting(models.Model):
     store_name = models.CharField(max_length=100, default="Jewelry Sales Manager")
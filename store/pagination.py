@@ -0,0 +1,180 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.http import QueryDict
+
+
+class KeysetPage:
+    """
+    Một trang kết quả phân trang theo khóa (keyset), không dùng OFFSET.
+    Chỉ truy vấn khi trang được dùng lần đầu, nhờ đó fragment cache trong template
+    có thể bỏ qua hoàn toàn truy vấn danh sách.
+    """
+    is_keyset = True
+
+    def __init__(self, paginator, position):
+        self.paginator = paginator
+        self.position = position
+        self._result = None
+
+    def fetch(self):
+        if self._result is None:
+            self._result = self.paginator._fetch(self.position)
+        return self._result
+
+    @property
+    def object_list(self):
+        return self.fetch()[0]
+
+    @property
+    def has_next_page(self):
+        return self.fetch()[1]
+
+    @property
+    def has_previous_page(self):
+        return self.fetch()[2]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_query(self):
+        if not self.has_next_page:
+            return ''
+        return self.paginator.build_query(self.object_list[-1], forward=True)
+
+    @property
+    def previous_query(self):
+        if not self.has_previous_page:
+            return ''
+        return self.paginator.build_query(self.object_list[0], forward=False)
+
+    @property
+    def first_query(self):
+        return self.paginator.build_query(None)
+
+
+class KeysetPaginator:
+    """
+    Phân trang theo bộ trường sắp xếp (vd. ('-date', '-id')) với con trỏ đã ký (opaque).
+    Trang thứ 500 tốn chi phí như trang 1 vì chỉ dùng WHERE theo khóa và LIMIT.
+    Các trường sắp xếp không được NULL và trường cuối phải là khóa duy nhất.
+    """
+    cursor_param = 'cursor'
+    salt = 'store.keyset-pagination'
+
+    def __init__(self, queryset, ordering, per_page, params=None, count_limit=None):
+        self.queryset = queryset
+        self.ordering = [
+            (field[1:], True) if field.startswith('-') else (field, False)
+            for field in ordering
+        ]
+        self.per_page = int(per_page)
+        self.params = params.copy() if params is not None else QueryDict(mutable=True)
+        self.count_limit = count_limit
+
+    def get_page(self, cursor=None, lazy=False):
+        page = KeysetPage(self, self._decode(cursor) if cursor else None)
+        if not lazy:
+            page.fetch()
+        return page
+
+    def _fetch(self, position):
+        """Trả về (các dòng, có trang sau, có trang trước) của vị trí con trỏ."""
+        forward = position is None or position['forward']
+        queryset = self.queryset.order_by(*self._order_by(forward))
+        if position is not None:
+            queryset = queryset.filter(self._after(position['values'], forward))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return rows, has_more, position is not None
+        rows.reverse()
+        return rows, True, has_more
+
+    @property
+    def approximate_count(self):
+        """Số dòng, dừng đếm ở count_limit để không phải quét toàn bộ bảng."""
+        if self.count_limit is None:
+            return None
+        if not hasattr(self, '_approximate_count'):
+            self._approximate_count = self.queryset.order_by()[:self.count_limit + 1].count()
+        return self._approximate_count
+
+    @property
+    def count_is_capped(self):
+        return self.count_limit is not None and self.approximate_count > self.count_limit
+
+    def build_query(self, obj, forward=True):
+        params = self.params.copy()
+        params.pop(self.cursor_param, None)
+        params.pop('page', None)
+        if obj is not None:
+            params[self.cursor_param] = self._encode(obj, forward)
+        return params.urlencode()
+
+    def _order_by(self, forward):
+        return [
+            f'-{field}' if descending == forward else field
+            for field, descending in self.ordering
+        ]
+
+    def _after(self, values, forward):
+        condition = Q()
+        for index, (field, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[index]})
+            for previous, (previous_field, _) in enumerate(self.ordering[:index]):
+                step &= Q(**{previous_field: values[previous]})
+            condition |= step
+        return condition
+
+    def _encode(self, obj, forward):
+        values = []
+        for field, _ in self.ordering:
+            value = getattr(obj, field)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        return signing.dumps({'v': values, 'f': forward}, salt=self.salt, compress=True)
+
+    def _decode(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=self.salt)
+            values = data['v']
+            if len(values) != len(self.ordering):
+                return None
+            return {
+                'values': [self._to_python(field, value) for (field, _), value in zip(self.ordering, values)],
+                'forward': bool(data['f']),
+            }
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            return None
+
+    def _to_python(self, field, value):
+        try:
+            return self.queryset.model._meta.get_field(field).to_python(value)
+        except FieldDoesNotExist:
+            return value
@@ -0,0 +1,311 @@
+import csv
+import io
+import os
+import tempfile
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import Category, CustomUser, Product, ProductSearchToken, StockMovement
+from .services import CatalogCacheService, DashboardStatsService
+from .utils import normalize_search_text
+
+COLUMNS = ['slug', 'name', 'category', 'price', 'stock', 'description']
+FORMAT_CSV = 'csv'
+FORMAT_XLSX = 'xlsx'
+FORMATS = (FORMAT_CSV, FORMAT_XLSX)
+CONTENT_TYPES = {
+    FORMAT_CSV: 'text/csv; charset=utf-8',
+    FORMAT_XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _load_openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("Cần cài openpyxl để đọc/ghi file XLSX (pip install openpyxl)")
+    return openpyxl
+
+
+def format_from_name(filename):
+    ext = os.path.splitext(filename)[1].lower().lstrip('.')
+    if ext not in FORMATS:
+        raise ValueError(f"Chỉ hỗ trợ file {', '.join(FORMATS)}")
+    return ext
+
+
+class ProductImporter:
+    """
+    Nhập sản phẩm hàng loạt từ CSV/XLSX (cột: slug, name, category, price, stock, description).
+    Đọc file theo dòng, mỗi lô chunk_size dòng được kiểm tra rồi ghi bằng vài truy vấn gộp:
+    danh mục và slug được tra theo tập, sản phẩm mới bulk_create, sản phẩm có slug trùng bulk_update.
+    """
+    MAX_ERRORS = 100
+    UPDATE_FIELDS = ['name', 'search_name', 'category', 'description', 'price', 'stock']
+    # Giới hạn theo cột Product.price (max_digits=12, decimal_places=2) và Product.stock (số nguyên 32 bit)
+    MAX_PRICE = Decimal('9999999999.99')
+    MAX_STOCK = 2147483647
+
+    def __init__(self, user=None, chunk_size=1000, update_existing=True):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.update_existing = update_existing
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'errors': [], 'seconds': 0.0}
+        self._categories = {}
+        self._slugs = set()
+
+    def import_file(self, fileobj, fmt):
+        started = time.perf_counter()
+        rows = self.read_rows(fileobj, fmt)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+        # bulk_create/bulk_update không phát signal post_save nên tự làm mới cache danh mục và dashboard
+        if self.stats['created'] or self.stats['updated']:
+            transaction.on_commit(CatalogCacheService.invalidate_products)
+            transaction.on_commit(DashboardStatsService.invalidate)
+        self.stats['seconds'] = time.perf_counter() - started
+        return self.stats
+
+    @staticmethod
+    def read_rows(fileobj, fmt):
+        """Sinh (số dòng, dict) theo từng dòng, không đọc cả file vào bộ nhớ."""
+        if fmt == FORMAT_CSV:
+            text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+            for line, row in enumerate(csv.DictReader(text), start=2):
+                yield line, {key.strip().lower(): value for key, value in row.items() if key}
+            return
+        if fmt != FORMAT_XLSX:
+            raise ValueError(f"Định dạng không hỗ trợ: {fmt}")
+        workbook = _load_openpyxl().load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            values = workbook.active.iter_rows(values_only=True)
+            header = [str(cell or '').strip().lower() for cell in next(values, ())]
+            for line, cells in enumerate(values, start=2):
+                if any(cell not in (None, '') for cell in cells):
+                    yield line, dict(zip(header, cells))
+        finally:
+            workbook.close()
+
+    def import_chunk(self, chunk):
+        valid = []
+        for line, row in chunk:
+            self.stats['rows'] += 1
+            try:
+                cleaned = self.clean_row(row)
+                if cleaned['slug']:
+                    # Slug đã gặp ở dòng trước trong file (cùng lô hoặc lô trước): hai dòng cho cùng một sản phẩm
+                    if cleaned['slug'] in self._slugs:
+                        raise ValueError(f"slug trùng với một dòng trước trong file: {cleaned['slug']}")
+                    self._slugs.add(cleaned['slug'])
+                valid.append(cleaned)
+            except ValueError as e:
+                self.stats['skipped'] += 1
+                if len(self.stats['errors']) < self.MAX_ERRORS:
+                    self.stats['errors'].append(f"Dòng {line}: {e}")
+        if not valid:
+            return
+
+        with transaction.atomic():
+            categories = self.resolve_categories({row['category'] for row in valid if row['category']})
+            slugs = [row['slug'] for row in valid if row['slug']]
+            existing = Product.objects.in_bulk(slugs, field_name='slug') if slugs else {}
+
+            to_create, to_update, renamed, movements = [], [], [], []
+            for row in valid:
+                category = categories.get(row['category'])
+                product = existing.get(row['slug'])
+                if product is None:
+                    to_create.append((row, category))
+                    continue
+                if not self.update_existing:
+                    self.stats['skipped'] += 1
+                    continue
+                before = self.snapshot(product)
+                self.apply_row(product, row, category)
+                after = self.snapshot(product)
+                if after == before:
+                    # Dòng không đổi gì (vd. nhập lại file vừa xuất): không ghi lại
+                    self.stats['unchanged'] += 1
+                    continue
+                to_update.append(product)
+                if after[1] != before[1]:
+                    renamed.append(product)
+                if after[-1] != before[-1]:
+                    movements.append(StockMovement(product=product, delta=after[-1] - before[-1],
+                                                   reason=StockMovement.Reason.IMPORT, user=self.user))
+
+            created = self.create_products(to_create)
+            movements += [
+                StockMovement(product=product, delta=product.stock, reason=StockMovement.Reason.IMPORT, user=self.user)
+                for product in created if product.stock
+            ]
+            if to_update:
+                Product.objects.bulk_update(to_update, self.UPDATE_FIELDS, batch_size=self.chunk_size)
+            StockMovement.objects.bulk_create(movements, batch_size=self.chunk_size)
+            ProductSearchToken.index_products(created + renamed, batch_size=self.chunk_size)
+
+        self.stats['created'] += len(created)
+        self.stats['updated'] += len(to_update)
+
+    @staticmethod
+    def clean_row(row):
+        name = str(row.get('name') or '').strip()
+        if not name:
+            raise ValueError("thiếu tên sản phẩm")
+        if len(name) > 100:
+            raise ValueError("tên sản phẩm dài quá 100 ký tự")
+        cleaned = {
+            'slug': str(row.get('slug') or '').strip(),
+            'name': name,
+            'category': str(row.get('category') or '').strip()[:100],
+            'description': str(row.get('description') or '').strip() or None,
+            'price': None,
+            'stock': None,
+        }
+        if row.get('price') not in (None, ''):
+            try:
+                cleaned['price'] = Decimal(str(row['price']).replace(',', '').strip())
+            except InvalidOperation:
+                raise ValueError(f"giá không hợp lệ: {row['price']}")
+            if cleaned['price'] < 0 or not cleaned['price'].is_finite():
+                raise ValueError(f"giá không hợp lệ: {row['price']}")
+            if cleaned['price'] > ProductImporter.MAX_PRICE:
+                raise ValueError(f"giá quá lớn: {row['price']}")
+        if row.get('stock') not in (None, ''):
+            try:
+                cleaned['stock'] = int(Decimal(str(row['stock']).strip()))
+            except (InvalidOperation, OverflowError, ValueError):
+                # OverflowError: inf, ValueError: nan
+                raise ValueError(f"tồn kho không hợp lệ: {row['stock']}")
+            if cleaned['stock'] < 0:
+                raise ValueError(f"tồn kho không được âm: {row['stock']}")
+            if cleaned['stock'] > ProductImporter.MAX_STOCK:
+                raise ValueError(f"tồn kho quá lớn: {row['stock']}")
+        if cleaned['slug'] and cleaned['slug'] != slugify(cleaned['slug']):
+            raise ValueError(f"slug không hợp lệ: {cleaned['slug']}")
+        return cleaned
+
+    def resolve_categories(self, names):
+        """Danh mục theo tên (tạo mới các danh mục chưa có) bằng một truy vấn đọc và một bulk_create."""
+        missing = names - self._categories.keys()
+        if missing:
+            self._categories.update(Category.objects.filter(name__in=missing).in_bulk(field_name='name'))
+            new_names = sorted(missing - self._categories.keys())
+            if new_names:
+                taken = set(Category.objects.values_list('slug', flat=True))
+                new_categories = []
+                for name in new_names:
+                    base = slugify(normalize_search_text(name)) or 'danh-muc'
+                    slug, suffix = base, 1
+                    while slug in taken:
+                        slug, suffix = f'{base}-{suffix}', suffix + 1
+                    taken.add(slug)
+                    new_categories.append(Category(name=name, slug=slug))
+                Category.objects.bulk_create(new_categories)
+                self._categories.update(Category.objects.filter(name__in=new_names).in_bulk(field_name='name'))
+        return {name: self._categories[name] for name in names}
+
+    @classmethod
+    def snapshot(cls, product):
+        """Giá trị các cột được cập nhật (search_name thứ hai, stock cuối cùng) để so sánh trước/sau."""
+        return tuple(getattr(product, field if field != 'category' else 'category_id') for field in cls.UPDATE_FIELDS)
+
+    @staticmethod
+    def apply_row(product, row, category):
+        """Cập nhật sản phẩm có sẵn theo dòng nhập (ô trống giữ nguyên giá trị cũ)."""
+        product.name = row['name']
+        product.search_name = normalize_search_text(row['name'])
+        if category is not None:
+            product.category = category
+        if row['price'] is not None:
+            product.price = row['price']
+        if row['stock'] is not None:
+            product.stock = row['stock']
+        if row['description'] is not None:
+            product.description = row['description']
+
+    def create_products(self, rows):
+        if not rows:
+            return []
+        # Slug do người dùng đặt được giữ nguyên (đã nằm trong self._slugs), các dòng còn lại sinh slug từ tên
+        generated = iter(Product.unique_slugs([row['name'] for row, _ in rows if not row['slug']], self._slugs))
+        products = [
+            Product(
+                slug=row['slug'] or next(generated),
+                name=row['name'],
+                search_name=normalize_search_text(row['name']),
+                category=category,
+                price=row['price'] or Decimal(0),
+                stock=row['stock'] or 0,
+                description=row['description'],
+            )
+            for row, category in rows
+        ]
+        created = Product.objects.bulk_create(products, batch_size=self.chunk_size)
+        if created and created[0].pk is None:
+            # Backend không trả về pk sau khi insert: nạp lại theo slug (duy nhất)
+            by_slug = Product.objects.in_bulk([product.slug for product in created], field_name='slug')
+            created = [by_slug[product.slug] for product in created]
+        return created
+
+
+class ProductExporter:
+    """Xuất danh mục sản phẩm theo cùng định dạng cột của ProductImporter, đọc CSDL theo từng lô."""
+
+    def __init__(self, products=None, chunk_size=2000):
+        self.products = products if products is not None else Product.objects.all()
+        self.chunk_size = chunk_size
+
+    def rows(self):
+        yield COLUMNS
+        yield from self.products.order_by('pk').values_list(
+            'slug', 'name', 'category__name', 'price', 'stock', 'description'
+        ).iterator(chunk_size=self.chunk_size)
+
+    def stream_csv(self):
+        """Sinh từng dòng CSV (dùng cho StreamingHttpResponse), kèm BOM để Excel đọc đúng tiếng Việt."""
+        buffer = _LineBuffer()
+        writer = csv.writer(buffer)
+        yield '\ufeff'
+        for row in self.rows():
+            yield writer.writerow(['' if value is None else value for value in row])
+
+    def write_xlsx(self, fileobj):
+        workbook = _load_openpyxl().Workbook(write_only=True)
+        sheet = workbook.create_sheet('Sản phẩm')
+        for row in self.rows():
+            sheet.append([float(value) if isinstance(value, Decimal) else value for value in row])
+        workbook.save(fileobj)
+
+
+class _LineBuffer:
+    """File giả cho csv.writer: writerow() trả về chính dòng vừa ghi."""
+
+    def write(self, value):
+        return value
+
+
+def import_products_job(path, fmt, user_id=None, update_existing=True):
+    """Job nền (JobService.enqueue) nhập file sản phẩm đã tải lên; xóa file sau khi nhập."""
+    try:
+        with open(path, 'rb') as fileobj:
+            user = CustomUser.objects.filter(pk=user_id).first() if user_id else None
+            return ProductImporter(user=user, update_existing=update_existing).import_file(fileobj, fmt)
+    finally:
+        os.remove(path)
+
+
+def save_upload(upload, directory):
+    """Lưu file tải lên vào thư mục (để job nền đọc lại), trả về đường dẫn."""
+    fd, path = tempfile.mkstemp(prefix='product_import_', suffix=os.path.splitext(upload.name)[1], dir=directory)
+    with os.fdopen(fd, 'wb') as output:
+        for chunk in upload.chunks():
+            output.write(chunk)
+    return path
@@ -0,0 +1,22 @@
+class CacheRouter:
+    """
+    Đưa bảng cache của DatabaseCache (app_label 'django_cache') sang CSDL 'cache'
+    (file SQLite riêng), các bảng khác giữ nguyên ở CSDL chính.
+    """
+    cache_db = 'cache'
+    cache_app_label = 'django_cache'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == self.cache_app_label:
+            return self.cache_db
+        return None
+
+    def db_for_write(self, model, **hints):
+        return self.db_for_read(model, **hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == self.cache_app_label:
+            return db == self.cache_db
+        if db == self.cache_db:
+            return False
+        return None
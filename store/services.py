@@ -1,83 +1,1128 @@
+import os
+import socket
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict, deque
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
 from django.forms import ValidationError
 from django.shortcuts import get_object_or_404
-from django.db import transaction
-from .models import Product, Order, OrderItem
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (Case, Count, DecimalField, Exists, F, IntegerField, Max,
+                              OuterRef, Q, Sum, Value, When)
+from django.db.models.functions import Cast, Coalesce, Floor, Greatest, Round, TruncDate
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import (Cart, CartLine, Customer, CustomerStats, CustomUser, DailySalesRollup, Debts,
+                     DebtTransaction, Job, LoyaltyRule, LoyaltyTransaction, Product, ProductSearchToken, Order, OrderItem,
+                     Role, StockMovement, StoreCounter, SystemSetting)
 from .exceptions import InsufficientStockError
+from .utils import normalize_phone, normalize_search_text, search_tokens
 
 class CartService:
+    """
+    Giỏ hàng lưu trong bảng Cart/CartLine theo người dùng (không ghi lại cả session mỗi lần bấm).
+    Mỗi thao tác chỉ đọc/ghi dòng liên quan rồi tính lại tổng của giỏ bằng một truy vấn tổng hợp.
+    """
+
     @staticmethod
-    def get_cart_context(session):
-        cart_data = session.get('cart', {})
-        items = []
-        total = 0
-        
-        for product_id, quantity in cart_data.items():
-            product = get_object_or_404(Product, id=int(product_id))
-            subtotal = product.price * quantity
-            items.append({
-                'product': product,
-                'quantity': quantity,
-                'subtotal': subtotal
-            })
-            total += subtotal
-            
-        return {'items': items, 'total': total}
-
-    @staticmethod
-    def add_item(session, product_id):
-        product = get_object_or_404(Product, id=product_id)
-        cart_data = session.get('cart', {})
-        
-        if product.stock > 0:
-            cart_data[str(product.id)] = cart_data.get(str(product.id), 0) + 1
-            session['cart'] = cart_data
-        else:
+    def get_cart(user):
+        return Cart.objects.get_or_create(user=user)[0]
+
+    @staticmethod
+    def get_cart_context(user):
+        cart = CartService.get_cart(user)
+        lines = list(cart.lines.select_related('product').order_by('pk'))
+        # Giá sản phẩm đã đổi từ lúc thêm vào giỏ: cập nhật lại các dòng đó và tổng tiền
+        stale = [line for line in lines if line.unit_price != line.product.price]
+        if stale:
+            for line in stale:
+                line.unit_price = line.product.price
+                line.line_total = line.unit_price * line.quantity
+            CartLine.objects.bulk_update(stale, ['unit_price', 'line_total'])
+            CartService._refresh_totals(cart)
+        return {'cart': cart, 'items': lines, 'total': cart.total_amount}
+
+    @staticmethod
+    @transaction.atomic
+    def add_item(user, product_id):
+        product = get_object_or_404(Product.objects.only('pk', 'name', 'price', 'stock'), id=product_id)
+        if product.stock <= 0:
             raise InsufficientStockError(product.name, product.stock)
 
+        cart = CartService.get_cart(user)
+        updated = cart.lines.filter(product=product).update(
+            quantity=F('quantity') + 1, unit_price=product.price, line_total=product.price * (F('quantity') + 1)
+        )
+        if not updated:
+            CartLine.objects.create(cart=cart, product=product, quantity=1,
+                                    unit_price=product.price, line_total=product.price)
+        CartService._refresh_totals(cart)
+
     @staticmethod
-    def update_item(session, product_id, quantity):
-        cart_data = session.get('cart', {})
-        product_id_str = str(product_id)
-        
-        if int(quantity) > 0:
-            cart_data[product_id_str] = int(quantity)
+    @transaction.atomic
+    def update_item(user, product_id, quantity):
+        cart = CartService.get_cart(user)
+        quantity = int(quantity)
+        if quantity > 0:
+            price = get_object_or_404(Product.objects.values_list('price', flat=True), id=product_id)
+            CartLine.objects.update_or_create(
+                cart=cart, product_id=product_id,
+                defaults={'quantity': quantity, 'unit_price': price, 'line_total': price * quantity},
+            )
         else:
-            cart_data.pop(product_id_str, None)
-        session['cart'] = cart_data
+            cart.lines.filter(product_id=product_id).delete()
+        CartService._refresh_totals(cart)
 
     @staticmethod
-    def remove_item(session, product_id):
-        cart_data = session.get('cart', {})
-        product_id_str = str(product_id)
-        if product_id_str in cart_data:
-            del cart_data[product_id_str]
-            session['cart'] = cart_data
+    @transaction.atomic
+    def remove_item(user, product_id):
+        cart = CartService.get_cart(user)
+        if cart.lines.filter(product_id=product_id).delete()[0]:
+            CartService._refresh_totals(cart)
+
+    @staticmethod
+    def get_lines(cart):
+        """Danh sách (product_id, quantity) của giỏ, dùng cho StockReservationService."""
+        return list(cart.lines.order_by('product_id').values_list('product_id', 'quantity'))
+
+    @staticmethod
+    def clear(cart):
+        cart.lines.all().delete()
+        Cart.objects.filter(pk=cart.pk).update(total_amount=0, item_count=0, updated_at=timezone.now())
+        cart.total_amount, cart.item_count = Decimal(0), 0
+
+    @staticmethod
+    def _refresh_totals(cart):
+        totals = cart.lines.aggregate(total=Sum('line_total'), count=Sum('quantity'))
+        cart.total_amount = totals['total'] or Decimal(0)
+        cart.item_count = totals['count'] or 0
+        Cart.objects.filter(pk=cart.pk).update(
+            total_amount=cart.total_amount, item_count=cart.item_count, updated_at=timezone.now()
+        )
+
+class StockReservationService:
+    """Giữ hàng cho cả đơn hàng với số truy vấn cố định, an toàn khi nhiều quầy cùng bán."""
+
+    @staticmethod
+    def _quantities(lines):
+        """Gộp lines [(product hoặc product_id, quantity)] thành {product_id: quantity}."""
+        quantities = defaultdict(int)
+        for product, quantity in lines:
+            quantity = int(quantity)
+            if quantity <= 0:
+                raise ValidationError("Số lượng phải lớn hơn 0.")
+            product_id = product.pk if isinstance(product, Product) else int(product)
+            quantities[product_id] += quantity
+        return quantities
 
-class OrderService:
     @staticmethod
     @transaction.atomic
-    def create_order_from_cart(user, cart_data):
-        order = Order.objects.create(created_by=user, total_amount=0)
-        products_to_update = []
-        order_items = []
-        total = 0
-        
-        for product_id_str, quantity in cart_data.items():
-            product = Product.objects.get(id=int(product_id_str))
+    def reserve_stock(lines, reason=StockMovement.Reason.SALE, order=None, user=None):
+        """
+        Khóa toàn bộ sản phẩm trong đơn (theo thứ tự id), kiểm tra tồn kho và trừ kho
+        bằng một câu UPDATE có điều kiện, rồi ghi sổ kho. lines là danh sách (product hoặc product_id, quantity).
+        Trả về dict {product_id: (product, quantity)} với product đã cập nhật tồn kho.
+        """
+        quantities = StockReservationService._quantities(lines)
+        if not quantities:
+            return {}
+
+        products = {
+            product.pk: product
+            for product in Product.objects.select_for_update().filter(pk__in=quantities).order_by('pk')
+        }
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is None:
+                raise ValidationError(f"Sản phẩm #{product_id} không tồn tại.")
             if product.stock < quantity:
-                raise ValidationError(f"Insufficient stock for {product.name}")
-            
+                raise InsufficientStockError(product.name, product.stock)
+
+        updated = Product.objects.filter(
+            reduce(or_, (Q(pk=pk, stock__gte=qty) for pk, qty in quantities.items()))
+        ).update(stock=Case(
+            *(When(pk=pk, then=F('stock') - qty) for pk, qty in quantities.items()),
+            default=F('stock'),
+            output_field=IntegerField(),
+        ))
+        if updated != len(quantities):
+            raise ValidationError("Tồn kho vừa thay đổi, vui lòng thử lại.")
+        StockReservationService._record(quantities, -1, reason, order, user)
+        # Cập nhật hàng loạt không phát signal, tự làm mới cache danh mục sau khi commit
+        transaction.on_commit(CatalogCacheService.invalidate_stock)
+
+        reserved = {}
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
             product.stock -= quantity
-            products_to_update.append(product)
-            order_items.append(OrderItem(
+            reserved[product_id] = (product, quantity)
+        return reserved
+
+    @staticmethod
+    @transaction.atomic
+    def release_stock(lines, reason, order=None, user=None):
+        """Trả hàng về kho (hủy/hoàn đơn, giảm số lượng) bằng một câu UPDATE và ghi sổ kho."""
+        quantities = StockReservationService._quantities(lines)
+        if not quantities:
+            return
+        Product.objects.filter(pk__in=quantities).update(stock=Case(
+            *(When(pk=pk, then=F('stock') + qty) for pk, qty in quantities.items()),
+            default=F('stock'),
+            output_field=IntegerField(),
+        ))
+        StockReservationService._record(quantities, 1, reason, order, user)
+        transaction.on_commit(CatalogCacheService.invalidate_stock)
+
+    @staticmethod
+    def _record(quantities, sign, reason, order, user):
+        # order/user có thể là instance hoặc id
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=pk, delta=sign * qty, reason=reason,
+                order_id=getattr(order, 'pk', order), user_id=getattr(user, 'pk', user),
+            )
+            for pk, qty in quantities.items()
+        ])
+
+    @staticmethod
+    @transaction.atomic
+    def reserve(order, lines):
+        """Giữ hàng và tạo OrderItem bằng bulk_create. Trả về (danh sách item, tổng tiền)."""
+        reserved = StockReservationService.reserve_stock(lines, order=order, user=order.created_by_id)
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
                 product=product,
-                quantity=quantity
-            ))
-            total += product.price * quantity
-        
-        Product.objects.bulk_update(products_to_update, ['stock'])
-        OrderItem.objects.bulk_create(order_items)
+                quantity=quantity,
+                unit_price=product.price,
+                line_total=product.price * quantity,
+            )
+            for product, quantity in reserved.values()
+        ])
+        total = sum((item.line_total for item in items), Decimal(0))
+        return items, total
+
+class OrderService:
+    @staticmethod
+    @transaction.atomic
+    def create_order_from_cart(user, cart):
+        lines = CartService.get_lines(cart)
+        if not lines:
+            raise ValidationError("Giỏ hàng trống.")
+        order = Order.objects.create(created_by=user, total_amount=0)
+        # Kiểm tra lại tồn kho của cả giỏ bằng một truy vấn khóa các sản phẩm
+        _, total = StockReservationService.reserve(order, lines)
         order.total_amount = total
         order.save()
-        return order
\ No newline at end of file
+        CartService.clear(cart)
+        return order
+
+class SalesRollupService:
+    """Duy trì và truy vấn bảng tổng hợp doanh số DailySalesRollup."""
+
+    @staticmethod
+    def get_state(order):
+        """Trả về (khóa rollup, tổng tiền) của đơn hàng, hoặc None nếu chưa lưu."""
+        if order.pk is None or order.date is None:
+            return None
+        key = (
+            timezone.localdate(order.date) if timezone.is_aware(order.date) else order.date.date(),
+            order.counter_id,
+            order.payment_method or '',
+            order.order_status,
+        )
+        return key, Decimal(order.total_amount or 0)
+
+    @staticmethod
+    def get_saved_order(order_pk):
+        """Đọc các cột của đơn hàng đang lưu trong DB (trước khi ghi đè) mà các bảng tổng hợp cần."""
+        return Order.objects.filter(pk=order_pk).only(
+            'date', 'counter', 'payment_method', 'order_status', 'total_amount', 'customer'
+        ).first()
+
+    @staticmethod
+    def get_saved_state(order_pk):
+        """Đọc trạng thái rollup của đơn hàng đang lưu trong DB (trước khi ghi đè)."""
+        saved = SalesRollupService.get_saved_order(order_pk)
+        return SalesRollupService.get_state(saved) if saved else None
+
+    @staticmethod
+    def apply_change(old_state, new_state):
+        """Chuyển phần đóng góp của một đơn hàng từ old_state sang new_state."""
+        if old_state == new_state:
+            return
+        if old_state:
+            SalesRollupService._apply_delta(old_state[0], -1, -old_state[1])
+        if new_state:
+            SalesRollupService._apply_delta(new_state[0], 1, new_state[1])
+
+    @staticmethod
+    def _apply_delta(key, count, amount):
+        day, counter_id, payment_method, order_status = key
+        lookup = {
+            'day': day,
+            'counter_id': counter_id,
+            'payment_method': payment_method,
+            'order_status': order_status,
+        }
+        delta = {
+            'order_count': F('order_count') + count,
+            'total_amount': F('total_amount') + amount,
+        }
+        if DailySalesRollup.objects.filter(**lookup).update(**delta):
+            return
+        try:
+            with transaction.atomic():
+                DailySalesRollup.objects.create(order_count=count, total_amount=amount, **lookup)
+        except IntegrityError:
+            # Một tiến trình khác vừa tạo dòng này
+            DailySalesRollup.objects.filter(**lookup).update(**delta)
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild(since=None, batch_size=1000):
+        """Tính lại toàn bộ (hoặc từ ngày since) bảng rollup bằng một truy vấn gom nhóm."""
+        rollups = DailySalesRollup.objects.all()
+        orders = Order.objects.all()
+        if since:
+            rollups = rollups.filter(day__gte=since)
+            orders = orders.filter(date__date__gte=since)
+        rollups.delete()
+
+        rows = (
+            orders.annotate(day=TruncDate('date'))
+            .values('day', 'counter_id', 'payment_method', 'order_status')
+            .annotate(order_count=Count('id'), total=Sum('total_amount'))
+            .order_by()
+        )
+        objs = [
+            DailySalesRollup(
+                day=row['day'],
+                counter_id=row['counter_id'],
+                payment_method=row['payment_method'] or '',
+                order_status=row['order_status'],
+                order_count=row['order_count'],
+                total_amount=row['total'] or 0,
+            )
+            for row in rows
+        ]
+        DailySalesRollup.objects.bulk_create(objs, batch_size=batch_size)
+        return len(objs)
+
+    @staticmethod
+    def period_totals(end, **starts):
+        """Doanh thu từ mỗi ngày bắt đầu (theo tên) tới end, tính trong một truy vấn trên bảng tổng hợp."""
+        totals = DailySalesRollup.objects.filter(day__range=(min(starts.values()), end)).aggregate(**{
+            name: Sum('total_amount', filter=Q(day__gte=start)) for name, start in starts.items()
+        })
+        return {name: total or 0 for name, total in totals.items()}
+
+    @staticmethod
+    def daily_totals(start, end, statuses=None):
+        """Doanh thu và số đơn theo từng ngày trong [start, end], đủ mọi ngày."""
+        rows = DailySalesRollup.objects.filter(day__range=(start, end))
+        if statuses:
+            rows = rows.filter(order_status__in=statuses)
+        totals = {
+            row['day']: row
+            for row in rows.values('day').annotate(
+                total=Sum('total_amount'), order_count=Sum('order_count')
+            ).order_by()
+        }
+        days = []
+        day = start
+        while day <= end:
+            row = totals.get(day, {})
+            days.append({
+                'date': day,
+                'total': row.get('total') or 0,
+                'order_count': row.get('order_count') or 0,
+            })
+            day += timedelta(days=1)
+        return days
+
+class CounterFeedService:
+    """
+    Nguồn dữ liệu cho luồng sự kiện bán hàng theo quầy (SSE): sự kiện đơn hàng từ signal của Order
+    và tổng số trong ngày của quầy đọc từ DailySalesRollup.
+    """
+
+    @staticmethod
+    def today_totals(counter_id, day=None):
+        """Số đơn, doanh thu đã thanh toán và số đơn theo trạng thái trong ngày của quầy (một truy vấn)."""
+        day = day or timezone.localdate()
+        by_status = {
+            row['order_status']: row
+            for row in DailySalesRollup.objects.filter(day=day, counter_id=counter_id)
+            .values('order_status').annotate(count=Sum('order_count'), total=Sum('total_amount')).order_by()
+        }
+        return {
+            'day': day,
+            'order_count': sum(row['count'] for row in by_status.values()),
+            'paid_total': by_status['paid']['total'] if 'paid' in by_status else Decimal(0),
+            'by_status': {status: row['count'] for status, row in by_status.items()},
+        }
+
+    @staticmethod
+    def event_kind(old_state, new_state):
+        """Loại sự kiện khi đơn đổi từ old_state sang new_state (trạng thái rollup), None nếu không cần báo."""
+        if old_state is None:
+            return 'created' if new_state else None
+        if new_state is None:
+            return 'deleted'
+        if old_state[0][3] != new_state[0][3]:
+            return new_state[0][3]
+        return 'updated' if old_state != new_state else None
+
+    @classmethod
+    def publish_order_change(cls, order, old_state, new_state):
+        """Sau khi transaction commit, gửi sự kiện đơn hàng kèm tổng số mới cho các quầy có người đang xem."""
+        kind = cls.event_kind(old_state, new_state)
+        if kind is None:
+            return
+        counters = {state[0][1] for state in (old_state, new_state) if state and state[0][1]}
+        data = {
+            'id': order.pk,
+            'status': order.order_status,
+            'total_amount': order.total_amount,
+            'customer_name': order.customer_name,
+            'date': order.date,
+        }
+        transaction.on_commit(lambda: cls._publish(counters, kind, data))
+
+    @classmethod
+    def _publish(cls, counters, kind, data):
+        from .events import counter_events  # Tránh import vòng
+
+        for counter_id in counters:
+            # Chỉ đọc tổng số khi tiến trình này có kết nối đang theo dõi quầy
+            if counter_events.has_subscribers(counter_id):
+                counter_events.publish(counter_id, 'order', {
+                    'event': kind, 'order': data, 'totals': cls.today_totals(counter_id),
+                })
+
+class CustomerStatsService:
+    """Duy trì bảng CustomerStats (tổng chi tiêu, số đơn, đơn gần nhất, quầy hay mua) của khách hàng."""
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def get_state(order):
+        """Trả về (khách hàng, quầy, ngày, tổng tiền) nếu đơn đã thanh toán và có khách hàng, ngược lại None."""
+        if order is None or order.pk is None or not order.customer_id or order.order_status != 'paid':
+            return None
+        return order.customer_id, order.counter_id, order.date, Decimal(order.total_amount or 0)
+
+    @classmethod
+    def apply_change(cls, old_state, new_state):
+        """Chuyển phần đóng góp của một đơn hàng từ old_state sang new_state."""
+        if old_state == new_state:
+            return
+        if old_state is None:
+            # Trường hợp thường gặp: đơn vừa được thanh toán, cộng dồn bằng UPDATE F()
+            cls._add(*new_state)
+            return
+        # Đơn bị hoàn trả / hủy / sửa sau khi thanh toán (hiếm): tính lại khách liên quan
+        cls.refresh({state[0] for state in (old_state, new_state) if state})
+
+    @classmethod
+    def _add(cls, customer_id, counter_id, date, amount):
+        stats = CustomerStats.objects.filter(customer_id=customer_id)
+        updated = stats.update(
+            total_spent=F('total_spent') + amount,
+            order_count=F('order_count') + 1,
+            last_order_date=Greatest(Coalesce('last_order_date', Value(date)), Value(date)),
+        )
+        if not updated:
+            cls.refresh([customer_id])
+            return
+        # Quầy hay mua chỉ có thể đổi khi đơn mới ở quầy khác quầy hiện tại
+        if counter_id and stats.values_list('favourite_counter_id', flat=True).first() != counter_id:
+            favourite = cls._favourite_counters(Order.objects.filter(customer_id=customer_id, order_status='paid'))
+            stats.update(favourite_counter_id=favourite.get(customer_id))
+
+    @staticmethod
+    def _favourite_counters(orders):
+        """Quầy có nhiều đơn nhất của mỗi khách (bằng nhau thì quầy mua gần nhất), bằng một truy vấn gom nhóm."""
+        best = {}
+        rows = (
+            orders.filter(counter__isnull=False)
+            .values('customer_id', 'counter_id')
+            .annotate(order_count=Count('id'), last=Max('date'))
+            .order_by()
+        )
+        for row in rows:
+            key = (row['order_count'], row['last'])
+            current = best.get(row['customer_id'])
+            if current is None or key > current[0]:
+                best[row['customer_id']] = (key, row['counter_id'])
+        return {customer_id: counter_id for customer_id, (_, counter_id) in best.items()}
+
+    @classmethod
+    @transaction.atomic
+    def refresh(cls, customer_ids=None):
+        """Tính lại thống kê của các khách (mọi khách nếu customer_ids là None) bằng truy vấn gom nhóm."""
+        if customer_ids is None:
+            CustomerStats.objects.all().delete()
+            return cls._build(Order.objects.filter(order_status='paid', customer__isnull=False))
+        customer_ids = list(customer_ids)
+        created = 0
+        for start in range(0, len(customer_ids), cls.BATCH_SIZE):
+            batch = customer_ids[start:start + cls.BATCH_SIZE]
+            CustomerStats.objects.filter(customer_id__in=batch).delete()
+            created += cls._build(Order.objects.filter(order_status='paid', customer_id__in=batch))
+        return created
+
+    @classmethod
+    def _build(cls, orders):
+        favourites = cls._favourite_counters(orders)
+        rows = (
+            orders.values('customer_id')
+            .annotate(total=Sum('total_amount'), order_count=Count('id'), last=Max('date'))
+            .order_by()
+        )
+        stats = [
+            CustomerStats(
+                customer_id=row['customer_id'],
+                total_spent=row['total'] or 0,
+                order_count=row['order_count'],
+                last_order_date=row['last'],
+                favourite_counter_id=favourites.get(row['customer_id']),
+            )
+            for row in rows
+        ]
+        CustomerStats.objects.bulk_create(stats, batch_size=cls.BATCH_SIZE)
+        return len(stats)
+
+class CustomerLookupService:
+    """Tra cứu khách tại quầy theo số điện thoại đã chuẩn hóa (index phone_normalized)."""
+
+    @staticmethod
+    def by_phone(phone):
+        """
+        Thẻ khách hàng (thông tin, hạng, điểm, số liệu CustomerStats) lấy bằng một truy vấn; nếu không phải
+        khách có tài khoản thì tìm đơn gần nhất của khách vãng lai cùng số. Trả về None nếu không thấy.
+        """
+        normalized = normalize_phone(phone)
+        if not normalized:
+            return None
+        row = CustomUser.objects.filter(role=Role.CUSTOMER, phone_normalized=normalized).values(
+            'pk', 'username', 'first_name', 'last_name', 'phone', 'email',
+            'customer__address', 'customer__loyalty_points', 'customer__tier',
+            'customer__stats__total_spent', 'customer__stats__order_count',
+            'customer__stats__last_order_date', 'customer__stats__favourite_counter__location',
+        ).first()
+        if row is not None:
+            tier = row['customer__tier'] or Customer.Tier.NEW
+            return {
+                'type': 'member',
+                'id': row['pk'],
+                'username': row['username'],
+                'name': f"{row['last_name']} {row['first_name']}".strip() or row['username'],
+                'phone': row['phone'],
+                'email': row['email'],
+                'address': row['customer__address'],
+                'tier': tier,
+                'tier_display': Customer.Tier(tier).label,
+                'loyalty_points': row['customer__loyalty_points'] or 0,
+                'total_spent': row['customer__stats__total_spent'] or 0,
+                'order_count': row['customer__stats__order_count'] or 0,
+                'last_order_date': row['customer__stats__last_order_date'],
+                'favourite_counter': row['customer__stats__favourite_counter__location'],
+            }
+
+        order = Order.objects.filter(customer_phone_normalized=normalized).order_by('-date').values(
+            'customer_name', 'customer_phone', 'customer_address', 'date'
+        ).first()
+        if order is None:
+            return None
+        return {
+            'type': 'walk_in',
+            'name': order['customer_name'],
+            'phone': order['customer_phone'],
+            'address': order['customer_address'],
+            'last_order_date': order['date'],
+        }
+
+class LoyaltyEngine:
+    """
+    Tích điểm khách hàng theo bảng LoyaltyRule. Điểm của cả tập đơn (vd. mọi đơn đã thanh toán trong ngày)
+    được tính trong SQL, cộng cho từng khách bằng bulk_update F() và ghi vào sổ LoyaltyTransaction.
+    """
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def rules():
+        rules = list(LoyaltyRule.objects.filter(is_active=True))
+        if not rules:
+            rules = [LoyaltyRule(amount_per_point=getattr(settings, 'LOYALTY_AMOUNT_PER_POINT', 10000))]
+        # Quy tắc có ngưỡng cao hơn, rồi quy tắc riêng cho phương thức thanh toán được xét trước
+        return sorted(rules, key=lambda rule: (-rule.min_amount, not rule.payment_method, rule.pk or 0))
+
+    @classmethod
+    def points_expression(cls):
+        """Biểu thức SQL tính điểm của một đơn theo quy tắc đầu tiên phù hợp."""
+        whens = []
+        for rule in cls.rules():
+            condition = Q(total_amount__gte=rule.min_amount)
+            if rule.payment_method:
+                condition &= Q(payment_method=rule.payment_method)
+            points = Cast(
+                Floor(F('total_amount') / Value(rule.amount_per_point, output_field=DecimalField())),
+                IntegerField(),
+            ) + Value(rule.bonus_points)
+            whens.append(When(condition, then=points))
+        return Case(*whens, default=Value(0), output_field=IntegerField())
+
+    @classmethod
+    @transaction.atomic
+    def accrue(cls, orders, user=None):
+        """
+        Tích điểm cho các đơn đã thanh toán (có khách hàng, chưa được tích điểm) trong queryset orders.
+        Trả về (số đơn được tích điểm, tổng điểm). Chạy lại nhiều lần không cộng trùng.
+        """
+        earned = LoyaltyTransaction.objects.filter(order=OuterRef('pk'), reason=LoyaltyTransaction.Reason.EARN)
+        rows = list(
+            orders.filter(order_status='paid', customer__isnull=False)
+            .exclude(Exists(earned))
+            .annotate(points=cls.points_expression())
+            .filter(points__gt=0)
+            .order_by()
+            .values_list('pk', 'customer_id', 'points')
+        )
+        # Tổng điểm mỗi khách gom từ cùng kết quả với sổ điểm, để sổ và số dư luôn khớp
+        totals = Counter()
+        for _, customer_id, points in rows:
+            totals[customer_id] += points
+        now = timezone.now()
+        LoyaltyTransaction.objects.bulk_create([
+            LoyaltyTransaction(customer_id=customer_id, order_id=pk, points=points,
+                               reason=LoyaltyTransaction.Reason.EARN, user=user, created_at=now)
+            for pk, customer_id, points in rows
+        ], batch_size=cls.BATCH_SIZE)
+        cls._apply(totals)
+        return len(rows), sum(totals.values())
+
+    @classmethod
+    def accrue_day(cls, day, user=None):
+        return cls.accrue(Order.objects.filter(date__date=day), user=user)
+
+    @classmethod
+    @transaction.atomic
+    def revert(cls, orders, user=None):
+        """Trừ lại điểm đã tích của các đơn trong orders (vd. đơn hoàn trả), mỗi đơn một lần."""
+        reverted = LoyaltyTransaction.objects.filter(order=OuterRef('order'), reason=LoyaltyTransaction.Reason.REVERT)
+        rows = list(
+            LoyaltyTransaction.objects.filter(order__in=orders, reason=LoyaltyTransaction.Reason.EARN)
+            .exclude(Exists(reverted))
+            .values_list('order_id', 'customer_id', 'points')
+        )
+        totals = Counter()
+        for _, customer_id, points in rows:
+            totals[customer_id] -= points
+        now = timezone.now()
+        LoyaltyTransaction.objects.bulk_create([
+            LoyaltyTransaction(customer_id=customer_id, order_id=order_id, points=-points,
+                               reason=LoyaltyTransaction.Reason.REVERT, user=user, created_at=now)
+            for order_id, customer_id, points in rows
+        ], batch_size=cls.BATCH_SIZE)
+        cls._apply(totals)
+        return len(rows), sum(totals.values())
+
+    @classmethod
+    @transaction.atomic
+    def adjust(cls, customer, points, user=None):
+        """Điều chỉnh điểm thủ công cho một khách."""
+        LoyaltyTransaction.objects.create(
+            customer=customer, points=points, reason=LoyaltyTransaction.Reason.ADJUSTMENT, user=user
+        )
+        cls._apply({customer.pk: points})
+        customer.refresh_from_db(fields=['loyalty_points', 'tier'])
+
+    @classmethod
+    def _apply(cls, totals):
+        """Cộng điểm theo khách bằng UPDATE F() theo lô rồi tính lại hạng của các khách đó trong SQL."""
+        customer_ids = [customer_id for customer_id, points in totals.items() if points]
+        Customer.objects.bulk_update(
+            [Customer(pk=customer_id, loyalty_points=F('loyalty_points') + totals[customer_id])
+             for customer_id in customer_ids],
+            ['loyalty_points'],
+            batch_size=cls.BATCH_SIZE,
+        )
+        for start in range(0, len(customer_ids), cls.BATCH_SIZE):
+            Customer.objects.filter(pk__in=customer_ids[start:start + cls.BATCH_SIZE]).update(
+                tier=Customer.tier_expression()
+            )
+
+class DebtService:
+    """
+    Trả nợ và tính lãi cho các khoản nợ. Debts.balance chỉ được sửa bằng UPDATE F() cùng với một dòng
+    DebtTransaction, nên tổng sổ nợ của mỗi khoản luôn bằng số dư.
+    """
+    _MONEY_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+    @classmethod
+    def interest_expression(cls):
+        """Tiền lãi một kỳ của mỗi khoản nợ, tính trong SQL (làm tròn 2 chữ số như Debts.calculate_debt)."""
+        # Nhân với 0.01 thay vì chia 100: SQLite chia số nguyên khi tích là số tròn
+        rate = F('interest') * Value(Decimal('0.01'), output_field=cls._MONEY_FIELD)
+        return Cast(Round(F('balance') * rate, 2), cls._MONEY_FIELD)
+
+    @classmethod
+    @transaction.atomic
+    def accrue_interest(cls, period=None, user=None):
+        """
+        Cộng lãi kỳ `period` (mặc định hôm nay) cho mọi khoản nợ còn dư và chưa tính lãi kỳ này bằng một
+        câu UPDATE, kèm một dòng sổ cho mỗi khoản. Trả về (số khoản nợ, tổng tiền lãi); chạy lại cùng kỳ
+        không cộng trùng.
+        """
+        period = period or timezone.localdate()
+        due = Debts.objects.filter(balance__gt=0, interest__gt=0).filter(
+            Q(interest_accrued_on__isnull=True) | Q(interest_accrued_on__lt=period)
+        )
+        # Khóa các dòng đến hết transaction để tiền lãi trong sổ bằng đúng tiền lãi được cộng vào số dư
+        rows = list(
+            due.select_for_update().order_by('pk').annotate(accrued=cls.interest_expression())
+            .values_list('pk', 'accrued')
+        )
+        if not rows:
+            return 0, Decimal(0)
+        now = timezone.now()
+        DebtTransaction.objects.bulk_create([
+            DebtTransaction(debt_id=pk, amount=accrued, reason=DebtTransaction.Reason.INTEREST,
+                            period=period, user=user, created_at=now)
+            for pk, accrued in rows if accrued
+        ], batch_size=LoyaltyEngine.BATCH_SIZE)
+        # Khoản nợ tạo sau lúc đọc (pk lớn hơn) để lại cho lần chạy sau
+        due.filter(pk__lte=rows[-1][0]).update(
+            balance=F('balance') + cls.interest_expression(), interest_accrued_on=period, updated_at=now
+        )
+        transaction.on_commit(DashboardStatsService.invalidate)
+        return len(rows), sum((accrued for _, accrued in rows), Decimal(0))
+
+    @staticmethod
+    @transaction.atomic
+    def pay(debt, amount, user=None):
+        """Trừ số dư nếu đủ (UPDATE có điều kiện, không đọc-sửa-ghi) và ghi dòng trả nợ. Trả về True nếu thành công."""
+        amount = Decimal(str(amount))
+        if amount <= 0:
+            return False
+        paid = Debts.objects.filter(pk=debt.pk, balance__gte=amount).update(
+            balance=F('balance') - amount, updated_at=timezone.now()
+        )
+        if not paid:
+            return False
+        DebtTransaction.objects.create(debt=debt, amount=-amount, reason=DebtTransaction.Reason.PAYMENT, user=user)
+        debt.refresh_from_db(fields=['balance', 'updated_at'])
+        transaction.on_commit(DashboardStatsService.invalidate)
+        return True
+
+class DashboardStatsService:
+    """Các chỉ số KPI của trang dashboard, tính bằng một truy vấn UNION ALL và lưu cache."""
+
+    CACHE_KEY = 'dashboard_stats'
+    _VALUE_FIELD = DecimalField(max_digits=18, decimal_places=2)
+
+    @classmethod
+    def get_stats(cls):
+        stats = cache.get(cls.CACHE_KEY)
+        if stats is None:
+            stats = cls.compute_stats()
+            cache.set(cls.CACHE_KEY, stats, getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 60))
+        return stats
+
+    @classmethod
+    def invalidate(cls):
+        cache.delete(cls.CACHE_KEY)
+
+    @classmethod
+    def compute_stats(cls):
+        kpis = dict(
+            cls._kpi(Order, 'total_sales', Sum('total_amount')).union(
+                cls._kpi(Order, 'orders_count', Count('pk')),
+                cls._kpi(Product, 'products_count', Count('pk')),
+                cls._kpi(StoreCounter, 'counters_count', Count('pk')),
+                cls._kpi(Debts, 'total_debt', Sum('balance')),
+                all=True,
+            )
+        )
+        store_name = SystemSetting.objects.values_list('store_name', flat=True).first()
+        return {
+            'total_sales': kpis['total_sales'],
+            'orders_count': int(kpis['orders_count']),
+            'products_count': int(kpis['products_count']),
+            'counters_count': int(kpis['counters_count']),
+            'total_debt': kpis['total_debt'],
+            'store_name': store_name or "Hệ thống",
+        }
+
+    @classmethod
+    def _kpi(cls, model, name, aggregate):
+        """Một dòng (tên KPI, giá trị) tổng hợp trên toàn bảng, không GROUP BY."""
+        return (
+            model.objects.order_by()
+            .annotate(kpi=Value(name))
+            .values_list('kpi')
+            .annotate(value=Cast(Coalesce(aggregate, 0, output_field=cls._VALUE_FIELD), cls._VALUE_FIELD))
+            .values_list('kpi', 'value')
+        )
+
+class CatalogCacheService:
+    """
+    Phiên bản (version) của các fragment cache trang danh mục sản phẩm.
+    Fragment được cache theo version, nên khi dữ liệu đổi chỉ cần tăng version
+    (không phải tìm và xóa từng key); fragment cũ tự hết hạn theo timeout.
+    """
+    KEY_PREFIX = 'catalog_version'
+    PRODUCTS = 'products'
+    # Tồn kho đổi sau mỗi lần bán: tách riêng để chỉ fragment có hiển thị/sắp xếp theo tồn kho bị làm mới
+    STOCK = 'stock'
+
+    @classmethod
+    def counter_scope(cls, counter_id):
+        return f'counter_products:{counter_id}'
+
+    @classmethod
+    def version(cls, *scopes):
+        """Chuỗi version ghép của các phạm vi, dùng làm tham số vary của thẻ {% cache %}."""
+        keys = [f'{cls.KEY_PREFIX}:{scope}' for scope in scopes]
+        versions = cache.get_many(keys)
+        missing = {key: time.time_ns() for key in keys if key not in versions}
+        if missing:
+            cache.set_many(missing, None)
+            versions.update(missing)
+        return '-'.join(str(versions[key]) for key in keys)
+
+    @classmethod
+    def invalidate(cls, *scopes):
+        # Dùng thời điểm hiện tại thay vì incr: version mới không trùng version cũ kể cả khi key bị xóa khỏi cache
+        cache.set_many({f'{cls.KEY_PREFIX}:{scope}': time.time_ns() for scope in scopes}, None)
+
+    @classmethod
+    def invalidate_products(cls):
+        cls.invalidate(cls.PRODUCTS, cls.STOCK)
+
+    @classmethod
+    def invalidate_stock(cls):
+        cls.invalidate(cls.STOCK)
+
+    @staticmethod
+    def timeout():
+        return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+class PerfStatsService:
+    """
+    Số liệu hiệu năng theo từng URL name do PerfMiddleware ghi lại.
+    Mỗi tiến trình giữ các mẫu gần nhất trong bộ nhớ và định kỳ ghi bản chụp vào cache dùng chung,
+    trang /system/perf/ gộp bản chụp của mọi worker để tính phân vị.
+    """
+    KEY_PREFIX = 'perf_stats'
+    WORKERS_KEY = 'perf_stats:workers'
+    MAX_DUPLICATES = 10
+
+    _lock = threading.Lock()
+    _samples = {}
+    _requests = Counter()
+    _duplicates = defaultdict(Counter)
+    _last_flush = 0.0
+    _worker = f'{socket.gethostname()}-{os.getpid()}'
+
+    @classmethod
+    def record(cls, view_name, wall_ms, sql_count, sql_ms, duplicates):
+        """duplicates: {fingerprint SQL: số lần chạy} của các truy vấn lặp lại trong request."""
+        with cls._lock:
+            samples = cls._samples.get(view_name)
+            if samples is None:
+                samples = cls._samples[view_name] = deque(maxlen=getattr(settings, 'PERF_SAMPLE_SIZE', 1000))
+            samples.append((wall_ms, sql_count, sql_ms))
+            cls._requests[view_name] += 1
+            for fingerprint, count in duplicates.items():
+                cls._duplicates[view_name][fingerprint] += count
+            due = time.monotonic() - cls._last_flush >= getattr(settings, 'PERF_FLUSH_INTERVAL', 10)
+        if due:
+            cls.flush()
+
+    @classmethod
+    def flush(cls):
+        with cls._lock:
+            cls._last_flush = time.monotonic()
+            snapshot = {
+                view_name: {
+                    'samples': list(samples),
+                    'requests': cls._requests[view_name],
+                    'duplicates': dict(cls._duplicates[view_name].most_common(cls.MAX_DUPLICATES)),
+                }
+                for view_name, samples in cls._samples.items()
+            }
+        key = f'{cls.KEY_PREFIX}:{cls._worker}'
+        cache.set(key, snapshot, getattr(settings, 'PERF_STATS_TIMEOUT', 3600))
+        workers = cache.get(cls.WORKERS_KEY) or []
+        if key not in workers:
+            cache.set(cls.WORKERS_KEY, workers + [key], None)
+
+    @classmethod
+    def summary(cls):
+        """Danh sách số liệu từng URL name (gộp mọi worker), sắp xếp theo p95 thời gian giảm dần."""
+        cls.flush()
+        workers = cache.get(cls.WORKERS_KEY) or []
+        snapshots = cache.get_many(workers)
+        if len(snapshots) < len(workers):
+            # Bỏ các worker đã dừng (bản chụp hết hạn)
+            cache.set(cls.WORKERS_KEY, [key for key in workers if key in snapshots], None)
+
+        merged = defaultdict(lambda: {'samples': [], 'requests': 0, 'duplicates': Counter()})
+        for snapshot in snapshots.values():
+            for view_name, data in snapshot.items():
+                merged[view_name]['samples'] += data['samples']
+                merged[view_name]['requests'] += data['requests']
+                merged[view_name]['duplicates'].update(data['duplicates'])
+
+        rows = []
+        for view_name, data in merged.items():
+            wall, sql_count, sql_ms = (sorted(values) for values in zip(*data['samples']))
+            rows.append({
+                'view_name': view_name,
+                'requests': data['requests'],
+                'p50_ms': cls.percentile(wall, 50),
+                'p95_ms': cls.percentile(wall, 95),
+                'p99_ms': cls.percentile(wall, 99),
+                'max_ms': wall[-1],
+                'sql_count_p50': cls.percentile(sql_count, 50),
+                'sql_count_max': sql_count[-1],
+                'sql_ms_p95': cls.percentile(sql_ms, 95),
+                'duplicates': data['duplicates'].most_common(cls.MAX_DUPLICATES),
+            })
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._samples.clear()
+            cls._requests.clear()
+            cls._duplicates.clear()
+        cache.delete_many(cache.get(cls.WORKERS_KEY) or [])
+        cache.delete(cls.WORKERS_KEY)
+
+    @staticmethod
+    def percentile(values, percent):
+        """Phân vị theo phương pháp nearest-rank trên danh sách đã sắp xếp."""
+        if not values:
+            return 0
+        return values[max(0, -(-len(values) * percent // 100) - 1)]
+
+class ProductSearchService:
+    """Tìm sản phẩm qua bảng token không dấu thay cho name__icontains (quét toàn bảng)."""
+
+    @staticmethod
+    def search(query, products=None):
+        """
+        Lọc products theo mọi token của query (khớp tiền tố) và xếp hạng theo:
+        tên bắt đầu bằng query, số token khớp chính xác, còn hàng, rồi tên.
+        """
+        if products is None:
+            products = Product.objects.all()
+        tokens = search_tokens(query)
+        if not tokens:
+            # Query chỉ có dấu câu/ký tự đặc biệt: không khớp sản phẩm nào (vẫn annotate để view sắp xếp được)
+            products = products.none()
+
+        for token in tokens:
+            products = products.filter(
+                pk__in=ProductSearchToken.objects.filter(token__startswith=token).values('product_id')
+            )
+
+        exact_matches = sum(
+            (
+                Case(
+                    When(Exists(ProductSearchToken.objects.filter(product=OuterRef('pk'), token=token)), then=1),
+                    default=0,
+                )
+                for token in tokens
+            ),
+            Value(0),
+        )
+        return products.annotate(
+            name_prefix=Case(
+                When(search_name__startswith=normalize_search_text(query), then=1),
+                default=0,
+                output_field=IntegerField(),
+            ),
+            exact_matches=exact_matches,
+            in_stock=Case(When(stock__gt=0, then=1), default=0, output_field=IntegerField()),
+        ).order_by('-name_prefix', '-exact_matches', '-in_stock', 'name')
+
+    @staticmethod
+    def rebuild_index(products=None, batch_size=1000):
+        """Tính lại search_name và token cho các sản phẩm (dùng sau bulk_create/update)."""
+        products = products if products is not None else Product.objects.all()
+        count = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                products.filter(pk__gt=last_pk).only('pk', 'name', 'search_name').order_by('pk')[:batch_size]
+            )
+            if not batch:
+                return count
+            for product in batch:
+                product.search_name = normalize_search_text(product.name)
+            count += ProductSearchService._index_batch(batch)
+            last_pk = batch[-1].pk
+
+    @staticmethod
+    @transaction.atomic
+    def _index_batch(products):
+        Product.objects.bulk_update(products, ['search_name'])
+        ProductSearchToken.index_products(products)
+        return len(products)
+
+class JobService:
+    """
+    Hàng đợi công việc nền lưu trong bảng Job. View gọi enqueue() rồi trả về ngay job id;
+    `manage.py run_workers` nhận job bằng UPDATE có điều kiện (an toàn khi nhiều worker cùng chạy),
+    chạy lại khi lỗi với thời gian chờ tăng dần, và nhận lại job của worker chết sau visibility timeout.
+    """
+
+    @staticmethod
+    def enqueue(func, *args, created_by=None, max_attempts=3, run_at=None, **kwargs):
+        """
+        func là hàm cấp module (hoặc đường dẫn dạng 'store.invoices.export_invoices_job');
+        args/kwargs và giá trị trả về phải tuần tự hóa được bằng JSON.
+        Job được tạo trong transaction hiện tại nên worker chỉ thấy sau khi commit.
+        """
+        path = func if isinstance(func, str) else f'{func.__module__}.{func.__qualname__}'
+        try:
+            resolved = import_string(path)
+        except ImportError:
+            resolved = None
+        if resolved is None or not (isinstance(func, str) or resolved is func):
+            raise ValueError(f"{path} không phải hàm cấp module, worker không import được")
+        return Job.objects.create(
+            func=path,
+            args=list(args),
+            kwargs=kwargs,
+            created_by=created_by,
+            max_attempts=max_attempts,
+            run_at=run_at or timezone.now(),
+        )
+
+    @staticmethod
+    def _visibility_timeout():
+        return timedelta(seconds=getattr(settings, 'JOB_VISIBILITY_TIMEOUT', 300))
+
+    @staticmethod
+    def _claimable(now):
+        # Job đang chạy quá hạn khóa (worker chết) chỉ được nhận lại khi còn lượt chạy
+        return Job.objects.filter(
+            Q(status=Job.Status.QUEUED, run_at__lte=now)
+            | Q(status=Job.Status.RUNNING, locked_until__lt=now, attempts__lt=F('max_attempts'))
+        )
+
+    @staticmethod
+    def fail_abandoned(now=None):
+        """Đánh dấu thất bại các job có worker chết giữa chừng mà đã hết lượt chạy; trả về số job."""
+        now = now or timezone.now()
+        return Job.objects.filter(
+            status=Job.Status.RUNNING, locked_until__lt=now, attempts__gte=F('max_attempts')
+        ).update(
+            status=Job.Status.FAILED, locked_by='', locked_until=None, finished_at=now,
+            error="Worker dừng giữa chừng (quá JOB_VISIBILITY_TIMEOUT không gia hạn) và job đã hết lượt chạy lại",
+        )
+
+    @staticmethod
+    def extend_lock(pk, worker):
+        """Gia hạn khóa của job đang chạy; trả về False nếu worker không còn giữ job."""
+        return bool(Job.objects.filter(pk=pk, locked_by=worker, status=Job.Status.RUNNING).update(
+            locked_until=timezone.now() + JobService._visibility_timeout()
+        ))
+
+    @staticmethod
+    def _heartbeat(pk, worker, stop):
+        """Luồng gia hạn khóa mỗi 1/3 visibility timeout để job chạy lâu không bị worker khác nhận lại."""
+        try:
+            while not stop.wait(JobService._visibility_timeout().total_seconds() / 3):
+                if not JobService.extend_lock(pk, worker):
+                    return
+        finally:
+            connection.close()
+
+    @staticmethod
+    def claim(worker, limit):
+        """Nhận tối đa limit job cho worker, trả về danh sách id đã nhận."""
+        now = timezone.now()
+        timeout = JobService._visibility_timeout()
+        JobService.fail_abandoned(now)
+        candidates = JobService._claimable(now).order_by('run_at', 'pk').values_list('pk', flat=True)[:limit]
+        claimed = []
+        for pk in candidates:
+            # Chỉ một worker cập nhật được dòng còn thỏa điều kiện nhận
+            if JobService._claimable(now).filter(pk=pk).update(
+                status=Job.Status.RUNNING,
+                locked_by=worker,
+                locked_until=now + timeout,
+                attempts=F('attempts') + 1,
+                started_at=now,
+            ):
+                claimed.append(pk)
+        return claimed
+
+    @staticmethod
+    def run(pk, worker):
+        """Chạy job đã được worker nhận. Trả về trạng thái sau khi chạy."""
+        job = Job.objects.get(pk=pk)
+        mine = Job.objects.filter(pk=pk, locked_by=worker, status=Job.Status.RUNNING)
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=JobService._heartbeat, args=(pk, worker, stop),
+                                     name=f'job-{pk}-heartbeat', daemon=True)
+        heartbeat.start()
+        try:
+            try:
+                result = import_string(job.func)(*job.args, **job.kwargs)
+            finally:
+                stop.set()
+                heartbeat.join()
+        except Exception:
+            error = traceback.format_exc()
+            if job.attempts < job.max_attempts:
+                delay = getattr(settings, 'JOB_RETRY_DELAY', 10) * 2 ** (job.attempts - 1)
+                status, changes = Job.Status.QUEUED, {'run_at': timezone.now() + timedelta(seconds=delay)}
+            else:
+                status, changes = Job.Status.FAILED, {'finished_at': timezone.now()}
+            mine.update(status=status, error=error, locked_by='', locked_until=None, **changes)
+            return status
+        mine.update(
+            status=Job.Status.SUCCEEDED, result=result, error='',
+            locked_by='', locked_until=None, finished_at=timezone.now(),
+        )
+        return Job.Status.SUCCEEDED
+
+    @staticmethod
+    def purge(older_than, batch_size=1000):
+        """Xóa job đã kết thúc trước older_than cùng file kết quả (result['file']) của chúng."""
+        finished = Job.objects.filter(
+            status__in=[Job.Status.SUCCEEDED, Job.Status.FAILED], finished_at__lt=older_than
+        )
+        deleted = 0
+        while True:
+            batch = list(finished.values_list('pk', 'result')[:batch_size])
+            if not batch:
+                return deleted
+            for _, result in batch:
+                if isinstance(result, dict) and result.get('file'):
+                    try:
+                        os.remove(result['file'])
+                    except FileNotFoundError:
+                        pass
+            deleted += Job.objects.filter(pk__in=[pk for pk, _ in batch]).delete()[0]
+
+    @staticmethod
+    def output_dir():
+        """Thư mục chứa file kết quả của job (vd. file ZIP hóa đơn)."""
+        path = getattr(settings, 'JOB_OUTPUT_DIR', os.path.join(settings.BASE_DIR, 'job_output'))
+        os.makedirs(path, exist_ok=True)
+        return path
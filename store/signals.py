@@ -1,7 +1,11 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
-from .models import CustomUser, Role
+from django.db import transaction
+from .models import (Category, CustomUser, Debts, DebtTransaction, Order, Product, Role, StockMovement,
+                     StoreCounter, SystemSetting)
+from .services import (CatalogCacheService, CounterFeedService, CustomerStatsService, DashboardStatsService,
+                       SalesRollupService)
 
 @receiver(pre_save, sender=CustomUser)
 def store_old_role(sender, instance, **kwargs):
@@ -35,3 +39,94 @@ def assign_user_group(sender, instance, created, **kwargs):
             instance.groups.remove(*instance.groups.filter(name__in=all_role_groups))
             group, _ = Group.objects.get_or_create(name=desired_group_name)
             instance.groups.add(group)
+
+@receiver(pre_save, sender=Order)
+def store_old_rollup_state(sender, instance, **kwargs):
+    """
+    Lưu lại trạng thái rollup cũ (ngày, quầy, phương thức, trạng thái, tổng tiền) và trạng thái
+    thống kê khách hàng cũ của đơn hàng, đọc từ DB bằng một truy vấn.
+    """
+    saved = SalesRollupService.get_saved_order(instance.pk) if instance.pk else None
+    instance._old_rollup_state = SalesRollupService.get_state(saved) if saved else None
+    instance._old_customer_stats_state = CustomerStatsService.get_state(saved)
+
+@receiver(post_save, sender=Order)
+def update_sales_rollup(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_state, new_state = getattr(instance, '_old_rollup_state', None), SalesRollupService.get_state(instance)
+    SalesRollupService.apply_change(old_state, new_state)
+    CounterFeedService.publish_order_change(instance, old_state, new_state)
+    CustomerStatsService.apply_change(
+        getattr(instance, '_old_customer_stats_state', None),
+        CustomerStatsService.get_state(instance)
+    )
+
+@receiver(post_delete, sender=Order)
+def remove_from_sales_rollup(sender, instance, **kwargs):
+    old_state = SalesRollupService.get_state(instance)
+    SalesRollupService.apply_change(old_state, None)
+    CounterFeedService.publish_order_change(instance, old_state, None)
+    CustomerStatsService.apply_change(CustomerStatsService.get_state(instance), None)
+
+@receiver(pre_save, sender=Product)
+def store_old_stock(sender, instance, raw=False, **kwargs):
+    """
+    Lưu lại tồn kho cũ để ghi sổ kho khi Product.stock bị sửa trực tiếp (form, admin).
+    Các luồng bán hàng cập nhật kho bằng UPDATE và tự ghi sổ (StockReservationService).
+    """
+    if raw or not instance.pk:
+        instance._old_stock = 0
+    else:
+        instance._old_stock = Product.objects.filter(pk=instance.pk).values_list('stock', flat=True).first() or 0
+
+@receiver(post_save, sender=Product)
+def record_stock_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    delta = instance.stock - getattr(instance, '_old_stock', instance.stock)
+    if delta:
+        StockMovement.objects.create(
+            product=instance,
+            delta=delta,
+            reason=StockMovement.Reason.INITIAL if created else StockMovement.Reason.ADJUSTMENT,
+            user=getattr(instance, '_stock_user', None),
+        )
+        instance._old_stock = instance.stock
+
+@receiver(post_save, sender=Debts)
+def record_debt_opening(sender, instance, created, raw=False, **kwargs):
+    """Ghi nợ gốc vào sổ nợ khi tạo khoản nợ; các thay đổi sau đó đi qua DebtService."""
+    if created and not raw and instance.balance:
+        DebtTransaction.objects.create(debt=instance, amount=instance.balance, reason=DebtTransaction.Reason.OPENING)
+
+@receiver([post_save, post_delete], sender=Order)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=StoreCounter)
+@receiver([post_save, post_delete], sender=Debts)
+@receiver([post_save, post_delete], sender=SystemSetting)
+def invalidate_dashboard_stats(sender, **kwargs):
+    # Xóa cache sau khi commit: xóa ngay thì request khác có thể cache lại số liệu cũ trước khi transaction commit
+    transaction.on_commit(DashboardStatsService.invalidate)
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog_cache(sender, update_fields=None, **kwargs):
+    if sender is Product and update_fields and set(update_fields) <= {'stock'}:
+        transaction.on_commit(CatalogCacheService.invalidate_stock)
+    else:
+        transaction.on_commit(CatalogCacheService.invalidate_products)
+
+@receiver(m2m_changed, sender=StoreCounter.products.through)
+def invalidate_counter_products_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        scopes = [CatalogCacheService.counter_scope(instance.pk)]
+    elif pk_set:
+        scopes = [CatalogCacheService.counter_scope(pk) for pk in pk_set]
+    else:
+        # product.counters.clear(): không biết các quầy liên quan
+        transaction.on_commit(CatalogCacheService.invalidate_products)
+        return
+    transaction.on_commit(lambda: CatalogCacheService.invalidate(*scopes))
@@ -34,6 +34,8 @@ urlpatterns = [
      path("products/", include([
         path("", views.ProductListView.as_view(), name="product_list"),
         path("add/", views.ProductCreateView.as_view(), name="add_product.html"),
+        path("import/", views.ProductImportView.as_view(), name="product-import"),
+        path("export/", views.ProductExportView.as_view(), name="product-export"),
         path("<slug:slug>/", include([
             path("", views.ProductDetailView.as_view(), name="product-detail"),
             path("edit/", views.ProductUpdateView.as_view(), name="product-update"),
@@ -62,6 +64,7 @@ urlpatterns = [
             path("", views.CounterDetailView.as_view(), name="counter-detail"),
             path("edit/", views.CounterUpdateView.as_view(), name="counter-update"),
             path("delete/", views.CounterDeleteView.as_view(), name="counter-delete"),
+            path("events/", views.counter_events_feed, name="counter-events"),
             path("orders/new/", views.CounterCreateView.as_view(), name="counter-order-create"),
         ])),
     ])),
@@ -70,6 +73,7 @@ urlpatterns = [
     path("sales/", include([
         path("dashboard/", views.SalesDashboard.as_view(), name="sales-dashboard"),
         path('counter/', views.SalesCounterView.as_view(), name='sales_counter'),
+        path('counter/events/', views.counter_events_feed, name='sales-counter-events'),
         path('counter/create/', views.CounterCreateView.as_view(), name='counter_create'),
         path('orders/create/', views.SalesOrderCreateView.as_view(), name='sales_order_create'),
         path('orders/<int:pk>/payment/', views.process_payment, name='sales_order_payment'),
@@ -77,6 +81,8 @@ urlpatterns = [
         path('sales/products/', views.sales_products, name='sales_products'),
         path('sales/customers/', views.SalesCustomerListView.as_view(), name='sales-customer-list'),
         path('sales/customers/create/', views.SalesCustomerCreateView.as_view(), name='sales-customer-create'),
+        path('sales/customers/search/', views.SalesCustomerSearchView.as_view(), name='sales-customer-search'),
+        path('sales/customers/lookup/', views.customer_lookup, name='sales-customer-lookup'),
         # Sales Orders
         path("orders/", include([
             path("", views.SalesOrderListView.as_view(), name="sales-order-list"),
@@ -105,9 +111,13 @@ urlpatterns = [
     # System Settings
     path("system/", include([
         path("settings/", views.SystemSettingsView.as_view(), name="system-settings"),
+        path("perf/", views.PerfDashboardView.as_view(), name="perf-dashboard"),
+        path("jobs/<int:pk>/", views.job_status, name="job-status"),
+        path("jobs/<int:pk>/download/", views.job_download, name="job-download"),
         path("reports/", include([
             path("sales/", views.SalesReportView.as_view(), name="sales-report"),
             path("revenue/", views.RevenueReportView.as_view(), name="revenue-report"),
+            path("invoices/", views.InvoiceExportView.as_view(), name="invoice-export"),
         ])),
     ])),
     
@@ -136,6 +146,8 @@ path("counters/", include([
 path("products/", include([
     path("", views.ProductListView.as_view(), name="product_list"),
     path("add/", views.ProductCreateView.as_view(), name="add_product"),
+    path("import/", views.ProductImportView.as_view(), name="product-import"),
+    path("export/", views.ProductExportView.as_view(), name="product-export"),
     path("<slug:slug>/", include([
         path("", views.ProductDetailView.as_view(), name="product-detail"),
         path("edit/", views.ProductUpdateView.as_view(), name="product-update"),
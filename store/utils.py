@@ -0,0 +1,47 @@
+import re
+import unicodedata
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize_search_text(text: str) -> str:
+    """Chuẩn hóa chuỗi để tìm kiếm: bỏ dấu tiếng Việt, chữ thường, gộp khoảng trắng."""
+    if not text:
+        return ''
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+    return ' '.join(_TOKEN_RE.findall(text.lower()))
+
+
+def search_tokens(text: str, max_length: int = 50) -> list:
+    """Tách chuỗi đã chuẩn hóa thành danh sách token (không trùng, giữ thứ tự)."""
+    return list(dict.fromkeys(token[:max_length] for token in normalize_search_text(text).split()))
+
+
+_NON_DIGIT_RE = re.compile(r'\D')
+
+
+def normalize_phone(phone: str, country_code: str = '84') -> str:
+    """
+    Chuẩn hóa số điện thoại về dạng E.164 (+84912345678) để so khớp chính xác:
+    bỏ mọi ký tự không phải số, đổi số 0 đầu (số trong nước) hoặc 00 (quốc tế) sang mã quốc gia.
+    Trả về chuỗi rỗng nếu không đủ chữ số để là một số điện thoại.
+    """
+    if not phone:
+        return ''
+    digits = _NON_DIGIT_RE.sub('', phone)
+    if not digits:
+        return ''
+    if '+' in phone[:phone.index(digits[0])]:
+        pass  # Đã có mã quốc gia
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith('0'):
+        digits = country_code + digits[1:]
+    elif not digits.startswith(country_code) or len(digits) < 11:
+        # Số trong nước bị mất số 0 đầu (vd. 912345678 khi nhập từ Excel)
+        digits = country_code + digits
+    if not 8 <= len(digits) <= 15:
+        return ''
+    return f'+{digits}'
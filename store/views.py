@@ -1,31 +1,44 @@
+import asyncio
 import logging
+import os
+import tempfile
 from datetime import timedelta
-from io import BytesIO
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import PermissionDenied
-from django.db import transaction
-from django.db.models import F, Q, Sum
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
 from django.forms import formset_factory
-from django.http import FileResponse, HttpResponseForbidden
+from django.http import FileResponse, Http404, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
-from django.views.generic import (CreateView, DeleteView, DetailView, ListView,
-                                  TemplateView, UpdateView)
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from django.views.generic import (CreateView, DeleteView, DetailView, FormView,
+                                  ListView, TemplateView, UpdateView, View)
 
+from .events import counter_events, format_event
+from .invoices import InvoiceBatchExporter, InvoiceRenderer, export_invoices_job
 from .forms import (CounterForm, CustomUserChangeForm, CustomerCreateForm,
-                    OrderForm, OrderItemForm, PaymentForm, ProductForm, SystemSettingForm)
+                    InvoiceExportForm, OrderForm, OrderItemForm, PaymentForm,
+                    ProductForm, ProductImportForm, SystemSettingForm)
 from .mixins import (AccountantRequiredMixin, AdminRequiredMixin,
-                     ManagerRequiredMixin, SalesStaffRequiredMixin)
-from .models import (CustomUser, Debts, Order, OrderItem, Product, Role,
-                     StoreCounter, SystemSetting)
-from .services import CartService, OrderService
+                     KeysetPaginationMixin, ManagerRequiredMixin,
+                     SalesStaffRequiredMixin)
+from .models import (CustomUser, Debts, Job, Order, OrderItem, Product, Role,
+                     StockMovement, StoreCounter, SystemSetting)
+from .pagination import KeysetPaginator
+from .product_io import (CONTENT_TYPES, FORMAT_CSV, FORMATS, ProductExporter,
+                         ProductImporter, import_products_job, save_upload)
+from .exceptions import InsufficientStockError
+from .services import (CartService, CatalogCacheService, CounterFeedService, CustomerLookupService,
+                       DashboardStatsService, JobService, OrderService, PerfStatsService, ProductSearchService,
+                       SalesRollupService, StockReservationService)
+from .utils import normalize_phone
 
 logger = logging.getLogger(__name__)
 
@@ -63,24 +76,22 @@ def user_logout(request):
 # Core Views
 @login_required
 def dashboard(request):
-    system_setting = SystemSetting.objects.first()    
-    context = {
-        'total_sales': Order.objects.aggregate(total=Sum('total_amount'))['total'] or 0,
-        'orders_count': Order.objects.count(),
-        'products_count': Product.objects.count(),
-        'counters_count': StoreCounter.objects.count(),
-        'total_debt': Debts.objects.aggregate(total=Sum('amount'))['total'] or 0,
-        'store_name': system_setting.store_name if system_setting else "Hệ thống",
-    }
-    return render(request, 'store/dashboard.html', context)
+    return render(request, 'store/dashboard.html', DashboardStatsService.get_stats())
 
 # Product Management
-class ProductListView(LoginRequiredMixin, ListView):
+class ProductListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Product
     template_name = 'store/products/product_list.html'
     context_object_name = 'products'
     paginate_by = 10
-    ordering = ['-id']
+    keyset_ordering = ('-id',)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Danh sách có cột tồn kho
+        context['catalog_version'] = CatalogCacheService.version(CatalogCacheService.PRODUCTS, CatalogCacheService.STOCK)
+        context['catalog_cache_timeout'] = CatalogCacheService.timeout()
+        return context
 
 class ProductDetailView(LoginRequiredMixin, DetailView):
     model = Product
@@ -100,6 +111,7 @@ class ProductCreateView(AdminOrManagerRequiredMixin, CreateView):
     def form_valid(self, form):
         product = form.save(commit=False)
         product.slug = product.name.replace(' ', '-').lower()
+        product._stock_user = self.request.user  # ghi vào sổ kho nếu tồn kho thay đổi (signals)
         product.save()
         messages.success(self.request, "Thêm sản phẩm thành công")
         logger.info(f"Product added by {self.request.user.username}")
@@ -116,6 +128,7 @@ class ProductUpdateView(AdminOrManagerRequiredMixin, UpdateView):
     def form_valid(self, form):
         product = form.save(commit=False)
         product.slug = product.name.replace(' ', '-').lower()
+        product._stock_user = self.request.user  # ghi vào sổ kho nếu tồn kho thay đổi (signals)
         product.save()
         messages.success(self.request, "Cập nhật sản phẩm thành công")
         logger.info(f"Product {self.object.id} updated by {self.request.user.username}")
@@ -133,16 +146,68 @@ class ProductDeleteView(AdminOrManagerRequiredMixin, DeleteView):
         logger.info(f"Product {self.get_object().id} deleted by {request.user.username}")
         return super().delete(request, *args, **kwargs)
 
+class ProductImportView(AdminOrManagerRequiredMixin, FormView):
+    """Nhập sản phẩm hàng loạt từ CSV/XLSX; file lớn được nhập bằng job nền"""
+    form_class = ProductImportForm
+    template_name = 'store/products/import.html'
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        fmt = form.cleaned_data['format']
+        update_existing = form.cleaned_data['update_existing']
+        if upload.size > getattr(settings, 'PRODUCT_IMPORT_INLINE_BYTES', 1024 * 1024):
+            path = save_upload(upload, JobService.output_dir())
+            # File tải lên bị xóa sau lần chạy đầu nên job không chạy lại
+            job = JobService.enqueue(import_products_job, path, fmt, self.request.user.pk, update_existing,
+                                     created_by=self.request.user, max_attempts=1)
+            return self.render_to_response(self.get_context_data(form=self.form_class(), job=job))
+
+        try:
+            stats = ProductImporter(user=self.request.user, update_existing=update_existing).import_file(upload.file, fmt)
+        except ValueError as e:
+            form.add_error('file', str(e))
+            return self.form_invalid(form)
+        logger.info(
+            "Nhập sản phẩm bởi %s: %s dòng, %s tạo mới, %s cập nhật, %s bỏ qua (%.2fs)",
+            self.request.user.username, stats['rows'], stats['created'], stats['updated'], stats['skipped'], stats['seconds']
+        )
+        messages.success(
+            self.request,
+            f"Đã nhập {stats['rows']} dòng: {stats['created']} sản phẩm mới, {stats['updated']} cập nhật, "
+            f"{stats['unchanged']} không đổi, {stats['skipped']} bỏ qua"
+        )
+        return self.render_to_response(self.get_context_data(form=self.form_class(), stats=stats))
+
+class ProductExportView(AdminOrManagerRequiredMixin, View):
+    """Xuất toàn bộ danh mục sản phẩm (?format=csv|xlsx); CSV được stream theo từng lô"""
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', FORMAT_CSV)
+        if fmt not in FORMATS:
+            raise Http404("Định dạng không hỗ trợ")
+        exporter = ProductExporter(Product.objects.all())
+        filename = f"products_{timezone.localdate():%Y%m%d}.{fmt}"
+        if fmt == FORMAT_CSV:
+            response = StreamingHttpResponse(exporter.stream_csv(), content_type=CONTENT_TYPES[fmt])
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+        output = tempfile.TemporaryFile()
+        exporter.write_xlsx(output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=CONTENT_TYPES[fmt])
+
 # Order Management
-class OrderListView(LoginRequiredMixin, ListView):
+class OrderListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     template_name = 'store/orders/order_list.html'
     context_object_name = 'orders'
     paginate_by = 10
+    keyset_ordering = ('-date', '-id')
 
     def get_queryset(self):
+        orders = Order.objects.select_related('customer__user', 'counter')
         if self.request.user.role in [Role.STORE_MANAGER, Role.ACCOUNTANT]:
-            return Order.objects.all()
-        return Order.objects.filter(created_by=self.request.user)
+            return orders
+        return orders.filter(created_by=self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -155,7 +220,7 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'order'
 
     def get_queryset(self):
-        return Order.objects.prefetch_related('order_items__product')
+        return Order.objects.select_related('customer__stats').prefetch_related('order_items__product')
 
     def dispatch(self, request, *args, **kwargs):
         order = self.get_object()
@@ -167,8 +232,7 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
 @transaction.atomic
 def checkout(request):
     try:
-        order = OrderService.create_order_from_cart(request.user, request.session.get('cart', {}))
-        request.session['cart'] = {}
+        order = OrderService.create_order_from_cart(request.user, CartService.get_cart(request.user))
         return render(request, 'store/orders/order_confirmation.html', {'order': order})
     except Exception as e:
         logger.error(f"Checkout error: {str(e)}", exc_info=True)
@@ -194,26 +258,26 @@ def create_order(request, counter_id):
         formset = OrderItemFormSet(request.POST, prefix="orderitem")
         
         if order_form.is_valid() and formset.is_valid():
-            total = 0
-            order = order_form.save(commit=False)
-            order.created_by = request.user
-            order.counter = counter
-            order.save()
-
-            for form in formset:
-                if form.cleaned_data:
-                    product = form.cleaned_data['product']
-                    quantity = form.cleaned_data['quantity']
-                    if product.update_stock(-quantity):
-                        OrderItem.objects.create(
-                            order=order,
-                            product=product,
-                            quantity=quantity
-                        )
-                        total += product.price * quantity
-            order.total_amount = total
-            order.save()
-            return redirect('store:main-order-detail', pk=order.pk)
+            lines = [
+                (form.cleaned_data['product'], form.cleaned_data['quantity'])
+                for form in formset if form.cleaned_data
+            ]
+            try:
+                with transaction.atomic():
+                    order = order_form.save(commit=False)
+                    order.created_by = request.user
+                    order.counter = counter
+                    order.save()
+                    _, order.total_amount = StockReservationService.reserve(order, lines)
+                    order.save()
+                return redirect('store:main-order-detail', pk=order.pk)
+            except (InsufficientStockError, ValidationError) as e:
+                messages.error(request, ' '.join(getattr(e, 'messages', [str(e)])))
+        return render(request, 'store/orders/order_create.html', {
+            'order_form': order_form,
+            'formset': formset,
+            'counter': counter
+        })
     
     return render(request, 'store/orders/order_create.html', {
         'order_form': OrderForm(),
@@ -222,22 +286,34 @@ def create_order(request, counter_id):
     })
 
 @login_required
-def edit_order(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
+def edit_order(request, pk):
+    order = get_object_or_404(Order, id=pk)
     if not (request.user.role in [Role.ADMIN, Role.STORE_MANAGER] or order.created_by == request.user):
         raise PermissionDenied("Không có quyền chỉnh sửa đơn hàng này")
 
     if request.method == 'POST':
+        changed = []
         for item in order.order_items.all():
             new_quantity = int(request.POST.get(f'quantity_{item.id}', item.quantity))
             if new_quantity != item.quantity:
-                item.product.stock += item.quantity
-                item.product.stock -= new_quantity
-                item.product.save()
+                changed.append((item, new_quantity - item.quantity))
                 item.quantity = new_quantity
-                item.save()
-        order.total_amount = sum(item.product.price * item.quantity for item in order.order_items.all())
-        order.save()
+        try:
+            with transaction.atomic():
+                # Giữ thêm hàng cho các dòng tăng số lượng, trả lại kho cho các dòng giảm
+                StockReservationService.reserve_stock(
+                    [(item.product_id, delta) for item, delta in changed if delta > 0],
+                    StockMovement.Reason.ORDER_EDIT, order=order, user=request.user
+                )
+                StockReservationService.release_stock(
+                    [(item.product_id, -delta) for item, delta in changed if delta < 0],
+                    StockMovement.Reason.ORDER_EDIT, order=order, user=request.user
+                )
+                for item, _ in changed:
+                    item.save(update_fields=['quantity'])
+                order.calculate_total()
+        except (InsufficientStockError, ValidationError) as e:
+            messages.error(request, ' '.join(getattr(e, 'messages', [str(e)])))
         return redirect('store:main-order-detail', pk=order.id)
     
     return render(request, 'store/orders/edit_order.html', {'order': order})
@@ -245,12 +321,12 @@ def edit_order(request, order_id):
 # Cart Management
 @login_required
 def cart(request):
-    return render(request, 'store/cart/cart.html', CartService.get_cart_context(request.session))
+    return render(request, 'store/cart/cart.html', CartService.get_cart_context(request.user))
 
 @login_required
 def add_to_cart(request, product_id):
     try:
-        CartService.add_item(request.session, product_id)
+        CartService.add_item(request.user, product_id)
         messages.success(request, "Đã thêm vào giỏ hàng")
     except Exception as e:
         messages.error(request, str(e))
@@ -261,7 +337,7 @@ def update_cart_item(request, product_id):
     if request.method == 'POST':
         quantity = int(request.POST.get('quantity', 1))
         try:
-            CartService.update_item(request.session, product_id, quantity)
+            CartService.update_item(request.user, product_id, quantity)
             messages.success(request, "Cập nhật giỏ hàng thành công")
         except Exception as e:
             messages.error(request, str(e))
@@ -270,7 +346,7 @@ def update_cart_item(request, product_id):
 @login_required
 def remove_from_cart(request, product_id):
     try:
-        CartService.remove_item(request.session, product_id)
+        CartService.remove_item(request.user, product_id)
         messages.success(request, "Đã xóa sản phẩm khỏi giỏ hàng")
     except Exception as e:
         messages.error(request, str(e))
@@ -284,15 +360,34 @@ class CounterListView(LoginRequiredMixin, ListView):
     paginate_by = 10
 
     def get_queryset(self):
+        counters = StoreCounter.objects.select_related('assigned_employee').annotate(
+            orders_count=Count('orders')
+        ).order_by('pk')
         if self.request.user.role == Role.SALES_STAFF:
-            return StoreCounter.objects.filter(assigned_employee=self.request.user)
-        return StoreCounter.objects.all()
+            return counters.filter(assigned_employee=self.request.user)
+        return counters
 
 class CounterDetailView(LoginRequiredMixin, DetailView):
     model = StoreCounter
     template_name = 'store/counters/counter_detail.html'
     context_object_name = 'counter'
 
+    def get_queryset(self):
+        return StoreCounter.objects.select_related('manager', 'assigned_employee')
+
+    def get_object(self, queryset=None):
+        if not hasattr(self, '_counter'):
+            self._counter = super().get_object(queryset)
+        return self._counter
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['catalog_version'] = CatalogCacheService.version(
+            CatalogCacheService.PRODUCTS, CatalogCacheService.counter_scope(self.object.pk)
+        )
+        context['catalog_cache_timeout'] = CatalogCacheService.timeout()
+        return context
+
     def dispatch(self, request, *args, **kwargs):
         if request.user.role == Role.SALES_STAFF and self.get_object().assigned_employee != request.user:
             raise PermissionDenied("Bạn không có quyền truy cập quầy này")
@@ -334,28 +429,29 @@ class CounterDeleteView(ManagerRequiredMixin, DeleteView):
 @login_required
 @user_passes_test(lambda u: u.role == Role.STORE_MANAGER)
 def manage_counters(request):
-    counters = StoreCounter.objects.all()
+    counters = StoreCounter.objects.select_related('manager')
     return render(request, 'store/counters/manage_counters.html', {'counters': counters})
 
 # Reports & Settings
 class SalesReportView(AccountantRequiredMixin, TemplateView):
-    template_name = 'store/reports/sales.html'
+    template_name = 'store/system/reports/sales.html'
 
     def get_context_data(self, **kwargs):
-        today = timezone.now().date()
+        today = timezone.localdate()
+        # Một truy vấn trên bảng tổng hợp cho cả 8 ngày (tuần + hôm nay)
+        daily = SalesRollupService.daily_totals(today - timedelta(days=7), today)
+        periods = SalesRollupService.period_totals(
+            today, monthly_sales=today.replace(day=1), yearly_sales=today.replace(month=1, day=1)
+        )
         return {
-            'today_sales': self._get_daily_sales(today),
-            'weekly_sales': self._get_weekly_sales(today),
-            'chart_labels': [(today - timedelta(days=i)).strftime("%a") for i in range(6, -1, -1)],
-            'chart_data': [self._get_daily_sales(today - timedelta(days=i)) for i in range(6, -1, -1)]
+            'today_sales': daily[-1]['total'],
+            'weekly_sales': sum(day['total'] for day in daily),
+            **periods,
+            'chart_labels': [day['date'].strftime("%a") for day in daily[-7:]],
+            'chart_data': [float(day['total']) for day in daily[-7:]],
+            'orders': Order.objects.select_related('created_by').order_by('-date')[:10],
         }
 
-    def _get_daily_sales(self, date):
-        return Order.objects.filter(date=date).aggregate(total=Sum('total_amount'))['total'] or 0
-
-    def _get_weekly_sales(self, date):
-        return Order.objects.filter(date__gte=date - timedelta(days=7)).aggregate(total=Sum('total_amount'))['total'] or 0
-
 class SystemSettingsView(AdminRequiredMixin, UpdateView):
     model = SystemSetting
     form_class = SystemSettingForm
@@ -370,53 +466,84 @@ class SystemSettingsView(AdminRequiredMixin, UpdateView):
         logger.info(f"System settings updated by {self.request.user.username}")
         return super().form_valid(form)
 
+class PerfDashboardView(AdminRequiredMixin, TemplateView):
+    """Thời gian xử lý và số truy vấn SQL theo từng URL name (do PerfMiddleware ghi lại)"""
+    template_name = 'store/system/perf.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['rows'] = PerfStatsService.summary()
+        context['monitoring'] = getattr(settings, 'PERF_MONITORING', False)
+        return context
+
+    def post(self, request, *args, **kwargs):
+        PerfStatsService.reset()
+        messages.success(request, "Đã xóa số liệu hiệu năng")
+        return redirect('store:perf-dashboard')
+
+def get_user_job(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    if not (request.user.role == Role.ADMIN or job.created_by_id == request.user.pk):
+        raise PermissionDenied("Bạn không có quyền xem công việc này")
+    return job
+
+@login_required
+def job_status(request, pk):
+    """Trạng thái job nền (JSON) để trang gọi job theo dõi định kỳ"""
+    job = get_user_job(request, pk)
+    data = {
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'attempts': job.attempts,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    }
+    if job.status == Job.Status.SUCCEEDED:
+        data['result'] = {key: value for key, value in (job.result or {}).items() if key != 'file'}
+        if isinstance(job.result, dict) and job.result.get('file'):
+            data['download_url'] = reverse('store:job-download', args=[job.pk])
+    elif job.status == Job.Status.FAILED:
+        data['error'] = job.error.strip().splitlines()[-1] if job.error else ''
+    return JsonResponse(data)
+
+@login_required
+def job_download(request, pk):
+    job = get_user_job(request, pk)
+    result = job.result if job.status == Job.Status.SUCCEEDED and isinstance(job.result, dict) else {}
+    if not result.get('file') or not os.path.exists(result['file']):
+        raise Http404("Job chưa có file kết quả")
+    return FileResponse(
+        open(result['file'], 'rb'),
+        as_attachment=True,
+        filename=result.get('filename') or os.path.basename(result['file']),
+        content_type=result.get('content_type')
+    )
+
 # Additional Features
 @login_required
-def export_invoice(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(100, 750, f"HÓA ĐƠN #{order.id:06d}")
-    
-    p.setFont("Helvetica", 12)
-    p.drawString(100, 720, f"Khách hàng: {order.created_by.get_full_name()}")
-    p.drawString(100, 700, f"Ngày: {order.date.strftime('%d/%m/%Y %H:%M')}")
-    
-    y = 650
-    p.line(100, y+10, 500, y+10)
-    p.drawString(100, y, "Sản phẩm")
-    p.drawString(300, y, "Số lượng")
-    p.drawString(400, y, "Đơn giá")
-    p.drawString(500, y, "Thành tiền")
-    
-    for item in order.order_items.all():
-        y -= 20
-        p.drawString(100, y, item.product.name)
-        p.drawString(300, y, str(item.quantity))
-        p.drawString(400, y, f"{item.product.price:,.0f} VNĐ")
-        p.drawString(500, y, f"{item.product.price * item.quantity:,.0f} VNĐ")
-    
-    y -= 40
-    p.line(100, y+30, 500, y+30)
-    p.drawString(400, y, "TỔNG CỘNG:")
-    p.drawString(500, y, f"{order.total_amount:,.0f} VNĐ")
-    
-    p.save()
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f"invoice_{order.id}.pdf")
+def export_invoice(request, pk):
+    order = get_object_or_404(Order.objects.only('pk', 'updated_at'), pk=pk)
+    return FileResponse(
+        open(InvoiceRenderer.get_or_render(order), 'rb'),
+        as_attachment=True,
+        filename=f"invoice_{order.pk}.pdf",
+        content_type='application/pdf'
+    )
 
 class UserManagementView(AdminRequiredMixin, ListView):
     model = CustomUser
     template_name = 'store/users/manage_users.html'
     context_object_name = 'users'
     paginate_by = 20
+    ordering = ['username']
 
-class InventoryView(LoginRequiredMixin, ListView):
+class InventoryView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     template_name = 'store/inventory/inventory.html'
     context_object_name = 'products'
     paginate_by = 20
+    keyset_ordering = ('-stock', '-id')
+    keyset_count_limit = 1000
     
     def get_queryset(self):
         return Product.objects.annotate(total_value=F('price') * F('stock')).order_by('-stock')
@@ -462,7 +589,6 @@ class SalesDashboard(LoginRequiredMixin, TemplateView):
         return context
 
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator
 from store.models import Product, Category
 
 def sales_products(request):
@@ -472,7 +598,7 @@ def sales_products(request):
     categories = Category.objects.all()
 
     # Lấy danh sách sản phẩm, có thể tìm kiếm hoặc lọc theo danh mục
-    products = Product.objects.all()
+    products = Product.objects.select_related('category')
 
     # Lọc theo danh mục nếu có yêu cầu
     category_id = request.GET.get('category', '')
@@ -481,20 +607,26 @@ def sales_products(request):
 
     # Tìm kiếm theo tên sản phẩm
     search_query = request.GET.get('search', '')
+    ordering = ('name', 'id')
     if search_query:
-        products = products.filter(name__icontains=search_query)
+        products = ProductSearchService.search(search_query, products)
+        ordering = ('-name_prefix', '-exact_matches', '-in_stock', 'name', 'id')
 
-    # Phân trang (10 sản phẩm/trang)
-    paginator = Paginator(products, 10)  
-    page_number = request.GET.get('page')
-    products_page = paginator.get_page(page_number)
+    # Phân trang theo khóa (10 sản phẩm/trang)
+    paginator = KeysetPaginator(products, ordering, 10, params=request.GET)
+    products_page = paginator.get_page(request.GET.get(paginator.cursor_param), lazy=True)
 
     # Trả dữ liệu về template
     return render(request, 'store/sales/sales_products.html', {
         'products': products_page,
+        'page_obj': products_page,
+        'paginator': paginator,
         'categories': categories,
         'search_query': search_query,
         'selected_category': category_id,
+        # Bảng có cột số lượng tồn kho
+        'catalog_version': CatalogCacheService.version(CatalogCacheService.PRODUCTS, CatalogCacheService.STOCK),
+        'catalog_cache_timeout': CatalogCacheService.timeout(),
     })
 
 
@@ -508,20 +640,15 @@ def process_payment(request, pk):
             payment_method = form.cleaned_data['payment_method']
             amount_received = form.cleaned_data['amount']
             
-            # Kiểm tra số tiền nhận
-            if amount_received >= order.total_amount:
-                order.status = 'paid'
-                order.payment_method = payment_method
-                order.save()
-                
-                # Cập nhật tồn kho
-                for item in order.order_items.all():
-                    item.product.update_stock(-item.quantity)
-                
-                messages.success(request, "Thanh toán thành công!")
-                return redirect('store:sales_invoice', pk=order.pk)
+            # Chuyển trạng thái qua Order.process_payment để tích điểm, cập nhật CustomerStats và luồng sự kiện quầy;
+            # tồn kho đã được trừ khi tạo đơn (StockReservationService), không trừ lại ở đây
+            try:
+                order.process_payment(payment_method, amount_received)
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
             else:
-                messages.error(request, "Số tiền nhận không đủ để thanh toán.")
+                messages.success(request, "Thanh toán thành công!")
+                return redirect('store:sales-order-invoice-pdf', pk=order.pk)
     else:
         form = PaymentForm(order_total=order.total_amount)
     
@@ -551,13 +678,81 @@ class SalesCounterView(SalesStaffRequiredMixin, DetailView):
         context = super().get_context_data(**kwargs)
         counter = self.object
         context.update({
-            'today_orders': Order.objects.filter(counter=counter, date__date=timezone.now().date()),
+            # Số liệu ban đầu; sau đó trang cập nhật qua luồng sự kiện sales-counter-events
+            'today_totals': CounterFeedService.today_totals(counter.pk),
             'low_stock_products': counter.products.filter(stock__lt=5),
             'pending_orders': Order.objects.filter(counter=counter, order_status='pending')
         })
         return context
 
 
+@sync_to_async
+def _feed_counter_id(request, pk):
+    """Quầy mà người dùng được theo dõi: nhân viên chỉ xem quầy được giao, quản lý/admin xem mọi quầy."""
+    user = request.user
+    if not user.is_authenticated:
+        raise PermissionDenied
+    counters = StoreCounter.objects.order_by('pk')
+    if user.role == Role.SALES_STAFF:
+        counters = counters.filter(assigned_employee=user)
+    elif user.role not in (Role.ADMIN, Role.STORE_MANAGER):
+        raise PermissionDenied
+    if pk is not None:
+        counters = counters.filter(pk=pk)
+    counter_id = counters.values_list('pk', flat=True).first()
+    if counter_id is None:
+        raise Http404("Không tìm thấy quầy")
+    return counter_id
+
+
+def _close_feed_connection():
+    """
+    Đóng kết nối CSDL khi luồng sự kiện kết thúc. Các lần đọc tổng số của một luồng chạy trên cùng một
+    luồng đồng bộ (thread_sensitive) nên dùng lại một kết nối thay vì mở kết nối mới mỗi nhịp.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+async def _counter_event_stream(counter_id):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.COUNTER_EVENTS_MAX_SECONDS
+    queue = counter_events.subscribe(counter_id)
+    try:
+        yield f'retry: {settings.COUNTER_EVENTS_RETRY_MS}\n\n'
+        totals = await sync_to_async(CounterFeedService.today_totals)(counter_id)
+        yield format_event('totals', totals)
+        while loop.time() < deadline:
+            try:
+                event_id, event_type, data = await asyncio.wait_for(queue.get(), settings.COUNTER_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Đơn lưu ở tiến trình khác không đi qua bus của tiến trình này: đọc lại tổng số mỗi nhịp
+                latest = await sync_to_async(CounterFeedService.today_totals)(counter_id)
+                if latest != totals:
+                    totals = latest
+                    yield format_event('totals', totals)
+                else:
+                    yield ': ping\n\n'
+                continue
+            totals = data.get('totals', totals)
+            yield format_event(event_type, data, event_id)
+    finally:
+        counter_events.unsubscribe(counter_id, queue)
+        await sync_to_async(_close_feed_connection)()
+
+
+async def counter_events_feed(request, pk=None):
+    """
+    Luồng Server-Sent Events của một quầy: tổng số trong ngày khi kết nối, rồi mỗi đơn được tạo/thanh toán/hủy
+    (kèm tổng số mới). Cần chạy qua ASGI (JSSMS.asgi) để một kết nối không giữ cả một worker.
+    """
+    counter_id = await _feed_counter_id(request, pk)
+    response = StreamingHttpResponse(_counter_event_stream(counter_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView
 from .models import Customer, CustomUser
@@ -584,10 +779,16 @@ class SalesCustomerListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         # Lấy quầy được gán cho nhân viên
         counter = self.request.user.assigned_counter.first()
         
-        # Lọc khách hàng có đơn hàng tại quầy này
-        return Customer.objects.filter(
-            orders__counter=counter
-        ).distinct().order_by('-user__date_joined')
+        # Lọc khách hàng có đơn hàng tại quầy này (EXISTS thay cho JOIN + DISTINCT trên toàn bộ đơn);
+        # tổng mua / số đơn đọc từ CustomerStats
+        customers = Customer.objects.filter(
+            Exists(Order.objects.filter(customer=OuterRef('pk'), counter=counter))
+        ).select_related('user', 'stats').order_by('-user__date_joined')
+        # Lọc theo hạng (cột tier có index, không tính lại từ điểm)
+        tier = self.request.GET.get('tier')
+        if tier in Customer.Tier.values:
+            customers = customers.filter(tier=tier)
+        return customers
 
     def get_context_data(self, **kwargs):
         """
@@ -595,9 +796,48 @@ class SalesCustomerListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         """
         context = super().get_context_data(**kwargs)
         context['counter'] = self.request.user.assigned_counter.first()
+        context['tiers'] = Customer.Tier.choices
+        context['current_tier'] = self.request.GET.get('tier', '')
         return context
         
 
+class SalesCustomerSearchView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+    """Tìm khách theo số điện thoại (khớp chính xác số đã chuẩn hóa) hoặc theo tên"""
+    template_name = 'store/sales/customer_search.html'
+    context_object_name = 'customers'
+    MAX_RESULTS = 20
+
+    def test_func(self):
+        # Chỉ nhân viên bán hàng được tra cứu thông tin khách (như SalesCustomerListView)
+        return self.request.user.role == Role.SALES_STAFF
+
+    def get_queryset(self):
+        query = self.request.GET.get('q', '').strip()
+        if not query:
+            return Customer.objects.none()
+        customers = Customer.objects.select_related('user', 'stats')
+        phone = normalize_phone(query)
+        if phone and not any(ch.isalpha() for ch in query):
+            return customers.filter(user__phone_normalized=phone)[:self.MAX_RESULTS]
+        return customers.filter(
+            Q(user__last_name__icontains=query) | Q(user__first_name__icontains=query) | Q(user__username__icontains=query)
+        ).order_by('user__last_name', 'user__first_name')[:self.MAX_RESULTS]
+
+@login_required
+def customer_lookup(request):
+    """Thẻ khách hàng theo số điện thoại (JSON) cho màn hình bán hàng"""
+    if request.user.role == Role.CUSTOMER:
+        raise PermissionDenied("Bạn không có quyền tra cứu khách hàng")
+    phone = request.GET.get('phone', '')
+    if not normalize_phone(phone):
+        return JsonResponse({'found': False, 'error': "Số điện thoại không hợp lệ"}, status=400)
+    card = CustomerLookupService.by_phone(phone)
+    if card is None:
+        return JsonResponse({'found': False}, status=404)
+    if card['type'] == 'member':
+        card['detail_url'] = reverse('store:customer-detail', args=[card['username']])
+    return JsonResponse({'found': True, **card})
+
 class SalesProductListView(LoginRequiredMixin, ListView):
     template_name = 'store/sales/product_list.html'
     context_object_name = 'products'
@@ -606,21 +846,22 @@ class SalesProductListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         """Lấy danh sách sản phẩm cho quầy của nhân viên"""
         return Product.objects.filter(
-            counters=self.request.user.assigned_counter
-        ).order_by('-stock')
+            counters__assigned_employee=self.request.user
+        ).distinct().order_by('-stock')
 from django.views.generic import ListView
 from .models import Order
 
-class SalesOrderListView(LoginRequiredMixin, ListView):
+class SalesOrderListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     template_name = 'store/sales/order_list.html'
     context_object_name = 'orders'
     paginate_by = 10
+    keyset_ordering = ('-date', '-id')
 
     def get_queryset(self):
         """Lấy danh sách đơn hàng cho nhân viên bán hàng"""
         return Order.objects.filter(
             created_by=self.request.user
-        ).select_related('counter').prefetch_related('order_items__product')
+        ).select_related('counter', 'customer__user').prefetch_related('order_items__product')
     
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
@@ -644,16 +885,22 @@ class SalesOrderCreateView(SalesStaffRequiredMixin, CreateView):
         return form
 
     def form_valid(self, form):
-        order = form.save(commit=False)
-        order.counter = self.request.user.assigned_counter.first()
-        order.created_by = self.request.user
-        order.save()
-        
         # Xử lý các sản phẩm trong đơn hàng
-        for product in form.cleaned_data['products']:
-            quantity = form.cleaned_data[f'quantity_{product.id}']
-            if product.update_stock(-quantity):
-                OrderItem.objects.create(order=order, product=product, quantity=quantity)
+        lines = [
+            (product, form.cleaned_data[f'quantity_{product.id}'])
+            for product in form.cleaned_data['products']
+        ]
+        try:
+            with transaction.atomic():
+                order = form.save(commit=False)
+                order.counter = self.request.user.assigned_counter.first()
+                order.created_by = self.request.user
+                order.save()
+                _, order.total_amount = StockReservationService.reserve(order, lines)
+                order.save()
+        except (InsufficientStockError, ValidationError) as e:
+            form.add_error(None, ' '.join(getattr(e, 'messages', [str(e)])))
+            return self.form_invalid(form)
         
         return redirect('store:sales_order_detail', pk=order.pk)
     
@@ -686,78 +933,21 @@ class SalesInvoicePDFView(LoginRequiredMixin, DetailView):
     def get(self, request, *args, **kwargs):
         return self.generate_pdf_invoice()
 
+    def get_object(self, queryset=None):
+        if not hasattr(self, '_order'):
+            self._order = super().get_object(queryset)
+        return self._order
+
     def generate_pdf_invoice(self):
-        """Tạo hóa đơn PDF với ReportLab"""
+        """Trả về hóa đơn PDF (lấy từ cache trên đĩa nếu đơn hàng chưa thay đổi)"""
         order = self.get_object()
-        buffer = BytesIO()
-        
-        # Tạo canvas PDF
-        p = canvas.Canvas(buffer, pagesize=letter)
-        self._draw_header(p, order)
-        self._draw_customer_info(p, order)
-        self._draw_items_table(p, order)
-        self._draw_footer(p, order)
-        
-        p.save()
-        buffer.seek(0)
         return FileResponse(
-            buffer,
+            open(InvoiceRenderer.get_or_render(order), 'rb'),
             as_attachment=True,
             filename=f"invoice_{order.id}.pdf",
             content_type='application/pdf'
         )
 
-    def _draw_header(self, p, order):
-        """Vẽ phần header hóa đơn"""
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(100, 750, f"HÓA ĐƠN #{order.id:06d}")
-        p.setFont("Helvetica", 10)
-        p.drawString(100, 730, f"Ngày xuất: {timezone.now().strftime('%d/%m/%Y %H:%M')}")
-
-    def _draw_customer_info(self, p, order):
-        """Vẽ thông tin khách hàng"""
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(100, 700, "Thông tin khách hàng:")
-        p.setFont("Helvetica", 10)
-        p.drawString(100, 680, f"Tên: {order.customer_name}")
-        p.drawString(100, 660, f"Điện thoại: {order.customer_phone}")
-        p.drawString(100, 640, f"Địa chỉ: {order.customer_address}")
-
-    def _draw_items_table(self, p, order):
-        """Vẽ bảng sản phẩm"""
-        y = 600
-        # Header bảng
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(100, y, "STT")
-        p.drawString(150, y, "Sản phẩm")
-        p.drawString(300, y, "Đơn giá")
-        p.drawString(400, y, "Số lượng")
-        p.drawString(500, y, "Thành tiền")
-        p.line(100, y-10, 550, y-10)
-
-        # Dữ liệu sản phẩm
-        p.setFont("Helvetica", 10)
-        for idx, item in enumerate(order.order_items.all(), start=1):
-            y -= 20
-            p.drawString(100, y, str(idx))
-            p.drawString(150, y, item.product.name)
-            p.drawString(300, y, f"{item.product.price:,.0f} VNĐ")
-            p.drawString(400, y, str(item.quantity))
-            p.drawString(500, y, f"{item.total_price():,.0f} VNĐ")
-
-    def _draw_footer(self, p, order):
-        """Vẽ phần chân trang"""
-        y = 200
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(400, y, "TỔNG CỘNG:")
-        p.drawString(500, y, f"{order.total_amount:,.0f} VNĐ")
-        p.line(400, y-10, 550, y-10)
-
-        # Thông tin cửa hàng
-        p.setFont("Helvetica", 8)
-        p.drawString(100, 50, "Cảm ơn quý khách đã mua hàng!")
-        p.drawString(100, 40, "Hẹn gặp lại quý khách trong các dịch vụ tiếp theo")
-
     def dispatch(self, request, *args, **kwargs):
         """Kiểm tra quyền truy cập"""
         order = self.get_object()
@@ -769,18 +959,65 @@ class SalesInvoicePDFView(LoginRequiredMixin, DetailView):
 from django.views.generic import TemplateView
 
 class RevenueReportView(AccountantRequiredMixin, TemplateView):
-    template_name = 'store/reports/revenue_report.html'
+    template_name = 'store/system/reports/revenue_report.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        today = timezone.now().date()
+        today = timezone.localdate()
         last_7_days = today - timedelta(days=7)
-        revenue = Order.objects.filter(date__gte=last_7_days).aggregate(total=Sum('total_amount'))['total'] or 0
+        daily = SalesRollupService.daily_totals(last_7_days, today)
+        revenue = sum(day['total'] for day in daily)
         context.update({
             'revenue_last_7_days': revenue,
+            'total_revenue': revenue,
+            'daily_sales': daily,
             'today': today,
         })
         return context
+
+
+class InvoiceExportView(AccountantRequiredMixin, TemplateView):
+    """Xuất hàng loạt hóa đơn theo khoảng ngày / quầy ra file ZIP hoặc PDF gộp"""
+    template_name = 'store/system/reports/invoice_export.html'
+
+    def get(self, request, *args, **kwargs):
+        form = InvoiceExportForm(request.GET or None)
+        if not form.is_valid():
+            return self.render_to_response(self.get_context_data(form=form))
+
+        data = form.cleaned_data
+        orders = InvoiceBatchExporter.filter_orders(data['start'], data['end'], data['counter'])
+        # Xuất nhiều hóa đơn chạy nền, trang theo dõi job và tải file khi xong
+        if orders.count() > getattr(settings, 'INVOICE_EXPORT_INLINE_LIMIT', 50):
+            job = JobService.enqueue(
+                export_invoices_job,
+                data['start'].isoformat(),
+                data['end'].isoformat(),
+                data['counter'].pk if data['counter'] else None,
+                data['format'],
+                created_by=request.user,
+            )
+            return self.render_to_response(self.get_context_data(form=form, job=job))
+
+        # Xuất ngay trong tiến trình web: vẽ tuần tự, không mở pool tiến trình con trong worker
+        exporter = InvoiceBatchExporter(orders, workers=1)
+        output = tempfile.TemporaryFile()
+        stats = exporter.export(output, data['format'])
+        output.seek(0)
+        logger.info(
+            "Xuất %s hóa đơn (%s từ cache) trong %.2fs; vẽ mới %s trang trong %.2fs (%.1f trang/giây)",
+            stats['invoices'], stats['cached'], stats['seconds'],
+            stats['pages'], stats['render_seconds'], stats['pages_per_second']
+        )
+        response = FileResponse(
+            output,
+            as_attachment=True,
+            filename=f"invoices_{data['start']:%Y%m%d}_{data['end']:%Y%m%d}.{data['format']}",
+            content_type=InvoiceBatchExporter.content_type(data['format'])
+        )
+        response['X-Invoice-Count'] = stats['invoices']
+        response['X-Pages-Per-Second'] = f"{stats['pages_per_second']:.1f}"
+        return response
     
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import DetailView
@@ -795,7 +1032,19 @@ class CustomerDetailView(LoginRequiredMixin, DetailView):
 
     def get_queryset(self):
         # Chỉ cho phép truy cập các tài khoản có role là CUSTOMER
-        return CustomUser.objects.filter(role=Role.CUSTOMER)
+        return CustomUser.objects.filter(role=Role.CUSTOMER).select_related('customer__stats__favourite_counter')
+
+    RECENT_ORDERS = 20
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Số liệu tổng hợp đọc từ CustomerStats, chỉ nạp các đơn gần nhất
+        profile = getattr(self.object, 'customer', None)
+        context['stats'] = getattr(profile, 'stats', None)
+        context['orders'] = Order.objects.filter(customer_id=self.object.pk).select_related('counter').annotate(
+            items_count=Count('order_items')
+        )[:self.RECENT_ORDERS]
+        return context
     
 class ProductDetailByPkView(DetailView):
     model = Product